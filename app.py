@@ -1,16 +1,107 @@
+import os
+import altair as alt
+import numpy as np
 import streamlit as st
 from datetime import datetime
+from io import BytesIO
 import ml_report as ml
+from ml_cache import ParseCache, content_hash, file_bytes
+from ml_history import HistoryStore
+from ml_jobs import ReportJobs, report_key
+from ml_snapshot import HAS_ARROW as HAS_SNAPSHOTS
+from ml_snapshot import SnapshotStore, diff_kpis, diff_quadrants
+from ml_table import TableView, parse_filter
 
 st.set_page_config(page_title="ML Ads - Dashboard & Relatorio", layout="wide")
-st.title("Mercado Livre Ads - Dashboard e Relatorio Automatico (Estrategico)")
 
-modo = st.radio(
-    "Selecione o tipo de relatorio de campanhas que voce exportou:",
-    ["CONSOLIDADO (decisao)", "DIARIO (monitoramento)"],
-    horizontal=True
-)
-modo_key = "consolidado" if "CONSOLIDADO" in modo else "diario"
+
+@st.cache_resource
+def get_parse_cache() -> ParseCache:
+    return ParseCache(max_items=12, disk_dir=os.environ.get("ML_CACHE_DIR"))
+
+
+@st.cache_resource
+def get_history_store() -> HistoryStore:
+    return HistoryStore(os.environ.get("ML_HISTORY_DB", "ml_history.sqlite"))
+
+
+@st.cache_resource
+def get_report_jobs() -> ReportJobs:
+    return ReportJobs(workers=int(os.environ.get("ML_REPORT_WORKERS", "2")))
+
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    return SnapshotStore(os.environ.get("ML_SNAPSHOT_DIR", "ml_snapshots"))
+
+
+def load_snapshot(snap_id: str):
+    # Mesmo objeto entre reruns (o ReportContext compara as entradas por identidade)
+    snaps = st.session_state.setdefault("snapshots", {})
+    if snap_id not in snaps:
+        snaps[snap_id] = get_snapshot_store().load(snap_id)
+    return snaps[snap_id]
+
+
+def snapshot_label(lista, snap_id: str) -> str:
+    row = lista.set_index("id").loc[snap_id]
+    return f"{row['criado_em'].replace('T', ' ')} {row['rotulo'] or ''} ({row['modo']})".strip()
+
+
+def table_view(name: str, df) -> TableView:
+    # Um TableView por tabela; os frames do ReportContext sao os mesmos objetos entre reruns
+    views = st.session_state.setdefault("table_views", {})
+    view = views.get(name)
+    if view is None or view.df is not df:
+        view = views[name] = TableView(df)
+    return view
+
+
+def paged_table(name: str, df, sort: str = None, ascending: bool = False, page_size: int = 50) -> None:
+    """Tabela paginada no servidor: so a pagina visivel vai para o navegador."""
+    if df is None or len(df) == 0:
+        st.caption("Sem linhas.")
+        return
+    view = table_view(name, df)
+    cols = list(df.columns)
+    f1, f2, f3, f4 = st.columns([2, 2, 2, 1])
+    filtro_col = f1.selectbox("Filtrar coluna", ["(nenhuma)"] + cols, key=f"{name}_fcol")
+    filtro_txt = f2.text_input("Contem (texto) ou min:max (numero)", key=f"{name}_ftxt",
+                               disabled=filtro_col == "(nenhuma)")
+    sort_col = f3.selectbox("Ordenar por", cols, index=cols.index(sort) if sort in cols else 0, key=f"{name}_sort")
+    asc = f4.checkbox("Crescente", value=ascending, key=f"{name}_asc")
+
+    crit = parse_filter(df, filtro_col, filtro_txt) if filtro_col != "(nenhuma)" else None
+    filters = {filtro_col: crit} if crit is not None else None
+    total = len(view.positions(filters))
+    pages = view.pages(total, page_size)
+    page = st.number_input(f"Pagina (de {pages})", min_value=1, max_value=pages, value=1, key=f"{name}_page") if pages > 1 else 1
+    rows, total = view.query(filters, sort=sort_col, ascending=asc, page=int(page) - 1, page_size=page_size)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    st.caption(f"{total} de {len(df)} linhas")
+
+
+def load_group(items: list, compact: bool):
+    """Le os arquivos de um tipo de export (em paralelo quando ha varios) e junta sem duplicadas."""
+    files, infos, hashes = zip(*items)
+    info = ml.check_same_export(list(infos), [f.name for f in files])
+    kwargs_list = [{"compact": compact, "sheet_name": i["sheet"], "header": i["header"]} for i in infos]
+    frames = parse_cache.load_many(ml.export_loader(info), files, modo=info["modo"] or "",
+                                   kwargs_list=kwargs_list, parse_many=ml.parse_exports)
+    if len(frames) == 1:
+        return info, frames[0]
+    # Mesmo objeto entre reruns, para o ReportContext reconhecer as entradas
+    key = f"{info['tipo']}-{info['modo']}-{compact}-{','.join(hashes)}"
+    return info, parse_cache.combined(key, lambda: ml.combine_exports(info, frames, compact=compact))
+
+
+parse_cache = get_parse_cache()
+report_jobs = get_report_jobs()
+
+perfilar = st.sidebar.checkbox("Perfilar etapas (performance)", value=False)
+# Garante que um profiler de um rerun anterior nao fique ativo nesta sessao
+ml.set_profiler(None)
+st.title("Mercado Livre Ads - Dashboard e Relatorio Automatico (Estrategico)")
 
 with st.expander("Regras (ajustaveis)"):
     c1, c2, c3, c4 = st.columns(4)
@@ -23,126 +114,472 @@ with st.expander("Regras (ajustaveis)"):
     with c4:
         pause_cvr_pct = st.number_input("PAUSAR: CVR max. (%)", min_value=0.0, value=1.0, step=0.2)
 
-u1, u2, u3 = st.columns(3)
-with u1:
-    organico_file = st.file_uploader("Relatorio organico (publicacoes)", type=["xlsx"])
-with u2:
-    campanhas_file = st.file_uploader("Relatorio campanhas Ads", type=["xlsx"])
-with u3:
-    patrocinados_file = st.file_uploader("Relatorio anuncios patrocinados", type=["xlsx"])
-
-if not (organico_file and campanhas_file and patrocinados_file):
-    st.info("Envie os 3 arquivos para liberar o dashboard.")
-    st.stop()
-
-with st.spinner("Lendo arquivos..."):
-    org = ml.load_organico(organico_file)
-    pat = ml.load_patrocinados(patrocinados_file)
-    camp = ml.load_campanhas_diario(campanhas_file) if modo_key == "diario" else ml.load_campanhas_consolidado(campanhas_file)
-
-camp_agg = ml.build_campaign_agg(camp, modo_key)
-
-kpis, pause, enter, scale, acos, camp_strat = ml.build_tables(
-    org, camp_agg, pat,
-    enter_visitas_min=int(enter_visitas_min),
-    enter_conv_min=float(enter_conv_pct) / 100.0,
-    pause_invest_min=float(pause_invest_min),
-    pause_cvr_max=float(pause_cvr_pct) / 100.0,
-)
-
-daily = None
-if modo_key == "diario":
-    daily = ml.build_daily_from_diario(camp)
-
-diagnosis = ml.build_executive_diagnosis(camp_strat, daily=daily)
-panel = ml.build_control_panel(camp_strat)
-high = ml.build_opportunity_highlights(camp_strat)
-plan7 = ml.build_7_day_plan(camp_strat)
-
-tab1, tab2 = st.tabs(["Dashboard", "Gerar Excel"])
-
-with tab1:
-    st.subheader("Diagnostico Executivo")
-    st.write(f"ROAS da conta: **{diagnosis['ROAS']:.2f}** | ACOS real: **{diagnosis['ACOS_real']:.2f}**")
-    st.write(f"**Veredito:** {diagnosis['Veredito']}")
-
-    t = diagnosis.get("Tendencias", {})
-    if t and (t.get("cpc_proxy_up") is not None):
+    s1, s2, s3, s4, s5 = st.columns(5)
+    with s1:
+        roas_mina = st.number_input("MINA: ROAS min.", min_value=0.0, value=7.0, step=0.5)
+    with s2:
+        lost_budget_mina = st.number_input("MINA: Perda por orcamento min. (%)", min_value=0.0, max_value=100.0, value=40.0, step=5.0)
+    with s3:
+        lost_rank_gigante = st.number_input("GIGANTE: Perda por classificacao min. (%)", min_value=0.0, max_value=100.0, value=50.0, step=5.0)
+    with s4:
+        roas_hemorragia = st.number_input("HEMORRAGIA: ROAS max.", min_value=0.0, value=3.0, step=0.5)
+    with s5:
+        acos_over_pct = st.number_input("HEMORRAGIA: ACOS acima do objetivo (%)", min_value=0.0, value=30.0, step=5.0)
+
+    r1, r2, _ = st.columns([1, 1, 3])
+    with r1:
+        trend_window = st.selectbox("TENDENCIA: Janela (dias)", list(ml.TREND_WINDOWS), index=0)
+    with r2:
+        anomaly_z = st.number_input("ANOMALIA: Desvios (z) min.", min_value=1.0, value=3.0, step=0.5)
+
+    o1, o2, o3, o4, o5 = st.columns(5)
+    with o1:
+        plan_budget = st.number_input("ORCAMENTO: Total diario (R$, 0 = atual)", min_value=0.0, value=0.0, step=100.0)
+    with o2:
+        plan_floor_pct = st.number_input("ORCAMENTO: Piso (% do atual)", min_value=0.0, value=50.0, step=10.0)
+    with o3:
+        plan_cap_pct = st.number_input("ORCAMENTO: Teto (% do atual)", min_value=0.0, value=200.0, step=10.0)
+    with o4:
+        plan_acos_max = st.number_input("ORCAMENTO: ACOS max. da conta (%, 0 = sem limite)", min_value=0.0, value=0.0, step=1.0)
+    with o5:
+        plan_days = st.number_input("ORCAMENTO: Dias do export consolidado", min_value=1, value=30, step=1)
+
+prof = ml.StageProfiler(memory=True).start() if perfilar else None
+
+# st.stop() levanta excecao: o finally garante que o tracemalloc e o profiler nao sobrem
+try:
+    compacto = st.sidebar.checkbox(
+        "Modo compacto de memoria",
+        value=False,
+        help="IDs inteiros, texto repetitivo como categoria e inteiros em int32. Os resultados nao mudam.",
+    )
+    backend_padrao = os.environ.get("ML_AGG_BACKEND", "pandas")
+    backend = st.sidebar.selectbox(
+        "Backend de agregacao",
+        ml.AGG_BACKENDS,
+        index=ml.AGG_BACKENDS.index(backend_padrao) if backend_padrao in ml.AGG_BACKENDS else 0,
+        help="Agrupamento por campanha/dia do export diario. Os resultados sao identicos; arrow/polars usam varios nucleos.",
+    )
+
+    with st.sidebar:
+        st.subheader("Cache de leitura")
+        cs = parse_cache.stats
         st.caption(
-            f"Tendencias (ultimos 7d vs 7d anteriores) | "
-            f"CPC proxy: {t['cpc_proxy_up']:+.1%} | "
-            f"Ticket: {t['ticket_down']:+.1%} | "
-            f"ROAS: {t['roas_down']:+.1%}"
+            f"Hits: {cs['hits']} | Hits disco: {cs['disk_hits']} | Misses: {cs['misses']} | "
+            f"Evictions: {cs['evictions']}"
         )
-    st.divider()
-
-    st.subheader("KPIs")
-    a, b, c, d, e, f = st.columns(6)
-    a.metric("Investimento", f"R$ {kpis['Investimento Ads (R$)']:.2f}")
-    b.metric("Receita", f"R$ {kpis['Receita Ads (R$)']:.2f}")
-    c.metric("Vendas", kpis["Vendas Ads"])
-    d.metric("ROAS", f"{kpis['ROAS']:.2f}")
-    e.metric("Campanhas unicas", kpis["Campanhas únicas"])
-    f.metric("IDs patrocinados", kpis["IDs patrocinados únicos"])
-
-    st.divider()
-
-    if modo_key == "diario":
-        st.subheader("Evolucao diaria")
-        daily2 = daily.set_index("Desde")
-        st.line_chart(daily2[["Investimento", "Receita", "Vendas"]])
+
+    snapshot = None
+    if HAS_SNAPSHOTS:
+        fonte = st.radio("Fonte", ["Arquivos exportados", "Snapshot salvo"], horizontal=True)
+        if fonte == "Snapshot salvo":
+            lista = get_snapshot_store().list()
+            if lista.empty:
+                st.info("Nenhum snapshot salvo ainda.")
+                st.stop()
+            snap_id = st.selectbox("Snapshot", lista["id"], format_func=lambda i: snapshot_label(lista, i))
+            snapshot = load_snapshot(snap_id)
+
+    usar_historico = False
+    novas = 0
+    if snapshot is not None:
+        # Frames lidos por memory map; camp_agg/daily/camp_strat ja vem prontos no ReportContext
+        org, camp, pat = snapshot.frames["org"], snapshot.frames["camp"], snapshot.frames["pat"]
+        modo_key = snapshot.meta["modo"]
+        input_hashes = [snapshot.id]
+        compacto = snapshot.meta.get("compact", False)
+        st.caption(f"Snapshot **{snapshot_label(lista, snapshot.id)}** (export {modo_key.upper()}).")
+    else:
+        st.caption(
+            "Envie os 3 exports (organico, campanhas e anuncios patrocinados) em qualquer ordem: "
+            "o tipo de cada arquivo e o modo CONSOLIDADO/DIARIO das campanhas sao detectados automaticamente. "
+            "Exports divididos em varios arquivos (ex.: um por periodo) podem ser enviados juntos; "
+            "linhas repetidas entre eles sao descartadas."
+        )
+        u1, u2, u3 = st.columns(3)
+        uploads = []
+        for i, col in enumerate((u1, u2, u3), start=1):
+            with col:
+                uploads.extend(st.file_uploader(f"Arquivos {i}", type=["xlsx"], key=f"upload_{i}",
+                                                accept_multiple_files=True) or [])
+
+        # Deteccao le so as primeiras linhas; o resultado fica guardado pelo hash do conteudo
+        sniffed = st.session_state.setdefault("sniffed", {})
+        exports = {}
+        for up in uploads:
+            h = content_hash(file_bytes(up))
+            if h not in sniffed:
+                try:
+                    sniffed[h] = ml.sniff_workbook(BytesIO(file_bytes(up)))
+                except ValueError as exc:
+                    st.error(f"{up.name}: {exc}")
+                    st.stop()
+            grupo = exports.setdefault(sniffed[h]["tipo"], [])
+            # Mesmo arquivo enviado duas vezes entra uma so
+            if all(h != g for _, _, g in grupo):
+                grupo.append((up, sniffed[h], h))
+
+        faltam = [t for t in ("organico", "campanhas", "patrocinados") if t not in exports]
+        if faltam:
+            if exports:
+                st.info(f"Recebidos: {', '.join(exports)}. Falta(m): {', '.join(faltam)}.")
+            else:
+                st.info("Envie os 3 arquivos para liberar o dashboard.")
+            st.stop()
+
+        try:
+            camp_info = ml.check_same_export([i for _, i, _ in exports["campanhas"]], [f.name for f, _, _ in exports["campanhas"]])
+        except ValueError as exc:
+            st.error(str(exc))
+            st.stop()
+        modo_key = camp_info["modo"]
+        st.caption(
+            f"Campanhas detectadas como export **{modo_key.upper()}** "
+            f"({', '.join(f.name for f, _, _ in exports['campanhas'])})."
+        )
+
+        if modo_key == "diario":
+            usar_historico = st.checkbox(
+                "Acumular historico local (envie apenas os dias novos; o export e mesclado ao historico salvo)",
+                value=False,
+            )
+
+        with st.spinner("Lendo arquivos..."):
+            try:
+                _, org = load_group(exports["organico"], compacto)
+                _, pat = load_group(exports["patrocinados"], compacto)
+                _, camp = load_group(exports["campanhas"], compacto)
+            except ValueError as exc:
+                st.error(str(exc))
+                st.stop()
+
+        for tipo, df in (("organico", org), ("patrocinados", pat), ("campanhas", camp)):
+            falhas = ml.parse_failures(df)
+            if falhas:
+                st.warning(
+                    f"Export {tipo}: celulas que nao viraram numero/data (ficaram vazias): "
+                    + ", ".join(f"{col.splitlines()[0]} ({n})" for col, n in falhas.items())
+                )
+
+        if usar_historico:
+            history = get_history_store()
+            hs = [h for _, _, h in exports["campanhas"]]
+            novas = history.merge(camp, origem=hs[0] if len(hs) == 1 else content_hash(",".join(hs).encode()))
+            if novas:
+                st.toast(f"Historico atualizado com {novas} linhas.")
+
+        input_hashes = [h for tipo in ("organico", "campanhas", "patrocinados") for _, _, h in exports[tipo]]
+
+    # O contexto sobrevive aos reruns: mudar uma regra so recalcula o que depende dela
+    ctx = st.session_state.get("report_ctx")
+    if (
+        ctx is None
+        or not ctx.same_inputs(org, camp, pat, modo_key)
+        or st.session_state.get("report_ctx_historico") != usar_historico
+        or ctx.backend != backend
+        or novas
+    ):
+        extra = (
+            {"camp_agg": history.campaign_agg(), "daily": history.daily(), "camp_diario": history.raw()}
+            if usar_historico else {}
+        )
+        if snapshot is not None:
+            ctx = snapshot.context(backend=backend)
+        else:
+            ctx = ml.ReportContext(org, camp, pat, modo=modo_key, compact=compacto, backend=backend, **extra)
+        st.session_state["report_ctx"] = ctx
+        st.session_state["report_ctx_historico"] = usar_historico
+
+    ctx.update(
+        enter_visitas_min=int(enter_visitas_min),
+        enter_conv_min=float(enter_conv_pct) / 100.0,
+        pause_invest_min=float(pause_invest_min),
+        pause_cvr_max=float(pause_cvr_pct) / 100.0,
+        roas_mina=float(roas_mina),
+        lost_budget_mina=float(lost_budget_mina),
+        lost_rank_gigante=float(lost_rank_gigante),
+        roas_hemorragia=float(roas_hemorragia),
+        acos_over_pct=float(acos_over_pct) / 100.0,
+        trend_window=int(trend_window),
+        anomaly_z=float(anomaly_z),
+        plan_budget=float(plan_budget) or None,
+        plan_floor_pct=float(plan_floor_pct) / 100.0,
+        plan_cap_pct=float(plan_cap_pct) / 100.0,
+        plan_acos_max=float(plan_acos_max) / 100.0 or None,
+        plan_days=int(plan_days),
+    )
+
+    FORMATOS = {
+        "Excel (padrao)": ("xlsx", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+        "Excel (streaming, menos memoria)": ("xlsx-stream", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+        "ZIP de Parquet": ("parquet", "zip", "application/zip"),
+        "ZIP de CSV": ("csv", "zip", "application/zip"),
+    }
+    formato, ext, mime = FORMATOS[st.session_state.get("formato_label", "Excel (padrao)")]
+
+    # Relatorio comeca a ser gerado em segundo plano ja com as entradas e regras atuais;
+    # mudar arquivo ou regra cancela o job anterior desta sessao
+    job_key = report_key(
+        input_hashes, modo_key, formato, ctx.params,
+        compacto=compacto, historico=len(ctx.camp_diario) if usar_historico else None,
+    )
+    slot = st.session_state.setdefault("report_job_slot", os.urandom(8).hex())
+    job = report_jobs.submit(
+        slot, job_key, formato, org, camp, pat, modo=modo_key, compact=compacto,
+        seed={"camp_agg": ctx.camp_agg, "daily": ctx.daily, "camp_diario": ctx.camp_diario},
+        **ctx.params,
+    )
+
+    camp_agg = ctx.camp_agg
+    daily = ctx.daily
+    kpis, pause, enter, scale, acos, camp_strat = ctx.tables()
+    diagnosis = ctx.diagnosis
+    panel = ctx.panel
+    high = ctx.highlights
+    plan7 = ctx.plan7
+
+    # Guarda o ultimo relatorio de memoria de cada modo para comparar antes/depois
+    mem_reports = st.session_state.setdefault("mem_reports", {})
+    mem_reports[compacto] = ctx.memory_report()
+    with st.sidebar.expander("Memoria por frame"):
+        mem = mem_reports[compacto].rename(columns={"Bytes": "Compacto" if compacto else "Padrao"})
+        outro = mem_reports.get(not compacto)
+        if outro is not None:
+            mem = mem.merge(
+                outro[["Frame", "Bytes"]].rename(columns={"Bytes": "Padrao" if compacto else "Compacto"}),
+                on="Frame", how="left",
+            )
+        st.dataframe(mem, use_container_width=True, hide_index=True)
+        st.caption("Alterne o modo compacto para comparar os dois lados.")
+
+    tab1, tab2, tab3, tab4 = st.tabs(["Dashboard", "Gerar Excel", "Sensibilidade", "Snapshots"])
+
+    with tab1:
+        st.subheader("Diagnostico Executivo")
+        st.write(f"ROAS da conta: **{diagnosis['ROAS']:.2f}** | ACOS real: **{diagnosis['ACOS_real']:.2f}**")
+        st.write(f"**Veredito:** {diagnosis['Veredito']}")
+
+        t = diagnosis.get("Tendencias", {})
+        if t and (t.get("cpc_proxy_up") is not None):
+            st.caption(
+                f"Tendencias (ultimos {diagnosis['Janela_Tendencia']}d vs "
+                f"{diagnosis['Janela_Tendencia']}d anteriores) | "
+                f"CPC proxy: {t['cpc_proxy_up']:+.1%} | "
+                f"Ticket: {t['ticket_down']:+.1%} | "
+                f"ROAS: {t['roas_down']:+.1%}"
+            )
+        drivers = diagnosis.get("Campanhas_CPC")
+        if drivers is not None and len(drivers):
+            st.write("**Campanhas puxando a alta do CPC** (gasto extra nos cliques da janela):")
+            st.dataframe(drivers, use_container_width=True, hide_index=True)
+        st.divider()
+
+        st.subheader("KPIs")
+        a, b, c, d, e, f = st.columns(6)
+        a.metric("Investimento", f"R$ {kpis['Investimento Ads (R$)']:.2f}")
+        b.metric("Receita", f"R$ {kpis['Receita Ads (R$)']:.2f}")
+        c.metric("Vendas", kpis["Vendas Ads"])
+        d.metric("ROAS", f"{kpis['ROAS']:.2f}")
+        e.metric("Campanhas unicas", kpis["Campanhas únicas"])
+        f.metric("IDs patrocinados", kpis["IDs patrocinados únicos"])
+
+        st.divider()
+
+        if modo_key == "diario":
+            st.subheader("Evolucao diaria")
+            daily2 = daily.set_index("Desde")
+            st.line_chart(daily2[["Investimento", "Receita", "Vendas"]])
+
+            anomalies = ctx.anomalies
+            if anomalies is not None and len(anomalies):
+                with st.expander(f"Anomalias diarias por campanha ({len(anomalies)})"):
+                    paged_table("anomalias", anomalies, sort="Desde")
+                    st.caption(f"Dias fora de {anomaly_z:.1f} desvios da media dos {ctx.params['anomaly_window']} dias anteriores da campanha.")
+            st.divider()
+
+        st.subheader("Top 10 campanhas por Receita (fixo)")
+        bar = table_view("camp_agg", camp_agg).top_k("Receita", 10)[["Nome", "Receita"]]
+        st.bar_chart(bar.astype({"Receita": float}).set_index("Nome"))
+
+        st.divider()
+
+        st.subheader("Matriz de Oportunidade (Destaques)")
+        cA, cB = st.columns(2)
+        with cA:
+            st.write("Locomotivas (CPI 80% + perda por classificacao)")
+            st.dataframe(high["Locomotivas"], use_container_width=True)
+        with cB:
+            st.write("Minas Limitadas (ROAS alto + perda por orcamento)")
+            st.dataframe(high["Minas"], use_container_width=True)
+
+        st.divider()
+
+        st.subheader("Plano de Acao - 7 dias")
+        paged_table("plan7", plan7, sort="Dia", ascending=True)
+
+        st.divider()
+
+        st.subheader("Plano de Orcamento (realocacao do orcamento diario)")
+        budget_plan = ctx.budget_plan
+        if not budget_plan["Limite_ACOS_Viavel"].all():
+            st.warning(
+                f"Os pisos das campanhas ja passam do ACOS maximo de {plan_acos_max:.1f}%: "
+                "o plano nao consegue respeitar o limite. Reduza o piso ou aumente o limite."
+            )
+        o1, o2, o3, o4 = st.columns(4)
+        o1.metric("Orcamento diario", f"R$ {budget_plan['Orcamento_Sugerido'].sum():,.2f}",
+                  f"{budget_plan['Orcamento_Sugerido'].sum() - budget_plan['Orcamento_Atual'].sum():+,.2f}")
+        o2.metric("Receita diaria projetada", f"R$ {budget_plan['Receita_Diaria_Projetada'].sum():,.2f}",
+                  f"{budget_plan['Ganho_Receita_Diaria'].sum():+,.2f}")
+        gasto_proj, receita_proj = budget_plan["Gasto_Projetado"].sum(), budget_plan["Receita_Diaria_Projetada"].sum()
+        o3.metric("ACOS projetado", f"{gasto_proj / receita_proj:.1%}" if receita_proj else "-")
+        o4.metric("Campanhas com mudanca", int((budget_plan["Orcamento_Sugerido"] - budget_plan["Orcamento_Atual"]).abs().gt(0.01).sum()))
+        paged_table("budget_plan", budget_plan, sort="Ganho_Receita_Diaria")
+
+        st.divider()
+
+        st.subheader("Painel de Controle Geral (todas as campanhas)")
+        paged_table("panel", panel, sort="ROAS_Real")
+
+        st.divider()
+
+        cC, cD = st.columns(2)
+        with cC:
+            st.subheader("Campanhas para PAUSAR/REVISAR")
+            paged_table("pause", pause, sort="Investimento", page_size=25)
+        with cD:
+            st.subheader("Anuncios para ENTRAR em Ads (organico forte)")
+            paged_table("enter", enter, sort="Visitas", page_size=25)
+
         st.divider()
 
-    st.subheader("Top 10 campanhas por Receita (fixo)")
-    bar = camp_agg.copy()
-    for col in ["Receita", "Investimento", "Vendas", "ROAS", "CVR"]:
-        if col in bar.columns:
-            bar[col] = bar[col].astype(float)
-    bar = bar.sort_values("Receita", ascending=False).head(10).set_index("Nome")
-    st.bar_chart(bar[["Receita"]])
-
-    st.divider()
-
-    st.subheader("Matriz de Oportunidade (Destaques)")
-    cA, cB = st.columns(2)
-    with cA:
-        st.write("Locomotivas (CPI 80% + perda por classificacao)")
-        st.dataframe(high["Locomotivas"], use_container_width=True)
-    with cB:
-        st.write("Minas Limitadas (ROAS alto + perda por orcamento)")
-        st.dataframe(high["Minas"], use_container_width=True)
-
-    st.divider()
-
-    st.subheader("Plano de Acao - 7 dias")
-    st.dataframe(plan7, use_container_width=True)
-
-    st.divider()
-
-    st.subheader("Painel de Controle Geral (todas as campanhas)")
-    st.dataframe(panel, use_container_width=True)
-
-    st.divider()
-
-    cC, cD = st.columns(2)
-    with cC:
-        st.subheader("Campanhas para PAUSAR/REVISAR")
-        st.dataframe(pause, use_container_width=True)
-    with cD:
-        st.subheader("Anuncios para ENTRAR em Ads (organico forte)")
-        st.dataframe(enter, use_container_width=True)
-
-with tab2:
-    st.subheader("Gerar relatorio final (Excel)")
-    if st.button("Gerar e baixar Excel"):
-        with st.spinner("Gerando Excel..."):
-            bytes_xlsx = ml.gerar_excel(kpis, camp_agg, pause, enter, scale, acos, camp_strat, daily=daily)
-
-        nome = f"Relatorio_ML_ADs_Estrategico_{datetime.now().strftime('%Y-%m-%d_%H%M')}.xlsx"
-        st.download_button(
-            "Baixar Excel",
-            data=bytes_xlsx,
-            file_name=nome,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        st.subheader("Ads canibalizando o organico")
+        st.caption("Anuncios em Ads que ja convertem bem no organico e tem a maior parte das vendas atribuida a Ads.")
+        paged_table("cannibal", ctx.cannibal)
+
+    with tab2:
+        st.subheader("Gerar relatorio final (Excel)")
+        st.selectbox("Formato", list(FORMATOS.keys()), key="formato_label")
+
+        def job_status():
+            bytes_xlsx = report_jobs.result(job.key)
+            if bytes_xlsx is not None:
+                nome = f"Relatorio_ML_ADs_Estrategico_{datetime.now().strftime('%Y-%m-%d_%H%M')}.{ext}"
+                st.download_button(
+                    "Baixar Excel",
+                    data=bytes_xlsx,
+                    file_name=nome,
+                    mime=mime
+                )
+                st.success("Relatorio pronto para as entradas e regras atuais.")
+            elif job.status == "erro":
+                st.error(f"Falha ao gerar o relatorio: {job.future.exception()}")
+            else:
+                st.progress(job.progress, text=f"Gerando em segundo plano... ({job.etapa or 'na fila'})")
+
+        # Atualiza so este bloco enquanto o job roda (sem st.fragment, o usuario atualiza manualmente)
+        if hasattr(st, "fragment"):
+            st.fragment(run_every=1)(job_status)()
+        else:
+            job_status()
+            if report_jobs.result(job.key) is None:
+                st.button("Atualizar status")
+
+    with tab3:
+        st.subheader("Sensibilidade das regras de estrategia")
+        rotulos = {
+            "roas_mina": "MINA: ROAS min.",
+            "lost_budget_mina": "MINA: Perda por orcamento min. (%)",
+            "lost_rank_gigante": "GIGANTE: Perda por classificacao min. (%)",
+            "roas_hemorragia": "HEMORRAGIA: ROAS max.",
+            "acos_over_pct": "HEMORRAGIA: ACOS acima do objetivo (fracao)",
+        }
+        faixas = {
+            "roas_mina": (2.0, 15.0),
+            "lost_budget_mina": (0.0, 90.0),
+            "lost_rank_gigante": (0.0, 90.0),
+            "roas_hemorragia": (0.5, 8.0),
+            "acos_over_pct": (0.0, 1.0),
+        }
+        metricas = ml.QUADRANTES + ["Share_Invest_Hemorragia", "Potencial_Receita_Minas", "Potencial_Receita_Todas_Minas"]
+
+        h1, h2, h3, h4 = st.columns(4)
+        with h1:
+            eixo_x = st.selectbox("Eixo X", list(rotulos), format_func=rotulos.get, index=0)
+        with h2:
+            eixo_y = st.selectbox("Eixo Y", [k for k in rotulos if k != eixo_x], format_func=rotulos.get, index=0)
+        with h3:
+            metrica = st.selectbox("Metrica", metricas, index=metricas.index("Share_Invest_Hemorragia"))
+        with h4:
+            passos = st.slider("Passos por eixo", min_value=5, max_value=40, value=20)
+
+        # Demais regras ficam nos valores escolhidos em "Regras"
+        grid = {k: [ctx.params[k]] for k in ml.STRATEGY_DEFAULTS}
+        grid[eixo_x] = np.linspace(*faixas[eixo_x], passos).round(3).tolist()
+        grid[eixo_y] = np.linspace(*faixas[eixo_y], passos).round(3).tolist()
+        sweep = ctx.sweep(grid)
+
+        heat = alt.Chart(sweep).mark_rect().encode(
+            x=alt.X(f"{eixo_x}:O", title=rotulos[eixo_x]),
+            y=alt.Y(f"{eixo_y}:O", title=rotulos[eixo_y], sort="descending"),
+            color=alt.Color(f"{metrica}:Q", title=metrica),
+            tooltip=[eixo_x, eixo_y] + metricas,
         )
-        st.success("OK")
+        st.altair_chart(heat, use_container_width=True)
+        st.caption(f"{len(sweep)} combinacoes avaliadas numa unica passada.")
+        with st.expander("Tabela completa"):
+            st.dataframe(sweep, use_container_width=True)
+
+    with tab4:
+        if not HAS_SNAPSHOTS:
+            st.info("Snapshots requerem pyarrow (pip install pyarrow).")
+        else:
+            store = get_snapshot_store()
+            st.subheader("Salvar snapshot")
+            st.caption("Guarda camp, camp_agg, camp_strat, org, pat, daily e os KPIs desta execucao (Arrow, reaberto por memory map).")
+            n1, n2, n3 = st.columns([3, 2, 1])
+            rotulo = n1.text_input("Rotulo", value="", placeholder="ex.: semana 42")
+            auto = n2.checkbox("Salvar automaticamente a cada nova entrada/regra", value=False)
+            # Uma vez por combinacao de entradas e regras, nao a cada rerun
+            snap_key = report_key(input_hashes, modo_key, "", ctx.params, compacto=compacto)
+            ja_salvo = st.session_state.get("snapshot_saved_key") == snap_key
+            salvar = n3.button("Salvar", disabled=snapshot is not None)
+            if snapshot is None and (salvar or (auto and not ja_salvo)):
+                novo = store.save(ctx, rotulo=rotulo, entradas=input_hashes)
+                st.session_state["snapshot_saved_key"] = snap_key
+                st.success(f"Snapshot salvo: {novo}")
+
+            st.subheader("Comparar snapshots")
+            lista = store.list()
+            if len(lista) < 2:
+                st.caption("Salve ao menos dois snapshots para comparar.")
+            else:
+                d1, d2 = st.columns(2)
+                id_a = d1.selectbox("A (antes)", lista["id"], index=1, format_func=lambda i: snapshot_label(lista, i))
+                id_b = d2.selectbox("B (depois)", lista["id"], index=0, format_func=lambda i: snapshot_label(lista, i))
+                snap_a, snap_b = load_snapshot(id_a), load_snapshot(id_b)
+                st.dataframe(diff_kpis(snap_a, snap_b), use_container_width=True, hide_index=True)
+                mudaram, transicoes = diff_quadrants(snap_a, snap_b)
+                st.caption("Campanhas por quadrante: linhas = A, colunas = B.")
+                st.dataframe(transicoes, use_container_width=True)
+                st.caption(f"{len(mudaram)} campanha(s) mudaram de quadrante.")
+                paged_table("snapshot_diff", mudaram, sort="Investimento_B")
+
+    if prof is not None:
+        prof.stop()
+        with st.sidebar.expander("Performance", expanded=True):
+            perf = prof.summary()
+            if perf.empty:
+                st.caption("Nenhuma etapa recalculada neste rerun (tudo veio do cache).")
+            else:
+                perf["ms"] = (perf["segundos"] * 1000).round(1)
+                perf["etapa"] = ["  " * n + e for n, e in zip(perf["nivel"], perf["etapa"])]
+                st.dataframe(
+                    perf[["etapa", "ms", "linhas_in", "linhas_out", "pico_mb"]],
+                    use_container_width=True, hide_index=True,
+                )
+                st.caption(f"Total medido: {perf.loc[perf['nivel'] == 0, 'segundos'].sum():.2f}s")
+finally:
+    if prof is not None:
+        prof.stop()
+    ml.set_profiler(None)
@@ -0,0 +1,472 @@
+import argparse
+import json
+import os
+import subprocess
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ml_report as ml
+import ml_synth
+from ml_table import TableView
+from tests.strategy_reference import add_strategy_fields_rowwise
+
+
+def make_camp_agg(n: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    invest = rng.gamma(2.0, 150.0, n)
+    invest[rng.random(n) < 0.05] = 0.0
+    roas = rng.lognormal(1.3, 0.8, n)
+    receita = invest * roas
+    receita[rng.random(n) < 0.03] = np.nan
+    acos_obj = rng.choice([np.nan, 0.15, 0.25, 12.0, 20.0, 35.0], n)
+    return pd.DataFrame({
+        "Nome": [f"Campanha {i}" for i in range(n)],
+        "Status": rng.choice(["Ativa", "Pausada"], n),
+        "Orçamento": rng.choice([20.0, 50.0, 100.0, 300.0], n),
+        "ACOS Objetivo": acos_obj,
+        "Impressões": rng.integers(0, 200_000, n).astype(float),
+        "Cliques": rng.integers(0, 5_000, n).astype(float),
+        "Receita": receita,
+        "Investimento": invest,
+        "Vendas": rng.integers(0, 300, n).astype(float),
+        "ROAS": roas,
+        "CVR": rng.random(n) * 0.1,
+        "Perdidas_Orc": rng.random(n) * 100.0,
+        "Perdidas_Class": rng.random(n) * 100.0,
+    })
+
+
+def _timeit(fn, *args, repeat: int = 1, **kwargs) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_strategy(sizes, rowwise_max: int) -> None:
+    print(f"{'linhas':>10} {'vetorizado (s)':>15} {'linha a linha (s)':>18} {'speedup':>9}")
+    for n in sizes:
+        camp_agg = make_camp_agg(n)
+        t_vec = _timeit(ml.add_strategy_fields, camp_agg, repeat=3)
+        if n <= rowwise_max:
+            t_row = _timeit(add_strategy_fields_rowwise, camp_agg)
+            print(f"{n:>10} {t_vec:>15.4f} {t_row:>18.4f} {t_row / t_vec:>8.1f}x")
+        else:
+            print(f"{n:>10} {t_vec:>15.4f} {'-':>18} {'-':>9}")
+
+
+def _peak_mb(fn, *args, **kwargs) -> float:
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    finally:
+        tracemalloc.stop()
+
+
+def bench_ingestion(sizes) -> None:
+    # Paridade entre engines fica em tests/test_excel_engines.py; aqui so tempo e memoria
+    engines = [e for e in ml.EXCEL_ENGINES if e != "calamine" or ml._has_module("python_calamine")]
+    print(f"{'linhas':>10} {'arquivo':>10} {'engine':>16} {'tempo (s)':>10} {'pico (MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            campanhas = os.path.join(tmp, f"campanhas_{n}.xlsx")
+            organico = os.path.join(tmp, f"organico_{n}.xlsx")
+            ml_synth.write_campanhas_xlsx(campanhas, max(1, n // 30), days=30)
+            ml_synth.write_organico_xlsx(organico, n)
+            for label, loader, path in (("campanhas", ml.load_campanhas_diario, campanhas),
+                                        ("organico", ml.load_organico, organico)):
+                for engine in engines:
+                    t = _timeit(loader, path, engine=engine)
+                    peak = _peak_mb(loader, path, engine=engine)
+                    print(f"{n:>10} {label:>10} {engine:>16} {t:>10.3f} {peak:>10.1f}")
+
+
+def bench_multifile(n_files: int, n_campaigns: int, days: int) -> None:
+    """Export diario dividido em n_files arquivos: leitura em sequencia vs. processos (ml.load_exports)."""
+    print(f"cpus: {os.cpu_count()}  arquivos: {n_files}  campanhas: {n_campaigns}  dias/arquivo: {days}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(n_files):
+            path = os.path.join(tmp, f"campanhas_{i}.xlsx")
+            ml_synth.write_campanhas_xlsx(path, n_campaigns, days=days, seed=44 + i)
+            paths.append(path)
+        t_one = _timeit(ml.load_exports, paths[:1])
+        t_seq = _timeit(ml.load_exports, paths, workers=1)
+        ml.load_exports(paths)  # sobe o pool antes de medir
+        t_par = _timeit(ml.load_exports, paths)
+        seq, par = ml.load_exports(paths, workers=1)[1], ml.load_exports(paths)[1]
+        pd.testing.assert_frame_equal(seq, par)
+    print(f"{'1 arquivo (s)':>14} {'sequencial (s)':>15} {'processos (s)':>14} {'linhas':>10}")
+    print(f"{t_one:>14.2f} {t_seq:>15.2f} {t_par:>14.2f} {len(par):>10}")
+
+
+def make_report_inputs(n: int, seed: int = 42) -> tuple:
+    rng = np.random.default_rng(seed)
+    camp_agg = make_camp_agg(n, seed=seed)
+    n_org = n * 5
+    org = pd.DataFrame({
+        "ID": [str(1_000_000 + i) for i in range(n_org)],
+        "Titulo": [f"Produto {i}" for i in range(n_org)],
+        "Visitas": rng.integers(0, 2_000, n_org).astype(float),
+        "Qtd_Vendas": rng.integers(0, 100, n_org).astype(float),
+        "Vendas_Brutas": rng.random(n_org) * 5_000,
+        "Conv_Visitas_Vendas": rng.random(n_org) * 0.15,
+    })
+    pat = pd.DataFrame({"ID": org["ID"].sample(frac=0.4, random_state=seed).to_numpy()})
+    kpis, pause, enter, scale, acos, camp_strat = ml.build_tables(org, camp_agg, pat)
+    return kpis, camp_agg, pause, enter, scale, acos, camp_strat
+
+
+def _write_once(n: int, formato: str, path: str) -> tuple:
+    args = make_report_inputs(n)
+    sheets = ml.report_sheets(*args)
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    ml.write_report(sheets, path, formato=formato)
+    elapsed = time.perf_counter() - t0
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss em KB no Linux; o aumento do pico durante a escrita e atribuido ao modo
+    return elapsed, (rss1 - rss0) / 1024, os.path.getsize(path) / 1024 ** 2
+
+
+def bench_writer(sizes) -> None:
+    formatos = [f for f in ml.REPORT_FORMATS if f != "parquet" or ml._has_module("pyarrow")]
+    print(f"{'campanhas':>10} {'formato':>12} {'tempo (s)':>10} {'+pico RSS (MB)':>15} {'arquivo (MB)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            for formato in formatos:
+                path = os.path.join(tmp, f"relatorio_{n}_{formato}")
+                # Processo novo por medicao para que o pico de RSS de um modo nao contamine o outro
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    t, rss, size = pool.submit(_write_once, n, formato, path).result()
+                print(f"{n:>10} {formato:>12} {t:>10.2f} {rss:>15.1f} {size:>13.2f}")
+
+
+def make_raw_inputs(n_listings: int, n_campaigns: int, days: int = 30, seed: int = 42) -> tuple:
+    rng = np.random.default_rng(seed)
+    org = pd.DataFrame({
+        "ID": [str(1_000_000_000 + i) for i in range(n_listings)],
+        "Titulo": [f"Produto {i}" for i in range(n_listings)],
+        "Status": rng.choice(["Ativo", "Pausado", "Inativo"], n_listings),
+        "Visitas": rng.integers(0, 2_000, n_listings).astype(float),
+        "Qtd_Vendas": rng.integers(0, 100, n_listings).astype(float),
+        "Vendas_Brutas": rng.random(n_listings) * 5_000,
+        "Conv_Visitas_Vendas": rng.random(n_listings) * 0.15,
+    })
+    n_pat = n_listings // 4
+    pat = pd.DataFrame({
+        "ID": org["ID"].sample(n_pat, random_state=seed).to_numpy(),
+        "Impressões": rng.integers(0, 50_000, n_pat).astype(float),
+        "Cliques": rng.integers(0, 500, n_pat).astype(float),
+    })
+    n = n_campaigns * days
+    camp = pd.DataFrame({
+        "Desde": np.repeat(pd.date_range("2024-01-01", periods=days), n_campaigns),
+        "Nome": np.tile([f"Campanha {i}" for i in range(n_campaigns)], days),
+        "Status": rng.choice(["Ativa", "Pausada"], n),
+        "Orçamento": rng.choice([20.0, 50.0, 100.0], n),
+        "ACOS Objetivo": rng.choice([15.0, 20.0, 30.0], n),
+        "Impressões": rng.integers(0, 10_000, n).astype(float),
+        "Cliques": rng.integers(0, 200, n).astype(float),
+        "Receita\n(Moeda local)": rng.random(n) * 500,
+        "Investimento\n(Moeda local)": rng.random(n) * 80,
+        "Vendas por publicidade\n(Diretas + Indiretas)": rng.integers(0, 10, n).astype(float),
+        "ROAS\n(Receitas / Investimento)": rng.random(n) * 10,
+        "CVR\n(Conversion rate)": rng.random(n) * 0.05,
+        "% de impressões perdidas por orçamento": rng.random(n) * 100,
+        "% de impressões perdidas por classificação": rng.random(n) * 100,
+    })
+    return org, camp, pat
+
+
+def bench_backends(sizes, repeat: int = 3) -> None:
+    """Agregacoes por dia/campanha em cada backend de ml.AGG_BACKENDS (paridade em tests/test_agg_backends.py)."""
+    print(f"cpus: {os.cpu_count()}")
+    print(f"{'campanhas':>10} {'dias':>5} {'linhas':>10} {'etapa':>24} {'backend':>8} {'tempo (s)':>10} {'speedup':>8}")
+    for n_campaigns, days in sizes:
+        _, camp, _ = make_raw_inputs(10, n_campaigns, days)
+        for name, fn in (("build_daily_from_diario", ml.build_daily_from_diario),
+                         ("build_campaign_agg", lambda df, backend: ml.build_campaign_agg(df, "diario", backend=backend))):
+            base = None
+            for backend in ml.AGG_BACKENDS:
+                secs = _timeit(fn, camp, backend=backend, repeat=repeat)
+                base = base or secs
+                print(f"{n_campaigns:>10} {days:>5} {len(camp):>10} {name:>24} {backend:>8} {secs:>10.3f} {base / secs:>7.2f}x")
+
+
+def _br_text(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    # Celulas como o export as vezes traz: "R$ 1.234,56", "12,5%" e milhar com ponto
+    out = df.copy()
+    for col, kind in schema.items():
+        if col not in out.columns or kind == "date":
+            continue
+        v = out[col].to_numpy(dtype="float64")
+        txt = pd.Series(v).map(lambda x: f"{x:,.2f}").str.replace(",", "_").str.replace(".", ",").str.replace("_", ".")
+        out[col] = ("R$ " + txt) if kind == "num" else (txt + "%")
+    return out
+
+
+def bench_schema(sizes, repeat: int = 3) -> None:
+    """Custo de apply_schema na leitura vs. tempo economizado nos builders por receber frames ja tipados."""
+    print(f"{'campanhas':>10} {'dias':>5} {'linhas':>10} {'schema pt-BR (s)':>17} {'schema numerico (s)':>20} "
+          f"{'builders object (s)':>20} {'builders tipado (s)':>20} {'economia (s)':>13}")
+    for n_campaigns, days in sizes:
+        org, camp, pat = make_raw_inputs(n_campaigns * 5, n_campaigns, days)
+        text = _br_text(camp, ml.CAMPANHAS_SCHEMA)
+        t_text = _timeit(lambda: ml.apply_schema(text.copy(), ml.CAMPANHAS_SCHEMA), repeat=repeat)
+        t_num = _timeit(lambda: ml.apply_schema(camp.copy(), ml.CAMPANHAS_SCHEMA), repeat=repeat)
+        typed = ml.apply_schema(camp.copy(), ml.CAMPANHAS_SCHEMA)
+        # Mesmos valores em colunas object: o caminho de to_numeric que os builders faziam antes
+        untyped = typed.astype({c: object for c in ml.CAMPANHAS_NUM_COLS if c in typed.columns})
+
+        def downstream(df):
+            ctx = ml.ReportContext(org, df, pat, modo="diario")
+            return [ctx.get(name) for name in ("kpis", "pause", "scale", "acos", "diagnosis", "budget_plan", "facts")]
+
+        t_obj = _timeit(downstream, untyped, repeat=repeat)
+        t_typed = _timeit(downstream, typed, repeat=repeat)
+        print(f"{n_campaigns:>10} {days:>5} {len(camp):>10} {t_text:>17.3f} {t_num:>20.3f} "
+              f"{t_obj:>20.3f} {t_typed:>20.3f} {t_obj - t_typed:>13.3f}")
+
+
+def _arrow_bytes(df: pd.DataFrame) -> int:
+    # O que o st.dataframe serializa e envia ao navegador: o frame inteiro em Arrow IPC
+    import pyarrow as pa
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def bench_tables(sizes, page_size: int = 50, repeat: int = 3) -> None:
+    """Custo por rerun das tabelas do painel: frame inteiro vs. uma pagina do TableView.
+
+    "antes" serializa os frames completos (o que o st.dataframe faz); "1a consulta"
+    inclui montar o TableView e ordenar; "rerun" reaproveita os indices em cache.
+    Mede so o lado do servidor; a renderizacao no navegador nao entra.
+    """
+    print(f"{'campanhas':>10} {'tabela':>12} {'linhas':>8} {'antes (s)':>10} {'antes (MB)':>11} "
+          f"{'1a consulta (s)':>16} {'rerun (s)':>10} {'pagina (KB)':>12}")
+    for n in sizes:
+        camp_strat = ml.add_strategy_fields(make_camp_agg(n))
+        tables = {
+            "camp_strat": (camp_strat, "ROAS_Real"),
+            "panel": (ml.build_control_panel(camp_strat), "ROAS_Real"),
+            "plan7": (ml.build_7_day_plan(camp_strat), "Dia"),
+            "budget_plan": (ml.build_budget_plan(camp_strat), "Ganho_Receita_Diaria"),
+        }
+        tot = [0.0, 0, 0.0, 0.0]
+        for name, (df, col) in tables.items():
+            t_full = _timeit(_arrow_bytes, df, repeat=repeat)
+            full = _arrow_bytes(df)
+
+            def first(df=df, col=col):
+                return _arrow_bytes(TableView(df).query(sort=col, ascending=False, page_size=page_size)[0])
+
+            view = TableView(df)
+            view.query(sort=col, ascending=False, page_size=page_size)
+
+            def rerun(view=view, col=col):
+                return _arrow_bytes(view.query(sort=col, ascending=False, page=1, page_size=page_size)[0])
+
+            t_first = _timeit(first, repeat=repeat)
+            t_rerun = _timeit(rerun, repeat=repeat)
+            page = rerun()
+            for i, v in enumerate((t_full, full, t_first, t_rerun)):
+                tot[i] += v
+            print(f"{n:>10} {name:>12} {len(df):>8} {t_full:>10.4f} {full / 1024 ** 2:>11.2f} "
+                  f"{t_first:>16.4f} {t_rerun:>10.4f} {page / 1024:>12.1f}")
+        print(f"{n:>10} {'total':>12} {'':>8} {tot[0]:>10.4f} {tot[1] / 1024 ** 2:>11.2f} "
+              f"{tot[2]:>16.4f} {tot[3]:>10.4f}")
+
+
+def bench_memory(sizes) -> None:
+    print(f"{'anuncios':>10} {'frame':>12} {'linhas':>9} {'padrao (MB)':>12} {'compacto (MB)':>14} {'reducao':>8}")
+    for n in sizes:
+        org, camp, pat = make_raw_inputs(n, max(50, n // 100))
+        padrao = ml.ReportContext(org, camp, pat, modo="diario")
+        compacto = ml.ReportContext(
+            ml.compact_frame(org), ml.compact_frame(camp), ml.compact_frame(pat), modo="diario", compact=True
+        )
+        padrao.tables()
+        compacto.tables()
+        rep = padrao.memory_report().merge(compacto.memory_report(), on=["Frame", "Linhas"], suffixes=("_p", "_c"))
+        for row in rep.itertuples(index=False):
+            red = 1 - row.Bytes_c / row.Bytes_p if row.Bytes_p else 0.0
+            print(f"{n:>10} {row.Frame:>12} {row.Linhas:>9} {row.Bytes_p / 1024 ** 2:>12.2f} "
+                  f"{row.Bytes_c / 1024 ** 2:>14.2f} {red:>7.0%}")
+
+
+# rotulo -> (anuncios, campanhas, dias)
+STAGE_SIZES = {
+    "S": (10_000, 200, 30),
+    "M": (100_000, 1_000, 30),
+    "L": (500_000, 3_000, 60),
+}
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or "desconhecido"
+    except OSError:
+        return "desconhecido"
+
+
+def _parse_stage_size(label: str) -> tuple:
+    if label in STAGE_SIZES:
+        return STAGE_SIZES[label]
+    n_listings, n_campaigns, days = (int(x) for x in label.split(":"))
+    return n_listings, n_campaigns, days
+
+
+def _rows(obj) -> int:
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    if isinstance(obj, tuple):
+        return sum(_rows(o) for o in obj)
+    if isinstance(obj, dict):
+        return sum(_rows(o) for o in obj.values())
+    return 0
+
+
+def _measure(fn, repeat: int, memory: bool) -> tuple:
+    result, best = None, float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    peak = _peak_mb(fn) if memory else None
+    return result, best, peak
+
+
+def bench_stages(labels, repeat: int = 1, memory: bool = True) -> list:
+    """Tempo e pico de memoria de cada etapa do pipeline, sobre exportacoes sinteticas."""
+    commit = _git_commit()
+    records = []
+    print(f"{'tamanho':>16} {'etapa':>30} {'linhas in':>10} {'linhas out':>10} {'tempo (s)':>10} {'pico (MB)':>10}")
+    for label in labels:
+        n_listings, n_campaigns, days = _parse_stage_size(label)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = ml_synth.generate_exports(tmp, n_listings, n_campaigns, days)
+            state = {}
+
+            def stage(name, fn, rows_in=0):
+                result, secs, peak = _measure(fn, repeat, memory)
+                state[name] = result
+                rec = {"commit": commit, "tamanho": label, "anuncios": n_listings, "campanhas": n_campaigns,
+                       "dias": days, "etapa": name, "linhas_in": int(rows_in), "linhas_out": _rows(result),
+                       "segundos": round(secs, 6), "pico_mb": None if peak is None else round(peak, 3)}
+                records.append(rec)
+                peak_txt = "-" if peak is None else f"{peak:.1f}"
+                print(f"{label:>16} {name:>30} {rec['linhas_in']:>10} {rec['linhas_out']:>10} {secs:>10.3f} {peak_txt:>10}")
+                return result
+
+            org = stage("load_organico", lambda: ml.load_organico(paths["organico"]))
+            pat = stage("load_patrocinados", lambda: ml.load_patrocinados(paths["patrocinados"]))
+            camp = stage("load_campanhas_diario", lambda: ml.load_campanhas_diario(paths["campanhas_diario"]))
+            stage("load_campanhas_consolidado", lambda: ml.load_campanhas_consolidado(paths["campanhas_consolidado"]))
+            daily = stage("build_daily_from_diario", lambda: ml.build_daily_from_diario(camp), len(camp))
+            camp_agg = stage("build_campaign_agg", lambda: ml.build_campaign_agg(camp, "diario"), len(camp))
+            camp_strat = stage("add_strategy_fields", lambda: ml.add_strategy_fields(camp_agg), len(camp_agg))
+            tables = stage("build_tables", lambda: ml.build_tables(org, camp_agg, pat),
+                           len(org) + len(camp_agg) + len(pat))
+            trends = stage("build_campaign_trends", lambda: ml.build_campaign_trends(camp), len(camp))
+            stage("flag_anomalies", lambda: ml.flag_anomalies(camp), len(camp))
+            stage("build_executive_diagnosis", lambda: ml.build_executive_diagnosis(camp_strat, daily=daily, trends=trends),
+                  len(camp_strat))
+            stage("build_opportunity_highlights", lambda: ml.build_opportunity_highlights(camp_strat), len(camp_strat))
+            stage("build_7_day_plan", lambda: ml.build_7_day_plan(camp_strat), len(camp_strat))
+            stage("build_control_panel", lambda: ml.build_control_panel(camp_strat), len(camp_strat))
+            stage("build_budget_plan", lambda: ml.build_budget_plan(camp_strat, dias=days), len(camp_strat))
+            kpis, pause, enter, scale, acos, camp_strat = tables
+            stage("gerar_excel", lambda: ml.gerar_excel(kpis, camp_agg, pause, enter, scale, acos, camp_strat, daily=daily),
+                  _rows(tables) + len(camp_agg) + len(daily))
+    return records
+
+
+def compare_stages(base: list, new: list) -> None:
+    base_idx = {(r["tamanho"], r["etapa"]): r for r in base}
+    print(f"{'tamanho':>16} {'etapa':>30} {'antes (s)':>10} {'depois (s)':>10} {'razao':>7}")
+    for r in new:
+        b = base_idx.get((r["tamanho"], r["etapa"]))
+        if b is None:
+            continue
+        ratio = r["segundos"] / b["segundos"] if b["segundos"] else float("nan")
+        print(f"{r['tamanho']:>16} {r['etapa']:>30} {b['segundos']:>10.3f} {r['segundos']:>10.3f} {ratio:>6.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline ml_report")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--rowwise-max", type=int, default=100_000,
+                        help="maior tamanho em que a referencia linha a linha e executada")
+    parser.add_argument("--xlsx-sizes", default="10000,100000",
+                        help="linhas das planilhas geradas para o benchmark de leitura")
+    parser.add_argument("--writer-sizes", default="10000,100000",
+                        help="numero de campanhas no benchmark de escrita do relatorio")
+    parser.add_argument("--memory-sizes", default="100000,1000000",
+                        help="numero de anuncios no benchmark de memoria do modo compacto")
+    parser.add_argument("--stage-sizes", default="S,M",
+                        help="tamanhos da suite por etapa: S, M, L ou anuncios:campanhas:dias")
+    parser.add_argument("--backend-sizes", default="2000:365,20000:365",
+                        help="campanhas:dias do benchmark de backends de agregacao")
+    parser.add_argument("--table-sizes", default="10000,100000",
+                        help="campanhas para a suite de tabelas paginadas")
+    parser.add_argument("--multifile", default="4:300:30",
+                        help="arquivos:campanhas:dias por arquivo para a suite de leitura de varios arquivos")
+    parser.add_argument("--schema-sizes", default="2000:30,2000:365",
+                        help="campanhas:dias da suite de tipagem na leitura (apply_schema)")
+    parser.add_argument("--repeat", type=int, default=1, help="repeticoes por etapa (vale o melhor tempo)")
+    parser.add_argument("--no-memory", action="store_true", help="nao mede pico de memoria (mais rapido)")
+    parser.add_argument("--json", help="grava os resultados da suite por etapa neste arquivo")
+    parser.add_argument("--compare", help="JSON de uma execucao anterior para comparar com a atual")
+    parser.add_argument("--only", choices=["strategy", "ingestion", "writer", "memory", "backends", "tables", "multifile", "schema", "stages"])
+    args = parser.parse_args()
+    if args.only in (None, "strategy"):
+        sizes = [int(s) for s in args.sizes.split(",") if s]
+        bench_strategy(sizes, args.rowwise_max)
+    if args.only in (None, "ingestion"):
+        sizes = [int(s) for s in args.xlsx_sizes.split(",") if s]
+        bench_ingestion(sizes)
+    if args.only in (None, "writer"):
+        sizes = [int(s) for s in args.writer_sizes.split(",") if s]
+        bench_writer(sizes)
+    if args.only in (None, "memory"):
+        sizes = [int(s) for s in args.memory_sizes.split(",") if s]
+        bench_memory(sizes)
+    if args.only in (None, "backends"):
+        sizes = [tuple(int(x) for x in s.split(":")) for s in args.backend_sizes.split(",") if s]
+        bench_backends(sizes)
+    if args.only in (None, "multifile"):
+        bench_multifile(*(int(x) for x in args.multifile.split(":")))
+    if args.only in (None, "schema"):
+        sizes = [tuple(int(x) for x in s.split(":")) for s in args.schema_sizes.split(",") if s]
+        bench_schema(sizes)
+    if args.only in (None, "tables"):
+        sizes = [int(s) for s in args.table_sizes.split(",") if s]
+        bench_tables(sizes)
+    if args.only in (None, "stages"):
+        records = bench_stages([s for s in args.stage_sizes.split(",") if s], repeat=args.repeat,
+                               memory=not args.no_memory)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump(records, fh, ensure_ascii=False, indent=1)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as fh:
+                compare_stages(json.load(fh), records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import logging
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import ml_report as ml
+
+EXPORT_KINDS = ("organico", "campanhas", "patrocinados")
+
+
+def find_exports(account_dir: Path) -> dict:
+    """Arquivos de cada exportacao na pasta da conta, reconhecidos pelo conteudo (nao pelo nome).
+
+    Um export dividido em varios arquivos (ex.: um por periodo) vem como lista.
+    """
+    found = {}
+    for path in sorted(account_dir.glob("*.xlsx")):
+        if path.name.startswith("~$") or path.name.startswith("Relatorio_ML_ADs_Estrategico"):
+            continue
+        try:
+            kind = ml.sniff_workbook(path)["tipo"]
+        except ValueError:
+            continue
+        found.setdefault(kind, []).append(path)
+    missing = [k for k in EXPORT_KINDS if k not in found]
+    if missing:
+        raise FileNotFoundError(f"{account_dir.name}: arquivo(s) nao encontrado(s): {', '.join(missing)}")
+    return found
+
+
+def build_context(
+    organico_file,
+    campanhas_file,
+    patrocinados_file,
+    modo: str = "auto",
+    enter_visitas_min: int = 50,
+    enter_conv_min: float = 0.05,
+    pause_invest_min: float = 100.0,
+    pause_cvr_max: float = 0.01,
+    backend: str = None,
+    workers: int = None,
+) -> dict:
+    """Cada *_file pode ser um arquivo ou uma lista deles (lidos em paralelo e sem duplicadas)."""
+    frames = {}
+    for kind, files in (("organico", organico_file), ("patrocinados", patrocinados_file), ("campanhas", campanhas_file)):
+        files = files if isinstance(files, (list, tuple)) else [files]
+        infos = [ml.sniff_workbook(f) for f in files]
+        for f, info in zip(files, infos):
+            if info["tipo"] != kind:
+                raise ValueError(f"{f}: esperado export {kind}, encontrado {info['tipo']}")
+            if kind == "campanhas" and modo != "auto":
+                info["modo"] = modo
+        info, frames[kind] = ml.load_exports(files, infos=infos, workers=workers)
+        if kind == "campanhas":
+            modo = info["modo"]
+    org, pat, camp = frames["organico"], frames["patrocinados"], frames["campanhas"]
+
+    return ml.ReportContext(
+        org, camp, pat, modo=modo, backend=backend,
+        enter_visitas_min=enter_visitas_min,
+        enter_conv_min=enter_conv_min,
+        pause_invest_min=pause_invest_min,
+        pause_cvr_max=pause_cvr_max,
+    )
+
+
+def build_report(organico_file, campanhas_file, patrocinados_file, **kwargs) -> dict:
+    return build_context(organico_file, campanhas_file, patrocinados_file, **kwargs).sheets()
+
+
+def _setup_perf_log() -> None:
+    perf = logging.getLogger("ml_report.perf")
+    if not perf.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        perf.addHandler(handler)
+        perf.setLevel(logging.INFO)
+        perf.propagate = False
+
+
+def run_account(account_dir, out_dir, modo: str = "auto", rules: dict = None, formato: str = "xlsx",
+                profile: bool = False, snapshot_dir=None) -> dict:
+    account_dir, out_dir = Path(account_dir), Path(out_dir)
+    t0 = time.perf_counter()
+    result = {"conta": account_dir.name, "ok": False, "segundos": 0.0, "arquivo": None, "erro": None}
+    prof = None
+    if profile:
+        # Uma linha JSON por etapa no stderr, com o nome da conta
+        _setup_perf_log()
+        prof = ml.StageProfiler(memory=True, log=True, context={"conta": account_dir.name}).start()
+    try:
+        files = find_exports(account_dir)
+        # O lote ja usa um processo por conta; os arquivos de cada conta sao lidos em sequencia
+        ctx = build_context(files["organico"], files["campanhas"], files["patrocinados"], modo=modo, workers=1,
+                            **(rules or {}))
+        sheets = ctx.sheets()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        ext = "xlsx" if formato.startswith("xlsx") else "zip"
+        out = out_dir / f"Relatorio_ML_ADs_Estrategico_{account_dir.name}_{datetime.now().strftime('%Y-%m-%d_%H%M')}.{ext}"
+        ml.write_report(sheets, out, formato=formato)
+        result.update(ok=True, arquivo=str(out))
+        falhas = {kind: ml.parse_failures(getattr(ctx, attr)) for kind, attr in
+                  (("organico", "org"), ("campanhas", "camp"), ("patrocinados", "pat"))}
+        result["falhas_parse"] = {kind: f for kind, f in falhas.items() if f}
+        if snapshot_dir is not None:
+            from ml_snapshot import SnapshotStore
+            result["snapshot"] = SnapshotStore(Path(snapshot_dir) / account_dir.name).save(
+                ctx, rotulo=account_dir.name, entradas=[str(p) for ps in files.values() for p in ps],
+            )
+    except Exception as exc:
+        result["erro"] = f"{type(exc).__name__}: {exc}"
+        result["traceback"] = traceback.format_exc()
+    finally:
+        if prof is not None:
+            prof.stop()
+    result["segundos"] = time.perf_counter() - t0
+    return result
+
+
+def run_batch(root, out_dir, modo: str = "auto", workers: int = None, rules: dict = None,
+              formato: str = "xlsx", profile: bool = False, snapshot_dir=None) -> list:
+    root = Path(root)
+    accounts = sorted(p for p in root.iterdir() if p.is_dir())
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_account, acc, out_dir, modo, rules, formato, profile, snapshot_dir): acc for acc in accounts}
+        for fut in as_completed(futures):
+            try:
+                results.append(fut.result())
+            except Exception as exc:
+                # Worker morto (ex.: falta de memoria) nao derruba o lote
+                results.append({"conta": futures[fut].name, "ok": False, "segundos": 0.0,
+                                "arquivo": None, "erro": f"{type(exc).__name__}: {exc}"})
+    return sorted(results, key=lambda r: r["conta"])
+
+
+def print_summary(results: list, file=sys.stdout) -> None:
+    print(f"{'conta':<30} {'status':<6} {'tempo (s)':>9}  detalhe", file=file)
+    for r in results:
+        status = "OK" if r["ok"] else "ERRO"
+        detalhe = r["arquivo"] if r["ok"] else r["erro"]
+        print(f"{r['conta']:<30} {status:<6} {r['segundos']:>9.2f}  {detalhe}", file=file)
+        for kind, cols in (r.get("falhas_parse") or {}).items():
+            print(f"{'':<30} {'AVISO':<6} {'':>9}  {kind}: celulas nao numericas viraram vazio em "
+                  + ", ".join(f"{c.splitlines()[0]} ({n})" for c, n in cols.items()), file=file)
+    falhas = sum(1 for r in results if not r["ok"])
+    print(f"\n{len(results) - falhas} ok, {falhas} com erro, {sum(r['segundos'] for r in results):.1f}s somados por conta", file=file)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Gera o Relatorio_ML_ADs_Estrategico para cada subpasta de conta (organico, campanhas, patrocinados)."
+    )
+    parser.add_argument("entrada", help="pasta com uma subpasta por conta")
+    parser.add_argument("--saida", default=None, help="pasta de saida (padrao: a propria pasta de entrada)")
+    parser.add_argument("--modo", choices=["auto", "consolidado", "diario"], default="auto",
+                        help="modo do export de campanhas (padrao: detectado pela coluna Desde)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--formato", choices=ml.REPORT_FORMATS, default="xlsx")
+    parser.add_argument("--backend", choices=ml.AGG_BACKENDS, default=None,
+                        help="backend das agregacoes por campanha/dia (padrao: pandas)")
+    parser.add_argument("--profile", action="store_true",
+                        help="emite no stderr uma linha JSON por etapa (tempo, linhas, pico de memoria)")
+    parser.add_argument("--snapshots", default=None,
+                        help="pasta onde salvar um snapshot por conta (reaberto com ml_snapshot.py ou no app)")
+    parser.add_argument("--enter-visitas-min", type=int, default=50)
+    parser.add_argument("--enter-conv-pct", type=float, default=5.0)
+    parser.add_argument("--pause-invest-min", type=float, default=100.0)
+    parser.add_argument("--pause-cvr-pct", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    rules = {
+        "enter_visitas_min": args.enter_visitas_min,
+        "enter_conv_min": args.enter_conv_pct / 100.0,
+        "pause_invest_min": args.pause_invest_min,
+        "pause_cvr_max": args.pause_cvr_pct / 100.0,
+        "backend": args.backend,
+    }
+    results = run_batch(args.entrada, args.saida or args.entrada, modo=args.modo, workers=args.workers, rules=rules,
+                        formato=args.formato, profile=args.profile, snapshot_dir=args.snapshots)
+    print_summary(results)
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
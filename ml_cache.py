@@ -0,0 +1,173 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+def file_bytes(file) -> bytes:
+    if isinstance(file, (str, Path)):
+        return Path(file).read_bytes()
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    pos = file.tell()
+    data = file.read()
+    file.seek(pos)
+    return data
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParseCache:
+    """Cache de DataFrames lidos dos xlsx, indexado pelo hash do conteudo + loader + modo.
+
+    Mantem um LRU em memoria e, opcionalmente, grava os frames em Parquet num
+    diretorio local (requer pyarrow), removendo os arquivos mais antigos quando
+    o total passa de max_disk_bytes. Os frames devolvidos sao compartilhados:
+    quem chama nao deve altera-los in-place.
+    """
+
+    def __init__(self, max_items: int = 16, disk_dir=None, max_disk_bytes: int = 2 * 1024 ** 3):
+        self.max_items = max_items
+        self.disk_dir = Path(disk_dir) if (disk_dir and HAS_PARQUET) else None
+        self.max_disk_bytes = max_disk_bytes
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, data: bytes, loader, modo: str = "", **kwargs) -> str:
+        opts = "".join(f"-{k}={v}" for k, v in sorted(kwargs.items()))
+        return f"{content_hash(data)}-{loader.__name__}-{modo}{opts}"
+
+    def load(self, loader, file, modo: str = "", **kwargs) -> pd.DataFrame:
+        """kwargs sao repassados ao loader e fazem parte da chave do cache."""
+        data = file_bytes(file)
+        key = self.key(data, loader, modo, **kwargs)
+        df = self._get(key)
+        if df is None:
+            df = loader(BytesIO(data), **kwargs)
+            self._put_new(key, df)
+        return df
+
+    def load_many(self, loader, files, modo: str = "", kwargs_list=None, parse_many=None) -> list:
+        """Como load, para varios arquivos; devolve um frame por arquivo, na mesma ordem.
+
+        Os arquivos que nao estao no cache sao lidos juntos por
+        parse_many(loader, datas, kwargs_list) (ex.: ml_report.parse_exports,
+        que usa processos); sem parse_many, um a um.
+        """
+        datas = [file_bytes(f) for f in files]
+        kwargs_list = kwargs_list or [{} for _ in datas]
+        keys = [self.key(d, loader, modo, **kw) for d, kw in zip(datas, kwargs_list)]
+        frames = [self._get(k) for k in keys]
+        miss = [i for i, df in enumerate(frames) if df is None]
+        if miss:
+            if parse_many is not None:
+                parsed = parse_many(loader, [datas[i] for i in miss], [kwargs_list[i] for i in miss])
+            else:
+                parsed = [loader(BytesIO(datas[i]), **kwargs_list[i]) for i in miss]
+            for i, df in zip(miss, parsed):
+                self._put_new(keys[i], df)
+                frames[i] = df
+        return frames
+
+    def combined(self, key: str, build) -> pd.DataFrame:
+        """Frame derivado de varias leituras (ex.: arquivos concatenados), guardado so em memoria pela chave."""
+        key = f"combined-{content_hash(key.encode())}"
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return self._mem[key]
+        df = build()
+        self._put_mem(key, df)
+        return df
+
+    def _get(self, key: str):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._mem[key]
+
+        df = self._read_disk(key)
+        if df is not None:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            self._put_mem(key, df)
+        return df
+
+    def _put_new(self, key: str, df: pd.DataFrame) -> None:
+        with self._lock:
+            self.stats["misses"] += 1
+        self._put_mem(key, df)
+        self._write_disk(key, df)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.disk_dir is not None:
+            for p in self.disk_dir.glob("*.parquet"):
+                p.unlink(missing_ok=True)
+
+    def _put_mem(self, key: str, df: pd.DataFrame) -> None:
+        with self._lock:
+            self._mem[key] = df
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.parquet"
+
+    def _read_disk(self, key: str):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        if not path.exists():
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            path.unlink(missing_ok=True)
+            return None
+        path.touch()
+        return df
+
+    def _write_disk(self, key: str, df: pd.DataFrame) -> None:
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_suffix(".tmp")
+        try:
+            df.to_parquet(tmp)
+            tmp.replace(path)
+        except Exception:
+            # Colunas com tipos mistos podem nao ser serializaveis; fica so em memoria
+            tmp.unlink(missing_ok=True)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        files = sorted(self.disk_dir.glob("*.parquet"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        while files and total > self.max_disk_bytes:
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink(missing_ok=True)
+            with self._lock:
+                self.stats["disk_evictions"] += 1
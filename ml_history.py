@@ -0,0 +1,229 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Coluna do export diario -> coluna na tabela "diario"
+RAW_COLS = {
+    "Status": "status",
+    "Orçamento": "orcamento",
+    "ACOS Objetivo": "acos_objetivo",
+    "Impressões": "impressoes",
+    "Cliques": "cliques",
+    "Receita\n(Moeda local)": "receita",
+    "Investimento\n(Moeda local)": "investimento",
+    "Vendas por publicidade\n(Diretas + Indiretas)": "vendas",
+    "ROAS\n(Receitas / Investimento)": "roas",
+    "CVR\n(Conversion rate)": "cvr",
+    "% de impressões perdidas por orçamento": "perdidas_orc",
+    "% de impressões perdidas por classificação": "perdidas_class",
+}
+SUM_COLS = ["impressoes", "cliques", "receita", "investimento", "vendas"]
+MEAN_COLS = ["roas", "cvr", "perdidas_orc", "perdidas_class"]
+LAST_COLS = ["status", "orcamento", "acos_objetivo"]
+SERIE_COLS = ["investimento", "receita", "vendas", "cliques", "impressoes"]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS diario (
+    desde TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    status TEXT,
+    {", ".join(f"{c} REAL" for c in list(RAW_COLS.values())[1:])},
+    PRIMARY KEY (desde, nome)
+);
+CREATE INDEX IF NOT EXISTS diario_nome ON diario (nome, desde);
+CREATE TABLE IF NOT EXISTS serie (
+    desde TEXT PRIMARY KEY,
+    {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in SERIE_COLS)}
+);
+CREATE TABLE IF NOT EXISTS campanha (
+    nome TEXT PRIMARY KEY,
+    status TEXT,
+    orcamento REAL,
+    acos_objetivo REAL,
+    last_desde TEXT,
+    {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in SUM_COLS)},
+    {", ".join(f"{c}_sum REAL NOT NULL DEFAULT 0, {c}_n INTEGER NOT NULL DEFAULT 0" for c in MEAN_COLS)}
+);
+CREATE TABLE IF NOT EXISTS importacao (
+    origem TEXT PRIMARY KEY,
+    linhas INTEGER,
+    importado_em TEXT
+);
+"""
+
+
+def _nullable(values: np.ndarray) -> list:
+    return [None if (v is None or v != v) else v for v in values.tolist()]
+
+
+class HistoryStore:
+    """Historico diario de campanhas em SQLite, chaveado por Desde + Nome.
+
+    Cada export novo e mesclado como delta (o ultimo import vence em caso de
+    chave repetida) e as tabelas "serie" (soma por dia) e "campanha" (somas e
+    medias por campanha) sao atualizadas apenas com a diferenca entre as linhas
+    novas e as que elas substituem. Os ultimos valores (Status, Orcamento, ACOS
+    Objetivo) sao relidos do diario para as campanhas tocadas pelo merge.
+
+    A conexao e compartilhada entre threads (sessoes do Streamlit); leituras e
+    escritas passam pelo mesmo lock, entao nenhuma leitura ve um merge pela metade.
+    """
+
+    def __init__(self, path: str = "ml_history.sqlite"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def already_imported(self, origem: str) -> bool:
+        with self._lock:
+            return self._imported(origem)
+
+    def _imported(self, origem: str) -> bool:
+        cur = self._conn.execute("SELECT 1 FROM importacao WHERE origem = ?", (origem,))
+        return cur.fetchone() is not None
+
+    def merge(self, camp_diario: pd.DataFrame, origem: str = None) -> int:
+        """Mescla um frame de load_campanhas_diario e devolve quantas linhas entraram."""
+        new = self._normalize(camp_diario)
+        # Conexao compartilhada entre sessoes: tudo sob _lock, e a checagem de origem na mesma transacao
+        with self._lock, self._conn:
+            if origem is not None and self._imported(origem):
+                return 0
+            if len(new):
+                old = self._existing_rows(new)
+                self._upsert_raw(new)
+                self._apply_serie_delta(new, old)
+                self._apply_campanha_delta(new, old)
+            if origem is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO importacao VALUES (?, ?, ?)",
+                    (origem, int(len(new)), datetime.now().isoformat(timespec="seconds")),
+                )
+        return int(len(new))
+
+    def _normalize(self, camp: pd.DataFrame) -> pd.DataFrame:
+        df = pd.DataFrame({
+            "desde": pd.to_datetime(camp["Desde"], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "nome": camp["Nome"],
+        })
+        for src, dst in RAW_COLS.items():
+            if src in camp.columns:
+                col = camp[src] if dst == "status" else pd.to_numeric(camp[src], errors="coerce")
+            else:
+                col = None if dst == "status" else np.nan
+            df[dst] = col
+        df = df.dropna(subset=["desde", "nome"])
+        df["nome"] = df["nome"].astype(str)
+        # Chave repetida dentro do proprio export: vale a ultima linha
+        return df.drop_duplicates(subset=["desde", "nome"], keep="last").reset_index(drop=True)
+
+    def _existing_rows(self, new: pd.DataFrame) -> pd.DataFrame:
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS chaves (desde TEXT, nome TEXT)")
+        self._conn.execute("DELETE FROM chaves")
+        self._conn.executemany("INSERT INTO chaves VALUES (?, ?)", new[["desde", "nome"]].itertuples(index=False, name=None))
+        return pd.read_sql_query(
+            "SELECT d.* FROM diario d JOIN chaves k ON d.desde = k.desde AND d.nome = k.nome",
+            self._conn,
+        )
+
+    def _upsert_raw(self, new: pd.DataFrame) -> None:
+        cols = ["desde", "nome"] + list(RAW_COLS.values())
+        rows = zip(*(_nullable(new[c].to_numpy(dtype=object)) for c in cols))
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO diario ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            rows,
+        )
+
+    def _delta(self, new: pd.DataFrame, old: pd.DataFrame, cols: list) -> pd.DataFrame:
+        key = ["desde", "nome"]
+        n = new.set_index(key)[cols]
+        o = old.set_index(key)[cols].reindex(n.index)
+        return (n.fillna(0) - o.fillna(0)).reset_index()
+
+    def _apply_serie_delta(self, new: pd.DataFrame, old: pd.DataFrame) -> None:
+        delta = self._delta(new, old, SERIE_COLS).groupby("desde")[SERIE_COLS].sum().reset_index()
+        sets = ", ".join(f"{c} = {c} + excluded.{c}" for c in SERIE_COLS)
+        self._conn.executemany(
+            f"INSERT INTO serie (desde, {', '.join(SERIE_COLS)}) VALUES (?{', ?' * len(SERIE_COLS)}) "
+            f"ON CONFLICT(desde) DO UPDATE SET {sets}",
+            delta[["desde"] + SERIE_COLS].itertuples(index=False, name=None),
+        )
+
+    def _apply_campanha_delta(self, new: pd.DataFrame, old: pd.DataFrame) -> None:
+        key = ["desde", "nome"]
+        n = new.set_index(key)
+        o = old.set_index(key).reindex(n.index)
+
+        delta = pd.DataFrame(index=n.index)
+        for c in SUM_COLS:
+            delta[c] = n[c].fillna(0) - o[c].fillna(0)
+        for c in MEAN_COLS:
+            delta[f"{c}_sum"] = n[c].fillna(0) - o[c].fillna(0)
+            delta[f"{c}_n"] = n[c].notna().astype(int) - o[c].notna().astype(int)
+        agg = delta.groupby(level="nome").sum().reset_index()
+
+        add_cols = list(delta.columns)
+        cols = ["nome"] + add_cols
+        sets = ", ".join(f"{c} = {c} + excluded.{c}" for c in add_cols)
+        self._conn.executemany(
+            f"INSERT INTO campanha ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT(nome) DO UPDATE SET {sets}",
+            zip(*(_nullable(agg[c].to_numpy(dtype=object)) for c in cols)),
+        )
+
+        # Ultimos valores (Status, Orcamento, ACOS Objetivo) nao saem de um delta: a linha substituida
+        # pode ser a que os carregava. Recalcula no diario so para as campanhas tocadas (em "chaves").
+        last_sets = ", ".join(
+            f"{c} = (SELECT d.{c} FROM diario d WHERE d.nome = campanha.nome AND d.{c} IS NOT NULL "
+            f"ORDER BY d.desde DESC LIMIT 1)"
+            for c in LAST_COLS
+        )
+        self._conn.execute(
+            f"UPDATE campanha SET {last_sets}, "
+            f"last_desde = (SELECT MAX(d.desde) FROM diario d WHERE d.nome = campanha.nome) "
+            f"WHERE nome IN (SELECT nome FROM chaves)"
+        )
+
+    def daily(self) -> pd.DataFrame:
+        """Mesmo formato de ml_report.build_daily_from_diario."""
+        with self._lock:
+            d = pd.read_sql_query(f"SELECT desde, {', '.join(SERIE_COLS)} FROM serie ORDER BY desde", self._conn)
+        d["desde"] = pd.to_datetime(d["desde"])
+        return d.rename(columns={
+            "desde": "Desde", "investimento": "Investimento", "receita": "Receita",
+            "vendas": "Vendas", "cliques": "Cliques", "impressoes": "Impressoes",
+        })
+
+    def campaign_agg(self) -> pd.DataFrame:
+        """Mesmo formato de ml_report.build_campaign_agg(modo="diario")."""
+        means = ", ".join(f"CASE WHEN {c}_n > 0 THEN {c}_sum / {c}_n END AS {c}" for c in MEAN_COLS)
+        with self._lock:
+            c = pd.read_sql_query(
+                f"SELECT nome, status, orcamento, acos_objetivo, {', '.join(SUM_COLS)}, {means} "
+                f"FROM campanha ORDER BY nome",
+                self._conn,
+            )
+        return c.rename(columns={
+            "nome": "Nome", "status": "Status", "orcamento": "Orçamento", "acos_objetivo": "ACOS Objetivo",
+            "impressoes": "Impressões", "cliques": "Cliques", "receita": "Receita",
+            "investimento": "Investimento", "vendas": "Vendas", "roas": "ROAS", "cvr": "CVR",
+            "perdidas_orc": "Perdidas_Orc", "perdidas_class": "Perdidas_Class",
+        })
+
+    def raw(self, desde_min=None) -> pd.DataFrame:
+        """Linhas do historico com os nomes de coluna do export (formato de load_campanhas_diario)."""
+        sql, params = "SELECT * FROM diario", ()
+        if desde_min is not None:
+            sql, params = sql + " WHERE desde >= ?", (pd.Timestamp(desde_min).strftime("%Y-%m-%d %H:%M:%S"),)
+        with self._lock:
+            d = pd.read_sql_query(sql + " ORDER BY desde, nome", self._conn, params=params)
+        d["desde"] = pd.to_datetime(d["desde"])
+        return d.rename(columns={"desde": "Desde", "nome": "Nome", **{v: k for k, v in RAW_COLS.items()}})
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import ml_report as ml
+from ml_profile import set_profiler
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def report_key(input_hashes, modo: str, formato: str, params: dict, **extra) -> str:
+    """Chave do relatorio: hash dos arquivos de entrada + modo + formato + regras."""
+    payload = json.dumps(
+        {"inputs": list(input_hashes), "modo": modo, "formato": formato, "params": params, **extra},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Progress:
+    """Acompanha as etapas do pipeline na thread do job (mesmo protocolo do StageProfiler).
+
+    Antes de cada etapa verifica se o job foi cancelado; assim um job obsoleto
+    para na proxima fronteira de etapa em vez de ir ate o fim.
+    """
+
+    def __init__(self, job: "ReportJob"):
+        self.job = job
+        self._depth = 0
+
+    def run(self, name: str, fn, args, kwargs):
+        if self.job.cancel_event.is_set():
+            raise JobCancelled(self.job.key)
+        if self._depth == 0:
+            self.job.etapa = name
+        self._depth += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.job.etapas_ok += 1
+
+
+class ReportJob:
+    def __init__(self, key: str, formato: str):
+        self.key = key
+        self.formato = formato
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.etapa = None
+        self.etapas_ok = 0
+        # Sessoes (slots) esperando este job; so e cancelado quando nenhuma mais espera
+        self.slots = set()
+        # Etapas de nivel 0 de um relatorio completo (artefatos do ReportContext + report_sheets + write_report);
+        # a varredura de sensibilidade nao entra no relatorio
+        self.etapas_total = len(set(ml.ReportContext.DEPS) - {"sweep"}) + 2
+
+    @property
+    def progress(self) -> float:
+        if self.future is not None and self.future.done():
+            return 1.0
+        return min(0.95, self.etapas_ok / self.etapas_total)
+
+    @property
+    def status(self) -> str:
+        if self.cancel_event.is_set():
+            return "cancelado"
+        if self.future is None or not self.future.done():
+            return "executando" if self.etapa else "na fila"
+        return "erro" if self.future.exception() is not None else "pronto"
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class ReportJobs:
+    """Gera relatorios em segundo plano num pool de threads e guarda os bytes prontos.
+
+    Cada sessao tem um "slot": ao submeter uma chave nova para o mesmo slot o
+    job anterior e cancelado, se nenhum outro slot ainda o espera. Os
+    resultados ficam num LRU por chave, entao repetir o download (ou voltar a
+    regras ja usadas) nao gera de novo.
+    Os frames recebidos sao apenas lidos.
+    """
+
+    def __init__(self, workers: int = 2, max_results: int = 8):
+        self.max_results = max_results
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ml-report")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._slots = {}
+        self._results = OrderedDict()
+        self.stats = {"submetidos": 0, "reaproveitados": 0, "cancelados": 0}
+
+    def submit(self, slot: str, key: str, formato: str, org, camp, pat, modo: str = "consolidado",
+               seed: dict = None, compact: bool = False, **params) -> ReportJob:
+        """seed: artefatos ja calculados que nao dependem das regras (camp_agg, daily, camp_diario)."""
+        with self._lock:
+            old = self._slots.get(slot)
+            if old is not None and old.key != key:
+                old.slots.discard(slot)
+                if not old.slots and old.status in ("na fila", "executando"):
+                    old.cancel()
+                    self._jobs.pop(old.key, None)
+                    self.stats["cancelados"] += 1
+            job = self._jobs.get(key)
+            if job is not None and job.status != "cancelado" and job.status != "erro":
+                self._slots[slot] = job
+                job.slots.add(slot)
+                self.stats["reaproveitados"] += 1
+                return job
+            job = ReportJob(key, formato)
+            self._jobs[key] = job
+            self._slots[slot] = job
+            job.slots.add(slot)
+            self.stats["submetidos"] += 1
+            job.future = self._pool.submit(self._run, job, org, camp, pat, modo, dict(seed or {}), compact, params)
+            return job
+
+    def result(self, key: str):
+        with self._lock:
+            data = self._results.get(key)
+            if data is not None:
+                self._results.move_to_end(key)
+            return data
+
+    def _run(self, job: ReportJob, org, camp, pat, modo, seed, compact, params) -> None:
+        # Contexto proprio: o da sessao continua sendo alterado pela interface enquanto o job roda
+        set_profiler(_Progress(job))
+        try:
+            ctx = ml.ReportContext(org, camp, pat, modo=modo, compact=compact, **seed, **params)
+            out = BytesIO()
+            ml.write_report(ctx.sheets(), out, formato=job.formato)
+            data = out.getvalue()
+        finally:
+            set_profiler(None)
+        with self._lock:
+            self._results[job.key] = data
+            self._results.move_to_end(job.key)
+            while len(self._results) > self.max_results:
+                old_key, _ = self._results.popitem(last=False)
+                self._jobs.pop(old_key, None)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,152 @@
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import ml_synth
+from ml_server import encode_multipart
+
+# Um pedido num processo novo: o custo que o servico evita (interpretador + imports + relatorio)
+_COLD = """
+import sys, time
+t0 = time.perf_counter()
+import ml_server
+files = [(p, open(p, "rb").read()) for p in sys.argv[1:4]]
+ml_server.run_report(files, {}, sys.argv[4])
+print(time.perf_counter() - t0)
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get_json(url: str) -> dict:
+    with urllib.request.urlopen(url, timeout=10) as resp:
+        return json.loads(resp.read())
+
+
+def start_server(workers: int, fila: int) -> tuple:
+    """Sobe ml_server.py num subprocesso e espera o /health (inclui o aquecimento dos workers)."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("ml_server.py")), "--port", str(port),
+         "--workers", str(workers), "--fila", str(fila)],
+        # Nada de stdout herdado: um worker que sobrasse manteria o pipe de quem chamou aberto
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("ml_server.py terminou antes de ficar pronto")
+        try:
+            _get_json(url + "/health")
+            break
+        except OSError:
+            time.sleep(0.2)
+    return proc, url, time.perf_counter() - t0
+
+
+def stop_server(proc, timeout: float = 30.0) -> None:
+    """SIGTERM (o servidor encerra o pool) e, se nao sair a tempo, SIGKILL."""
+    proc.terminate()
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _post(url: str, body: bytes, content_type: str) -> tuple:
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as exc:
+        exc.read()
+        status = exc.code
+    return status, time.perf_counter() - t0
+
+
+def run_load(url: str, files: list, pedidos: int, concorrencia: int, formato: str) -> dict:
+    body, content_type = encode_multipart(files, {"formato": formato})
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        results = list(pool.map(lambda _: _post(url + "/report", body, content_type), range(pedidos)))
+    wall = time.perf_counter() - t0
+    ok = np.array([t for s, t in results if s == 200])
+    status = {}
+    for s, _ in results:
+        status[s] = status.get(s, 0) + 1
+    pct = np.percentile(ok, [50, 95, 99]) if len(ok) else [float("nan")] * 3
+    return {"pedidos": pedidos, "concorrencia": concorrencia, "segundos": wall, "status": status,
+            "throughput": len(ok) / wall, "p50": pct[0], "p95": pct[1], "p99": pct[2],
+            "max": ok.max() if len(ok) else float("nan")}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga do ml_server com exports sinteticos")
+    parser.add_argument("--url", default=None, help="servidor ja rodando (padrao: sobe um local)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--fila", type=int, default=8)
+    parser.add_argument("--anuncios", type=int, default=2_000)
+    parser.add_argument("--campanhas", type=int, default=100)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--pedidos", type=int, default=20)
+    parser.add_argument("--concorrencia", default="1,4,16", help="niveis de concorrencia, separados por virgula")
+    parser.add_argument("--formato", choices=["xlsx", "xlsx-stream", "parquet", "csv", "json"], default="xlsx")
+    parser.add_argument("--frio", type=int, default=2, help="pedidos em processo novo, para comparar (0 = nao mede)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = ml_synth.generate_exports(tmp, args.anuncios, args.campanhas, args.dias)
+        kinds = ("organico", "patrocinados", "campanhas_diario")
+        files = [(paths[k].name, paths[k].read_bytes()) for k in kinds]
+        print(f"exports: {args.anuncios} anuncios, {args.campanhas} campanhas x {args.dias} dias "
+              f"({sum(len(d) for _, d in files) / 1024 ** 2:.1f} MB), formato {args.formato}")
+
+        if args.frio:
+            cold = [float(subprocess.run(
+                [sys.executable, "-c", _COLD, *(str(paths[k]) for k in kinds), args.formato],
+                capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+            ).stdout) for _ in range(args.frio)]
+            print(f"processo novo por pedido: {np.mean(cold):.2f}s em media ({args.frio} pedidos, sem HTTP)")
+
+        proc = None
+        url = args.url
+        if url is None:
+            proc, url, boot = start_server(args.workers, args.fila)
+            print(f"servidor: {args.workers} workers, fila {args.fila}, pronto em {boot:.1f}s (inclui aquecimento)")
+        try:
+            print(f"{'conc.':>6} {'pedidos':>8} {'ok/s':>7} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} "
+                  f"{'max (s)':>8}  status")
+            for conc in (int(c) for c in args.concorrencia.split(",") if c):
+                r = run_load(url, files, args.pedidos, conc, args.formato)
+                print(f"{conc:>6} {r['pedidos']:>8} {r['throughput']:>7.2f} {r['p50']:>8.2f} {r['p95']:>8.2f} "
+                      f"{r['p99']:>8.2f} {r['max']:>8.2f}  {r['status']}")
+            m = _get_json(url + "/metrics")
+            print("\nfases no servidor (p95, s): " + ", ".join(
+                f"{f}={v['p95']:.3f}" for f, v in m["latencia_s"].items() if v["p95"] is not None))
+            print(f"recusados (503): {m['recusados']}, timeouts: {m['timeout']}, erros: {m['erro']}")
+        finally:
+            if proc is not None:
+                stop_server(proc)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
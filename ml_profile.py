@@ -0,0 +1,154 @@
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+logger = logging.getLogger("ml_report.perf")
+
+_active = contextvars.ContextVar("ml_report_profiler", default=None)
+
+
+# tracemalloc e global ao processo: profilers com memory=True (ex.: sessoes em threads)
+# compartilham o mesmo rastreamento, que so para quando o ultimo deles sai
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_ours = False
+
+
+def _acquire_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_ours
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            # Rastreamento ligado por fora (ex.: PYTHONTRACEMALLOC) nunca e desligado aqui
+            tracemalloc.start()
+            _tracemalloc_ours = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_ours
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_ours:
+            tracemalloc.stop()
+            _tracemalloc_ours = False
+
+
+def _rows(obj) -> int:
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, (tuple, list)):
+        return sum(_rows(o) for o in obj)
+    if isinstance(obj, dict):
+        return sum(_rows(o) for o in obj.values())
+    return 0
+
+
+def stage(fn):
+    """Marca uma funcao do pipeline como etapa medida pelo StageProfiler ativo.
+
+    Sem profiler ativo o custo e uma leitura de ContextVar por chamada.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        prof = _active.get()
+        if prof is None:
+            return fn(*args, **kwargs)
+        return prof.run(fn.__name__, fn, args, kwargs)
+    return wrapper
+
+
+def set_profiler(prof) -> None:
+    _active.set(prof)
+
+
+class StageProfiler:
+    """Registra tempo, linhas de entrada/saida e (opcional) pico de memoria por etapa.
+
+    Uso: `with StageProfiler() as prof: ...` ou start()/stop(). Com log=True
+    cada etapa tambem vai como uma linha JSON para o logger "ml_report.perf".
+    Pico de memoria usa tracemalloc, que deixa tudo mais lento; por isso e
+    opcional (memory=True). O tracemalloc e do processo: com dois profilers de
+    memoria ao mesmo tempo os picos de um incluem alocacoes do outro.
+    """
+
+    def __init__(self, memory: bool = False, log: bool = False, context: dict = None):
+        self.memory = memory
+        self.log = log
+        self.context = dict(context or {})
+        self.records = []
+        self._stack = []
+        self._token = None
+        self._tracing = False
+
+    def start(self) -> "StageProfiler":
+        if self.memory and not self._tracing:
+            _acquire_tracemalloc()
+            self._tracing = True
+        self._token = _active.set(self)
+        return self
+
+    def stop(self) -> None:
+        if self._token is not None:
+            _active.reset(self._token)
+            self._token = None
+        if self._tracing:
+            _release_tracemalloc()
+            self._tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def run(self, name: str, fn, args, kwargs):
+        entry = {"peak": 0, "start_mem": 0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # O reset abaixo apaga o pico da etapa externa; guarda antes
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            entry["start_mem"] = entry["peak"] = current
+            tracemalloc.reset_peak()
+        self._stack.append(entry)
+        ok = False
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - t0
+            self._stack.pop()
+            peak_mb = None
+            if self.memory:
+                entry["peak"] = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+                peak_mb = (entry["peak"] - entry["start_mem"]) / 1024 ** 2
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], entry["peak"])
+            self._record({
+                **self.context,
+                "etapa": name,
+                "nivel": len(self._stack),
+                "segundos": elapsed,
+                "linhas_in": _rows(list(args) + list(kwargs.values())),
+                "linhas_out": _rows(result) if ok else None,
+                "pico_mb": peak_mb,
+                "ok": ok,
+            })
+
+    def _record(self, rec: dict) -> None:
+        self.records.append(rec)
+        if self.log:
+            logger.info(json.dumps(rec, ensure_ascii=False, default=str))
+
+    def summary(self) -> pd.DataFrame:
+        cols = ["etapa", "nivel", "segundos", "linhas_in", "linhas_out", "pico_mb", "ok"]
+        return pd.DataFrame(self.records, columns=list(self.context) + cols)
@@ -1,98 +1,793 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+import warnings
+
+import numpy as np
 import pandas as pd
 from io import BytesIO
 
+from ml_profile import StageProfiler, set_profiler, stage  # noqa: F401
+
 EMOJI_GREEN = "\U0001F7E2"   # green circle
 EMOJI_YELLOW = "\U0001F7E1"  # yellow circle
 EMOJI_BLUE = "\U0001F535"    # blue circle
 EMOJI_RED = "\U0001F534"     # red circle
 
 
-def load_organico(organico_file) -> pd.DataFrame:
-    org = pd.read_excel(organico_file, header=4)
-    org.columns = [
-        "ID","Titulo","Status","Variacao","SKU",
-        "Visitas","Qtd_Vendas","Compradores",
-        "Unidades","Vendas_Brutas","Participacao",
-        "Conv_Visitas_Vendas","Conv_Visitas_Compradores"
-    ]
-    org = org[org["ID"] != "ID do anúncio"].copy()
+ORGANICO_COLS = [
+    "ID","Titulo","Status","Variacao","SKU",
+    "Visitas","Qtd_Vendas","Compradores",
+    "Unidades","Vendas_Brutas","Participacao",
+    "Conv_Visitas_Vendas","Conv_Visitas_Compradores"
+]
+
+PATROCINADOS_NUM_COLS = [
+    "Impressões","Cliques","Receita\n(Moeda local)","Investimento\n(Moeda local)",
+    "Vendas por publicidade\n(Diretas + Indiretas)"
+]
+PATROCINADOS_COLS = ["Código do anúncio"] + PATROCINADOS_NUM_COLS
+
+CAMPANHAS_NUM_COLS = [
+    "Impressões","Cliques","Receita\n(Moeda local)","Investimento\n(Moeda local)",
+    "Vendas por publicidade\n(Diretas + Indiretas)","ROAS\n(Receitas / Investimento)",
+    "CVR\n(Conversion rate)","% de impressões perdidas por orçamento",
+    "% de impressões perdidas por classificação","Orçamento","ACOS Objetivo"
+]
+CAMPANHAS_COLS = ["Desde","Nome","Status"] + CAMPANHAS_NUM_COLS
+
+# Tipo de cada coluna numerica/data na leitura (apply_schema). "num": numero, moeda ou
+# milhar pt-BR; "frac": "12,5%" vira 0.125; "pct": "12,5%" vira 12.5 (colunas ja em 0-100)
+ORGANICO_SCHEMA = {
+    "Visitas": "num", "Qtd_Vendas": "num", "Compradores": "num", "Unidades": "num",
+    "Vendas_Brutas": "num", "Participacao": "frac",
+    "Conv_Visitas_Vendas": "frac", "Conv_Visitas_Compradores": "frac",
+}
+PATROCINADOS_SCHEMA = {c: "num" for c in PATROCINADOS_NUM_COLS}
+CAMPANHAS_SCHEMA = {
+    "Desde": "date",
+    **{c: "num" for c in CAMPANHAS_NUM_COLS},
+    "CVR\n(Conversion rate)": "frac",
+    "% de impressões perdidas por orçamento": "pct",
+    "% de impressões perdidas por classificação": "pct",
+    "ACOS Objetivo": "pct",
+}
+
+SHEET_PATROCINADOS = "Relatório Anúncios patrocinados"
+SHEET_CAMPANHAS = "Relatório de campanha"
+
+
+def _has_module(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
 
-    for c in ["Visitas","Qtd_Vendas","Compradores","Unidades","Vendas_Brutas",
-              "Participacao","Conv_Visitas_Vendas","Conv_Visitas_Compradores"]:
-        org[c] = pd.to_numeric(org[c], errors="coerce")
 
-    org["ID"] = org["ID"].astype(str).str.replace("MLB", "", regex=False)
-    return org
+# "calamine" (python-calamine, mais rapido), "openpyxl-stream" (leitura em streaming
+# so das colunas usadas) ou "openpyxl" (pd.read_excel completo, comportamento antigo)
+EXCEL_ENGINES = ["calamine", "openpyxl-stream", "openpyxl"]
+EXCEL_ENGINE = "calamine" if _has_module("python_calamine") else "openpyxl-stream"
 
 
-def load_patrocinados(patrocinados_file) -> pd.DataFrame:
-    pat = pd.read_excel(patrocinados_file, sheet_name="Relatório Anúncios patrocinados", header=1)
-    pat["ID"] = pat["Código do anúncio"].astype(str).str.replace("MLB", "", regex=False)
+def _header_names(row) -> list:
+    names, seen = [], {}
+    for i, v in enumerate(row):
+        name = f"Unnamed: {i}" if v is None or v == "" else v
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
 
-    for c in ["Impressões","Cliques","Receita\n(Moeda local)","Investimento\n(Moeda local)",
-              "Vendas por publicidade\n(Diretas + Indiretas)"]:
-        if c in pat.columns:
-            pat[c] = pd.to_numeric(pat[c], errors="coerce")
-    return pat
+_EXCEL_ERRORS = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"}
 
 
-def _coerce_campaign_numeric(df: pd.DataFrame) -> pd.DataFrame:
-    cols_num = [
-        "Impressões","Cliques","Receita\n(Moeda local)","Investimento\n(Moeda local)",
-        "Vendas por publicidade\n(Diretas + Indiretas)","ROAS\n(Receitas / Investimento)",
-        "CVR\n(Conversion rate)","% de impressões perdidas por orçamento",
-        "% de impressões perdidas por classificação","Orçamento","ACOS Objetivo"
+def _stream_cell(v):
+    if v is None or v == "":
+        return np.nan
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, str) and v in _EXCEL_ERRORS:
+        return np.nan
+    return v
+
+
+def _read_sheet_stream(file, sheet_name=0, header: int = 0, usecols=None) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+        for _ in range(header):
+            next(rows, None)
+        names = _header_names(next(rows, ()) or ())
+
+        if usecols is None:
+            idx = list(range(len(names)))
+        else:
+            wanted = set(usecols)
+            idx = [i for i, n in enumerate(names) if n in wanted]
+
+        cols = [[] for _ in idx]
+        n_rows, last_with_data = 0, -1
+        for row in rows:
+            width = len(row)
+            if row.count(None) != width:
+                last_with_data = n_rows
+            if usecols is None and width > len(names):
+                # Linha mais larga que o cabecalho: colunas extras sem nome, como no pd.read_excel
+                for i in range(len(names), width):
+                    names.append(f"Unnamed: {i}")
+                    idx.append(i)
+                    cols.append([np.nan] * n_rows)
+            for col, i in zip(cols, idx):
+                col.append(_stream_cell(row[i]) if i < width else np.nan)
+            n_rows += 1
+    finally:
+        wb.close()
+
+    # Linhas vazias no fim da planilha sao descartadas, como no pd.read_excel
+    keep = last_with_data + 1
+    return pd.DataFrame({names[i]: col[:keep] for col, i in zip(cols, idx)}, columns=[names[i] for i in idx])
+
+
+def read_sheet(file, sheet_name=0, header: int = 0, usecols=None, engine: str = None) -> pd.DataFrame:
+    engine = engine or EXCEL_ENGINE
+    if engine == "openpyxl-stream":
+        return _read_sheet_stream(file, sheet_name=sheet_name, header=header, usecols=usecols)
+    if usecols is not None:
+        wanted = set(usecols)
+        return pd.read_excel(file, sheet_name=sheet_name, header=header,
+                             usecols=lambda c: c in wanted, engine=engine)
+    return pd.read_excel(file, sheet_name=sheet_name, header=header, engine=engine)
+
+
+# Inteiros ate este limite viram int32; a folga evita estouro em somas/diferencas elemento a elemento
+_INT32_SAFE = 2 ** 30
+
+
+def _compact_ids(s: pd.Series) -> pd.Series:
+    ids = pd.to_numeric(s, errors="coerce")
+    if len(s) and ids.notna().all() and (ids == ids.round()).all():
+        return ids.astype("int64")
+    return s
+
+
+@stage
+def compact_frame(df: pd.DataFrame, category_max_ratio: float = 0.5) -> pd.DataFrame:
+    """Versao enxuta do frame: ID inteiro, texto repetitivo como category e inteiros em int32.
+
+    So converte quando o valor nao muda: floats com fracao ou NaN continuam float64.
+    """
+    n = len(df)
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col == "ID":
+            s = _compact_ids(s)
+        elif isinstance(s.dtype, pd.CategoricalDtype):
+            # Categoria herdada (ex.: Nome apos o groupby) que ficou com valores quase unicos
+            if n and s.nunique(dropna=True) > n * category_max_ratio:
+                s = s.astype(s.cat.categories.dtype)
+        elif pd.api.types.is_bool_dtype(s):
+            pass
+        elif pd.api.types.is_numeric_dtype(s):
+            if n and s.notna().all() and s.abs().max() < _INT32_SAFE and (s == s.round()).all():
+                s = s.astype("int32")
+        elif pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+            if n and s.nunique(dropna=True) <= n * category_max_ratio:
+                s = s.astype("category")
+        out[col] = s
+    res = pd.DataFrame(out, index=df.index)
+    res.attrs = dict(df.attrs)
+    return res
+
+
+def memory_report(frames: dict) -> pd.DataFrame:
+    rows = [
+        {"Frame": name, "Linhas": len(df), "Bytes": int(df.memory_usage(deep=True).sum())}
+        for name, df in frames.items()
+        if isinstance(df, pd.DataFrame)
     ]
-    for c in cols_num:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return pd.DataFrame(rows, columns=["Frame", "Linhas", "Bytes"])
+
+
+# Celulas de texto tratadas como vazias (nao contam como falha)
+_BLANKS = {"", "-", "--", "—", "–", "n/a", "N/A", "nan", "NaN", "None"}
+# Com pyarrow as operacoes .str do parser rodam em C++ em vez de celula a celula
+_TEXT_DTYPE = "string[pyarrow]" if _has_module("pyarrow") else object
+
+
+def parse_br_numeric(s: pd.Series, kind: str = "num") -> tuple:
+    """(serie numerica, mascara de falhas) de uma coluna com numeros e/ou texto pt-BR.
+
+    Colunas ja numericas passam direto (inteiros continuam inteiros); o resto
+    vira float64. Texto aceita "R$ 1.234,56", "1.234", "12,5%", "(1.234,56)"
+    e "-3,2": com virgula, ponto e milhar; sem virgula, "1.234"/"12.345.678"
+    e milhar e "12.5" e decimal. kind="frac" divide os percentuais por 100;
+    "pct" so remove o "%". Falha = texto nao vazio que nao virou numero.
+    """
+    if pd.api.types.is_bool_dtype(s):
+        return s.astype("float64"), np.zeros(len(s), dtype=bool)
+    if pd.api.types.is_numeric_dtype(s):
+        return s, np.zeros(len(s), dtype=bool)
+
+    vals = s.to_numpy(dtype=object)
+    is_str = np.fromiter((type(v) is str for v in vals), dtype=bool, count=len(vals))
+    if not is_str.any():
+        # object so com numeros (ex.: linha de cabecalho repetida ja removida): mesmo resultado de to_numeric
+        num = pd.to_numeric(s, errors="coerce")
+        return num, (num.isna() & s.notna()).to_numpy()
+    out = np.full(len(vals), np.nan)
+    failed = np.zeros(len(vals), dtype=bool)
+    if (~is_str).any():
+        out[~is_str] = pd.to_numeric(pd.Series(vals[~is_str]), errors="coerce").to_numpy(dtype="float64")
+    if is_str.any():
+        t = pd.Series(vals[is_str], dtype=_TEXT_DTYPE).str.strip()
+        blank = t.isin(_BLANKS).to_numpy(dtype=bool)
+        pct = t.str.endswith("%").to_numpy(dtype=bool)
+        neg = (t.str.startswith("(") & t.str.endswith(")")).to_numpy(dtype=bool)
+        t = t.str.replace(r"[R$\s\xa0%()]", "", regex=True).str.replace("\u2212", "-", regex=False)
+        # "1,234.56" (milhar com virgula) e a excecao; o resto com virgula e pt-BR
+        en = t.str.fullmatch(r"[-+]?\d{1,3}(?:,\d{3})+\.\d+")
+        br = ~en & (t.str.contains(",", regex=False) | t.str.fullmatch(r"[-+]?\d{1,3}(?:\.\d{3})+"))
+        t = t.where(~en, t.str.replace(",", "", regex=False))
+        t = t.where(~br, t.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+        num = pd.to_numeric(t, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        num = np.where(neg, -num, num)
+        if kind == "frac":
+            num = np.where(pct, num / 100.0, num)
+        out[is_str] = np.where(blank, np.nan, num)
+        failed[is_str] = np.isnan(num) & ~blank
+    return pd.Series(out, index=s.index, name=s.name), failed
+
+
+def _parse_dates(s: pd.Series) -> tuple:
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s, np.zeros(len(s), dtype=bool)
+    vals = s.to_numpy(dtype=object)
+    is_str = np.fromiter((type(v) is str for v in vals), dtype=bool, count=len(vals))
+    out = pd.Series(pd.to_datetime(pd.Series(np.where(is_str, None, vals)), errors="coerce").to_numpy(), index=s.index)
+    failed = np.zeros(len(vals), dtype=bool)
+    if is_str.any():
+        # Texto: dd/mm/aaaa do export brasileiro, depois ISO; o que sobrar (com hora...) formato a formato
+        t = pd.Series(vals[is_str], dtype=object).str.strip()
+        d = pd.to_datetime(t, format="%d/%m/%Y", errors="coerce")
+        for fmt in ("ISO8601", "mixed"):
+            rest = d.isna() & ~t.isin(_BLANKS)
+            if not rest.any():
+                break
+            d[rest] = pd.to_datetime(t[rest], format=fmt, dayfirst=True, errors="coerce")
+        out[is_str] = d.to_numpy()
+        failed[is_str] = (d.isna() & ~t.isin(_BLANKS)).to_numpy()
+    return out, failed
+
+
+PARSE_FAILURES = "falhas_parse"
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Converte as colunas do schema uma unica vez: numeros em float64, datas em datetime64.
+
+    Os builders confiam nesses tipos e nao convertem de novo. Celulas de texto
+    que nao viraram numero/data ficam NaN/NaT e sao contadas por coluna em
+    df.attrs[PARSE_FAILURES] (so colunas com falha).
+    """
+    failures = {}
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        if kind == "date":
+            df[col], failed = _parse_dates(df[col])
+        else:
+            df[col], failed = parse_br_numeric(df[col], kind)
+        n = int(failed.sum())
+        if n:
+            failures[col] = n
+    df.attrs[PARSE_FAILURES] = failures
     return df
 
 
-def load_campanhas_diario(campanhas_file) -> pd.DataFrame:
-    camp = pd.read_excel(campanhas_file, sheet_name="Relatório de campanha", header=1)
-    if "Desde" in camp.columns:
-        camp["Desde"] = pd.to_datetime(camp["Desde"], errors="coerce")
-    camp = _coerce_campaign_numeric(camp)
-    return camp
+def parse_failures(df: pd.DataFrame) -> dict:
+    """{coluna: celulas que falharam} registradas por apply_schema."""
+    return dict(df.attrs.get(PARSE_FAILURES, {}))
 
 
-def load_campanhas_consolidado(campanhas_file) -> pd.DataFrame:
-    camp = pd.read_excel(campanhas_file, sheet_name="Relatório de campanha", header=1)
-    camp = _coerce_campaign_numeric(camp)
-    return camp
+@stage
+def load_organico(organico_file, engine: str = None, compact: bool = False,
+                  sheet_name=0, header: int = 4) -> pd.DataFrame:
+    org = read_sheet(organico_file, sheet_name=sheet_name, header=header, engine=engine)
+    org.columns = ORGANICO_COLS
+    org = apply_schema(org[org["ID"] != "ID do anúncio"].copy(), ORGANICO_SCHEMA)
 
+    org["ID"] = org["ID"].astype(str).str.replace("MLB", "", regex=False)
+    return compact_frame(org) if compact else org
 
-def build_daily_from_diario(camp_diario: pd.DataFrame) -> pd.DataFrame:
-    daily = camp_diario.groupby("Desde", as_index=False).agg(
-        Investimento=("Investimento\n(Moeda local)", "sum"),
-        Receita=("Receita\n(Moeda local)", "sum"),
-        Vendas=("Vendas por publicidade\n(Diretas + Indiretas)", "sum"),
-        Cliques=("Cliques", "sum"),
-        Impressoes=("Impressões", "sum"),
-    )
+
+@stage
+def load_patrocinados(patrocinados_file, engine: str = None, compact: bool = False,
+                      sheet_name=SHEET_PATROCINADOS, header: int = 1) -> pd.DataFrame:
+    pat = read_sheet(patrocinados_file, sheet_name=sheet_name, header=header,
+                     usecols=PATROCINADOS_COLS, engine=engine)
+    pat["ID"] = pat["Código do anúncio"].astype(str).str.replace("MLB", "", regex=False)
+    pat = apply_schema(pat, PATROCINADOS_SCHEMA)
+    return compact_frame(pat) if compact else pat
+
+
+@stage
+def load_campanhas_diario(campanhas_file, engine: str = None, compact: bool = False,
+                          sheet_name=SHEET_CAMPANHAS, header: int = 1) -> pd.DataFrame:
+    camp = read_sheet(campanhas_file, sheet_name=sheet_name, header=header,
+                      usecols=CAMPANHAS_COLS, engine=engine)
+    camp = apply_schema(camp, CAMPANHAS_SCHEMA)
+    return compact_frame(camp) if compact else camp
+
+
+@stage
+def load_campanhas_consolidado(campanhas_file, engine: str = None, compact: bool = False,
+                               sheet_name=SHEET_CAMPANHAS, header: int = 1) -> pd.DataFrame:
+    camp = read_sheet(campanhas_file, sheet_name=sheet_name, header=header,
+                      usecols=CAMPANHAS_COLS, engine=engine)
+    camp = apply_schema(camp, {c: k for c, k in CAMPANHAS_SCHEMA.items() if c != "Desde"})
+    return compact_frame(camp) if compact else camp
+
+
+# Celulas que identificam a linha de cabecalho de cada exportacao
+EXPORT_SIGNATURES = {
+    "organico": ("ID do anúncio", "Visitas"),
+    "patrocinados": ("Código do anúncio", "Impressões"),
+    "campanhas": ("Nome", "Investimento\n(Moeda local)"),
+}
+SNIFF_ROWS = 20
+
+
+def _match_signature(rows: list):
+    for r, row in enumerate(rows):
+        cells = {v.strip() if isinstance(v, str) else v for v in row}
+        for tipo, signature in EXPORT_SIGNATURES.items():
+            if all(c in cells for c in signature):
+                return tipo, r
+    return None
+
+
+def _same_day(a, b) -> bool:
+    # Datas do xlsx lido direto chegam como serial numerico; de outros leitores, como data ou texto
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return int(a) == int(b)
+    try:
+        return pd.Timestamp(a).normalize() == pd.Timestamp(b).normalize()
+    except (TypeError, ValueError):
+        return False
+
+
+def _campaign_mode(header_row, data_rows) -> str:
+    # Diario: tem "Desde" e cada linha cobre um unico dia (Ate vazio ou igual ao Desde)
+    names = [v.strip() if isinstance(v, str) else v for v in header_row]
+    if "Desde" not in names:
+        return "consolidado"
+    i_desde = names.index("Desde")
+    i_ate = names.index("Até") if "Até" in names else None
+    for row in data_rows:
+        desde = row[i_desde] if i_desde < len(row) else None
+        ate = row[i_ate] if (i_ate is not None and i_ate < len(row)) else None
+        if desde is not None and ate not in (None, "") and not _same_day(desde, ate):
+            return "consolidado"
+    return "diario"
+
+
+def _xml_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _xml_text(el) -> str:
+    # Texto de <si>/<is>: <t> direto ou runs <r><t>, ignorando a transcricao fonetica (<rPh>)
+    parts = []
+    for child in el:
+        name = _xml_name(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(t.text or "" for t in child if _xml_name(t.tag) == "t")
+    return "".join(parts)
+
+
+def _col_index(ref: str) -> int:
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + ord(ch.upper()) - 64
+    return n - 1
+
+
+def _xlsx_parts(zf) -> tuple:
+    """Abas (nome -> caminho no zip, na ordem do arquivo) e caminho das shared strings."""
+    from xml.etree import ElementTree as ET
+
+    targets, shared = {}, None
+    for rel in ET.parse(zf.open("xl/_rels/workbook.xml.rels")).getroot():
+        target = rel.get("Target", "")
+        path = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        targets[rel.get("Id")] = path
+        if rel.get("Type", "").endswith("/sharedStrings"):
+            shared = path
+    sheets = {}
+    for el in ET.parse(zf.open("xl/workbook.xml")).getroot().iter():
+        if _xml_name(el.tag) == "sheet":
+            rid = next(v for k, v in el.attrib.items() if _xml_name(k) == "id")
+            sheets[el.get("name")] = targets[rid]
+    return sheets, shared
+
+
+def _xlsx_head(zf, path: str, max_rows: int) -> list:
+    """Primeiras max_rows linhas da aba (linhas vazias incluidas), lendo o XML em streaming.
+
+    Strings compartilhadas ficam como ("s", indice) para serem resolvidas depois.
+    """
+    from xml.etree import ElementTree as ET
+
+    rows, cur = [], None
+    for event, el in ET.iterparse(zf.open(path), events=("start", "end")):
+        name = _xml_name(el.tag)
+        if event == "start":
+            if name == "row":
+                r = int(el.get("r", len(rows) + 1)) - 1
+                if r >= max_rows:
+                    break
+                rows.extend([] for _ in range(r - len(rows)))
+                cur = []
+                rows.append(cur)
+            continue
+        if name == "c":
+            ref = el.get("r")
+            idx = _col_index(ref) if ref else len(cur)
+            kind = el.get("t")
+            v = next((c.text for c in el if _xml_name(c.tag) == "v"), None)
+            if kind == "inlineStr":
+                value = next((_xml_text(c) for c in el if _xml_name(c.tag) == "is"), None)
+            elif v is None:
+                value = None
+            elif kind == "s":
+                value = ("s", int(v))
+            elif kind == "b":
+                value = v == "1"
+            elif kind in ("str", "e"):
+                value = v
+            else:
+                num = float(v)
+                value = int(num) if num.is_integer() else num
+            cur.extend([None] * (idx - len(cur)))
+            cur.append(value)
+            el.clear()
+        elif name == "row":
+            el.clear()
+        elif name == "sheetData":
+            break
+    return [tuple(r) for r in rows]
+
+
+def _xlsx_shared_strings(zf, path: str, upto: int) -> list:
+    # So ate o maior indice usado nas primeiras linhas; o resto do arquivo nem e descomprimido
+    from xml.etree import ElementTree as ET
+
+    out = []
+    if upto < 0 or path is None:
+        return out
+    for _, el in ET.iterparse(zf.open(path)):
+        if _xml_name(el.tag) == "si":
+            out.append(_xml_text(el))
+            el.clear()
+            if len(out) > upto:
+                break
+    return out
+
+
+def _is_shared(v) -> bool:
+    return isinstance(v, tuple) and len(v) == 2 and v[0] == "s"
+
+
+@stage
+def sniff_workbook(file, max_rows: int = SNIFF_ROWS) -> dict:
+    """Identifica a exportacao lendo so as primeiras linhas de cada aba.
+
+    Le o xlsx direto do zip em streaming: nem a aba inteira nem todas as
+    shared strings sao carregadas. Devolve {"tipo", "sheet", "header", "modo"}:
+    tipo e organico, patrocinados ou campanhas; header e o argumento que o
+    loader correspondente espera; modo (so para campanhas) e diario ou
+    consolidado. Abas com os nomes conhecidos sao examinadas primeiro.
+    """
+    import zipfile
+
+    try:
+        with zipfile.ZipFile(file) as zf:
+            sheets, shared_path = _xlsx_parts(zf)
+            known = (SHEET_PATROCINADOS, SHEET_CAMPANHAS)
+            heads = {name: _xlsx_head(zf, sheets[name], max_rows) for name in sorted(sheets, key=lambda n: n not in known)}
+            upto = max((v[1] for rows in heads.values() for row in rows for v in row if _is_shared(v)), default=-1)
+            shared = _xlsx_shared_strings(zf, shared_path, upto)
+    except (zipfile.BadZipFile, KeyError) as exc:
+        raise ValueError(f"Arquivo nao e um xlsx valido: {exc}") from exc
+    finally:
+        if hasattr(file, "seek"):
+            file.seek(0)
+
+    for name, rows in heads.items():
+        rows = [tuple(shared[v[1]] if _is_shared(v) else v for v in row) for row in rows]
+        found = _match_signature(rows)
+        if found is not None:
+            break
+    else:
+        raise ValueError(f"Arquivo nao reconhecido como exportacao do Mercado Livre (abas: {', '.join(sheets)})")
+
+    tipo, r = found
+    info = {"tipo": tipo, "sheet": name, "header": r, "modo": None}
+    if tipo == "organico":
+        # Com cabecalho agrupado na linha de cima o loader le a partir dela e descarta
+        # a linha "ID do anúncio" como dado (layout do export); sem ele, le direto dela
+        if r > 0 and any(v not in (None, "") for v in rows[r - 1]):
+            info["header"] = r - 1
+    elif tipo == "campanhas":
+        info["modo"] = _campaign_mode(rows[r], rows[r + 1:])
+    return info
+
+
+def export_loader(info: dict):
+    """Loader de ml_report para o resultado de sniff_workbook."""
+    if info["tipo"] == "organico":
+        return load_organico
+    if info["tipo"] == "patrocinados":
+        return load_patrocinados
+    return load_campanhas_diario if info["modo"] == "diario" else load_campanhas_consolidado
+
+
+def load_export(file, engine: str = None, compact: bool = False, info: dict = None) -> tuple:
+    """Detecta a exportacao e faz a leitura completa uma unica vez, ja com aba e cabecalho certos."""
+    info = info or sniff_workbook(file)
+    df = export_loader(info)(file, engine=engine, compact=compact, sheet_name=info["sheet"], header=info["header"])
+    return info, df
+
+
+# Chave natural de cada exportacao: linhas repetidas entre arquivos (periodos
+# sobrepostos, mesmo export enviado duas vezes) ficam so com a ultima ocorrencia
+EXPORT_KEYS = {
+    ("organico", None): ["ID"],
+    ("patrocinados", None): ["ID"],
+    ("campanhas", "diario"): ["Nome", "Desde"],
+    ("campanhas", "consolidado"): ["Nome"],
+}
+INGEST_WORKERS = int(os.environ.get("ML_INGEST_WORKERS", "0")) or os.cpu_count() or 1
+_ingest_pool = (0, None)
+
+
+# Sessoes do Streamlit e threads do ml_server leem ao mesmo tempo: criar/trocar o pool e submeter sao atomicos
+_ingest_lock = threading.Lock()
+
+
+def process_context():
+    """Contexto multiprocessing dos pools: forkserver/spawn, nunca fork de um processo com threads."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_ingest_pool(workers: int):
+    # Processos reaproveitados entre chamadas: o custo de subir o interpretador e importar o pandas e pago uma vez.
+    # Chamar com _ingest_lock; o pool trocado termina o que ja recebeu
+    global _ingest_pool
+    from concurrent.futures import ProcessPoolExecutor
+
+    size, pool = _ingest_pool
+    if pool is None or size < workers:
+        if pool is not None:
+            pool.shutdown(wait=False)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=process_context())
+        _ingest_pool = (workers, pool)
+    return pool
+
+
+@atexit.register
+def _shutdown_ingest_pool() -> None:
+    with _ingest_lock:
+        pool = _ingest_pool[1]
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _call_loader(loader, data: bytes, kwargs: dict) -> pd.DataFrame:
+    return loader(BytesIO(data), **kwargs)
+
+
+def parse_exports(loader, datas: list, kwargs_list: list = None, workers: int = None) -> list:
+    """Le varios arquivos (bytes) com o mesmo loader, em paralelo em processos quando ha mais de um.
+
+    kwargs_list traz os argumentos de cada arquivo (aba, cabecalho, engine...).
+    workers=1 le em sequencia no processo atual.
+    """
+    kwargs_list = kwargs_list or [{} for _ in datas]
+    workers = min(workers or INGEST_WORKERS, len(datas))
+    if workers <= 1:
+        return [_call_loader(loader, d, kw) for d, kw in zip(datas, kwargs_list)]
+    from concurrent.futures.process import BrokenProcessPool
+
+    global _ingest_pool
+    with _ingest_lock:
+        pool = _get_ingest_pool(workers)
+        futures = [pool.submit(_call_loader, loader, d, kw) for d, kw in zip(datas, kwargs_list)]
+    try:
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        # Worker morto (ex.: falta de memoria): a proxima chamada sobe um pool novo
+        with _ingest_lock:
+            if _ingest_pool[1] is pool:
+                _ingest_pool = (0, None)
+        raise
+
+
+@stage
+def combine_exports(info: dict, frames: list, compact: bool = False) -> pd.DataFrame:
+    """Concatena as leituras de varios arquivos do mesmo tipo e remove duplicadas pela chave natural."""
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    # Falhas de parse somadas entre os arquivos
+    failures = {}
+    for f in frames:
+        for col, n in parse_failures(f).items():
+            failures[col] = failures.get(col, 0) + n
+    df.attrs[PARSE_FAILURES] = failures
+    keys = [k for k in EXPORT_KEYS[(info["tipo"], info["modo"])] if k in df.columns]
+    if keys:
+        df = df.drop_duplicates(subset=keys, keep="last").reset_index(drop=True)
+    # Categorias diferentes entre arquivos viram object no concat
+    return compact_frame(df) if compact else df
+
+
+def check_same_export(infos: list, names: list = None) -> dict:
+    """Garante que todos os arquivos sao do mesmo tipo (e modo, para campanhas); devolve o info do primeiro."""
+    names = names or [str(i + 1) for i in range(len(infos))]
+    first = infos[0]
+    for info, name in zip(infos[1:], names[1:]):
+        if (info["tipo"], info["modo"]) != (first["tipo"], first["modo"]):
+            found = info["tipo"] + (f" {info['modo']}" if info["modo"] else "")
+            expected = first["tipo"] + (f" {first['modo']}" if first["modo"] else "")
+            raise ValueError(f"{name}: esperado export {expected} (como {names[0]}), encontrado {found}")
+    return first
+
+
+def load_exports(files: list, engine: str = None, compact: bool = False, infos: list = None,
+                 workers: int = None) -> tuple:
+    """Varios arquivos de uma mesma exportacao: detecta, le em paralelo e junta sem duplicadas.
+
+    Devolve (info, df) como load_export. Um unico arquivo e lido no processo atual.
+    """
+    from ml_cache import file_bytes
+
+    datas = [file_bytes(f) for f in files]
+    infos = infos or [sniff_workbook(BytesIO(d)) for d in datas]
+    names = [str(f) if isinstance(f, (str, os.PathLike)) else getattr(f, "name", str(i + 1)) for i, f in enumerate(files)]
+    info = check_same_export(infos, names)
+    kwargs_list = [{"engine": engine, "compact": compact, "sheet_name": i["sheet"], "header": i["header"]}
+                   for i in infos]
+    frames = parse_exports(export_loader(info), datas, kwargs_list, workers=workers)
+    return info, combine_exports(info, frames, compact=compact)
+
+
+# Agregacoes por chave: coluna de saida -> (coluna do export, funcao)
+DAILY_AGG = {
+    "Investimento": ("Investimento\n(Moeda local)", "sum"),
+    "Receita": ("Receita\n(Moeda local)", "sum"),
+    "Vendas": ("Vendas por publicidade\n(Diretas + Indiretas)", "sum"),
+    "Cliques": ("Cliques", "sum"),
+    "Impressoes": ("Impressões", "sum"),
+}
+CAMPAIGN_AGG = {
+    "Status": ("Status", "last"),
+    "Orçamento": ("Orçamento", "last"),
+    "ACOS Objetivo": ("ACOS Objetivo", "last"),
+    "Impressões": ("Impressões", "sum"),
+    "Cliques": ("Cliques", "sum"),
+    "Receita": ("Receita\n(Moeda local)", "sum"),
+    "Investimento": ("Investimento\n(Moeda local)", "sum"),
+    "Vendas": ("Vendas por publicidade\n(Diretas + Indiretas)", "sum"),
+    "ROAS": ("ROAS\n(Receitas / Investimento)", "mean"),
+    "CVR": ("CVR\n(Conversion rate)", "mean"),
+    "Perdidas_Orc": ("% de impressões perdidas por orçamento", "mean"),
+    "Perdidas_Class": ("% de impressões perdidas por classificação", "mean"),
+}
+
+# "pandas" (groupby padrao), "arrow" (group_by do pyarrow, multi-thread) ou
+# "polars" (multi-thread). Os tres devolvem o mesmo frame.
+AGG_BACKENDS = ["pandas"] + [b for b, mod in (("arrow", "pyarrow"), ("polars", "polars")) if _has_module(mod)]
+AGG_BACKEND = "pandas"
+
+
+def _agg_dtype(src, how: str):
+    # dtype que o groupby do pandas produz, para o resultado dos outros backends ficar identico
+    if how == "mean":
+        return np.dtype("float64")
+    if how == "sum":
+        return np.dtype("int64") if (pd.api.types.is_integer_dtype(src) or pd.api.types.is_bool_dtype(src)) else np.dtype("float64")
+    return src
+
+
+def _group_agg_arrow(df: pd.DataFrame, key: str, spec: dict) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Agrupar por codigos inteiros e bem mais barato que por texto; factorize ja devolve as chaves ordenadas
+    codes, uniques = pd.factorize(df[key], sort=True)
+    ok = codes >= 0
+    srcs = list(dict.fromkeys(src for src, _ in spec.values()))
+    tbl = pa.table({"_k": pa.array(codes), **{src: pa.Array.from_pandas(df[src]) for src in srcs}}).filter(pa.array(ok))
+    opts = pc.ScalarAggregateOptions(skip_nulls=True, min_count=0)
+    threaded = [(src, how, opts) for src, how in spec.values() if how != "last"]
+    ordered = [(src, "last") for src, how in spec.values() if how == "last"]
+    parts = [tbl.group_by("_k", use_threads=True).aggregate(threaded).sort_by("_k")] if threaded else []
+    if ordered:
+        # "last" depende da ordem das linhas, que so e garantida sem threads
+        parts.append(tbl.group_by("_k", use_threads=False).aggregate(ordered).sort_by("_k"))
+    cols = {}
+    for part in parts:
+        cols.update({name: part[name] for name in part.column_names if name != "_k"})
+    out = pa.table(cols).to_pandas()
+    out.insert(0, key, uniques.take(parts[0]["_k"].to_numpy()))
+    return out.rename(columns={f"{src}_{how}": name for name, (src, how) in spec.items()})
+
+
+def _group_agg_polars(df: pd.DataFrame, key: str, spec: dict) -> pd.DataFrame:
+    import polars as pl
+
+    srcs = list(dict.fromkeys(src for src, _ in spec.values()))
+    exprs = []
+    for name, (src, how) in spec.items():
+        col = pl.col(src)
+        if how == "last":
+            exprs.append(col.drop_nulls().last().alias(name))
+        elif how == "sum":
+            exprs.append(col.sum().alias(name))
+        else:
+            exprs.append(col.mean().alias(name))
+    lf = pl.from_pandas(df[[key] + srcs], nan_to_null=True).lazy()
+    return lf.drop_nulls(key).group_by(key, maintain_order=True).agg(exprs).sort(key).collect().to_pandas()
+
+
+def _group_agg(df: pd.DataFrame, key: str, spec: dict, backend: str = None) -> pd.DataFrame:
+    """groupby(key).agg(spec) ordenado pela chave, no backend escolhido.
+
+    Colunas categoricas (modo compacto) sempre usam o pandas, que preserva as
+    categorias no resultado.
+    """
+    backend = backend or AGG_BACKEND
+    if backend not in AGG_BACKENDS:
+        raise ValueError(f"Backend de agregacao indisponivel: {backend}. Use um de {AGG_BACKENDS}")
+    used = [key] + [src for src, _ in spec.values()]
+    if backend == "pandas" or any(isinstance(df[c].dtype, pd.CategoricalDtype) for c in used):
+        return df.groupby(key, as_index=False).agg(**spec)
+
+    out = (_group_agg_arrow if backend == "arrow" else _group_agg_polars)(df, key, spec)
+    out = out[[key] + list(spec)]
+    dtypes = {key: df[key].dtype, **{name: _agg_dtype(df[src].dtype, how) for name, (src, how) in spec.items()}}
+    return out.astype({c: t for c, t in dtypes.items() if out[c].dtype != t})
+
+
+@stage
+def build_daily_from_diario(camp_diario: pd.DataFrame, backend: str = None) -> pd.DataFrame:
+    daily = _group_agg(camp_diario, "Desde", DAILY_AGG, backend=backend)
     return daily.sort_values("Desde")
 
 
-def build_campaign_agg(camp: pd.DataFrame, modo: str) -> pd.DataFrame:
+@stage
+def build_campaign_agg(camp: pd.DataFrame, modo: str, backend: str = None) -> pd.DataFrame:
     if modo == "diario":
-        camp_agg = camp.groupby("Nome", as_index=False).agg(
-            Status=("Status", "last"),
-            Orçamento=("Orçamento", "last"),
-            **{
-                "ACOS Objetivo": ("ACOS Objetivo", "last"),
-                "Impressões": ("Impressões", "sum"),
-                "Cliques": ("Cliques", "sum"),
-                "Receita": ("Receita\n(Moeda local)", "sum"),
-                "Investimento": ("Investimento\n(Moeda local)", "sum"),
-                "Vendas": ("Vendas por publicidade\n(Diretas + Indiretas)", "sum"),
-                "ROAS": ("ROAS\n(Receitas / Investimento)", "mean"),
-                "CVR": ("CVR\n(Conversion rate)", "mean"),
-                "Perdidas_Orc": ("% de impressões perdidas por orçamento", "mean"),
-                "Perdidas_Class": ("% de impressões perdidas por classificação", "mean"),
-            }
-        )
-        return camp_agg
+        return _group_agg(camp, "Nome", CAMPAIGN_AGG, backend=backend)
 
     camp_agg = camp.rename(columns={
         "Receita\n(Moeda local)": "Receita",
@@ -111,7 +806,7 @@ def build_campaign_agg(camp: pd.DataFrame, modo: str) -> pd.DataFrame:
     ]
     for col in needed:
         if col not in camp_agg.columns:
-            camp_agg[col] = pd.NA
+            camp_agg[col] = np.nan
 
     return camp_agg[needed].copy()
 
@@ -125,6 +820,89 @@ def _safe_div(a, b) -> float:
     return 0.0
 
 
+def _num_col(df: pd.DataFrame, col: str, default: float = 0.0) -> pd.Series:
+    # Frames dos loaders ja vem tipados (apply_schema); o parser pt-BR so para frames montados fora deles
+    if col in df.columns:
+        s = df[col]
+        if pd.api.types.is_numeric_dtype(s):
+            return s.astype("float64")
+        return parse_br_numeric(s)[0].astype("float64")
+    return pd.Series(default, index=df.index, dtype="float64")
+
+
+def _safe_div_vec(a: pd.Series, b: pd.Series) -> pd.Series:
+    # Mesma semantica de _safe_div: divisor zero -> 0.0, divisor NaN -> NaN
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = a.to_numpy(dtype="float64") / b.to_numpy(dtype="float64")
+    out = np.where(b.to_numpy(dtype="float64") == 0.0, 0.0, out)
+    return pd.Series(out, index=a.index, dtype="float64")
+
+
+QUADRANTES = ["ESCALA_ORCAMENTO", "COMPETITIVIDADE", "HEMORRAGIA", "ESTAVEL"]
+
+STRATEGY_DEFAULTS = {
+    "acos_over_pct": 0.30,
+    "roas_mina": 7.0,
+    "lost_budget_mina": 40.0,
+    "lost_rank_gigante": 50.0,
+    "roas_hemorragia": 3.0,
+}
+
+ACOES = {
+    "ESCALA_ORCAMENTO": f"{EMOJI_GREEN} Aumentar orcamento",
+    "COMPETITIVIDADE": f"{EMOJI_YELLOW} Subir ACOS alvo",
+    "HEMORRAGIA": f"{EMOJI_RED} Revisar/pausar",
+    "ESTAVEL": f"{EMOJI_BLUE} Manter",
+}
+
+
+def _quadrant_masks(roas, lost_b, lost_r, receita, acos_real, acos_obj, receita_relevante,
+                    acos_over_pct, roas_mina, lost_budget_mina, lost_rank_gigante, roas_hemorragia):
+    # Funciona com limiares escalares ou em colunas (K, 1) contra arrays (N,), via broadcasting.
+    # Comparacoes com NaN resultam em False, igual ao classificador linha a linha
+    with np.errstate(invalid="ignore"):
+        escala = (roas >= roas_mina) & (lost_b >= lost_budget_mina)
+        compet = (receita >= receita_relevante) & (lost_r >= lost_rank_gigante)
+        hem = ((roas > 0) & (roas < roas_hemorragia)) | (
+            (acos_obj > 0) & (acos_real > acos_obj * (1.0 + acos_over_pct))
+        )
+    return escala, compet, hem
+
+
+def _strategy_arrays(df: pd.DataFrame) -> dict:
+    return {
+        "roas": _num_col(df, "ROAS_Real").to_numpy(),
+        "lost_b": _num_col(df, "Perdidas_Orc").to_numpy(),
+        "lost_r": _num_col(df, "Perdidas_Class").to_numpy(),
+        "receita": _num_col(df, "Receita").to_numpy(),
+        "acos_real": _num_col(df, "ACOS_Real").to_numpy(),
+        "acos_obj": _num_col(df, "ACOS_Objetivo_N", default=np.nan).to_numpy(),
+    }
+
+
+def classify_quadrants(
+    df: pd.DataFrame,
+    receita_relevante: float,
+    acos_over_pct: float = 0.30,
+    roas_mina: float = 7.0,
+    lost_budget_mina: float = 40.0,
+    lost_rank_gigante: float = 50.0,
+    roas_hemorragia: float = 3.0,
+) -> pd.Series:
+    escala, compet, hem = _quadrant_masks(
+        **_strategy_arrays(df),
+        receita_relevante=receita_relevante,
+        acos_over_pct=acos_over_pct,
+        roas_mina=roas_mina,
+        lost_budget_mina=lost_budget_mina,
+        lost_rank_gigante=lost_rank_gigante,
+        roas_hemorragia=roas_hemorragia,
+    )
+    quad = np.select([escala, compet, hem], QUADRANTES[:3], default=QUADRANTES[3])
+    return pd.Series(quad.tolist(), index=df.index)
+
+
+@stage
 def add_strategy_fields(
     camp_agg: pd.DataFrame,
     acos_over_pct: float = 0.30,
@@ -135,103 +913,206 @@ def add_strategy_fields(
 ) -> pd.DataFrame:
     df = camp_agg.copy()
 
-    for c in ["Receita","Investimento","Vendas","Cliques","Impressões","ROAS","CVR","Perdidas_Orc","Perdidas_Class","ACOS Objetivo","Orçamento"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-
-    df["ROAS_Real"] = df.apply(lambda r: _safe_div(r.get("Receita", 0), r.get("Investimento", 0)), axis=1)
-    df["ACOS_Real"] = df.apply(lambda r: _safe_div(r.get("Investimento", 0), r.get("Receita", 0)), axis=1)
+    receita_col = _num_col(df, "Receita")
+    invest_col = _num_col(df, "Investimento")
+    df["ROAS_Real"] = _safe_div_vec(receita_col, invest_col)
+    df["ACOS_Real"] = _safe_div_vec(invest_col, receita_col)
 
     if "ACOS Objetivo" in df.columns:
-        df["ACOS_Objetivo_N"] = df["ACOS Objetivo"].copy()
+        df["ACOS_Objetivo_N"] = _num_col(df, "ACOS Objetivo")
         df.loc[df["ACOS_Objetivo_N"] > 1.5, "ACOS_Objetivo_N"] = df.loc[df["ACOS_Objetivo_N"] > 1.5, "ACOS_Objetivo_N"] / 100.0
     else:
         df["ACOS_Objetivo_N"] = pd.NA
 
-    total_receita = float(pd.to_numeric(df["Receita"], errors="coerce").fillna(0).sum())
+    total_receita = float(receita_col.fillna(0).sum())
     receita_relevante = max(500.0, total_receita * 0.05)
 
+    df["Receita"] = receita_col
     df = df.sort_values("Receita", ascending=False).reset_index(drop=True)
     df["Receita"] = df["Receita"].fillna(0)
     df["CPI_Share"] = df["Receita"] / total_receita if total_receita else 0.0
     df["CPI_Cum"] = df["CPI_Share"].cumsum()
     df["CPI_80"] = df["CPI_Cum"] <= 0.80
 
-    def classify(row):
-        roas = float(row.get("ROAS_Real", 0) or 0)
-        lost_b = float(row.get("Perdidas_Orc", 0) or 0)
-        lost_r = float(row.get("Perdidas_Class", 0) or 0)
-        receita = float(row.get("Receita", 0) or 0)
-        acos_real = float(row.get("ACOS_Real", 0) or 0)
-        acos_obj = row.get("ACOS_Objetivo_N", None)
-
-        if (roas >= roas_mina) and (lost_b >= lost_budget_mina):
-            return "ESCALA_ORCAMENTO"
-        if (receita >= receita_relevante) and (lost_r >= lost_rank_gigante):
-            return "COMPETITIVIDADE"
-
-        hem = (roas > 0 and roas < roas_hemorragia)
-        if pd.notna(acos_obj) and acos_obj and float(acos_obj) > 0:
-            if acos_real > (float(acos_obj) * (1.0 + acos_over_pct)):
-                hem = True
-        if hem:
-            return "HEMORRAGIA"
-        return "ESTAVEL"
-
-    df["Quadrante"] = df.apply(classify, axis=1)
-
-    def action(q):
-        if q == "ESCALA_ORCAMENTO":
-            return f"{EMOJI_GREEN} Aumentar orcamento"
-        if q == "COMPETITIVIDADE":
-            return f"{EMOJI_YELLOW} Subir ACOS alvo"
-        if q == "HEMORRAGIA":
-            return f"{EMOJI_RED} Revisar/pausar"
-        return f"{EMOJI_BLUE} Manter"
-
-    df["Acao_Recomendada"] = df["Quadrante"].apply(action)
+    df["Quadrante"] = classify_quadrants(
+        df,
+        receita_relevante,
+        acos_over_pct=acos_over_pct,
+        roas_mina=roas_mina,
+        lost_budget_mina=lost_budget_mina,
+        lost_rank_gigante=lost_rank_gigante,
+        roas_hemorragia=roas_hemorragia,
+    )
+    df["Acao_Recomendada"] = df["Quadrante"].map(ACOES).fillna(ACOES["ESTAVEL"])
     return df
 
 
-def build_executive_diagnosis(camp_agg_strat: pd.DataFrame, daily: pd.DataFrame = None) -> dict:
-    df = camp_agg_strat.copy()
+# Janelas (dias) comparadas com a janela imediatamente anterior de mesmo tamanho
+TREND_WINDOWS = (7, 14, 28)
+TREND_SRC = {
+    "Investimento": "Investimento\n(Moeda local)",
+    "Cliques": "Cliques",
+    "Receita": "Receita\n(Moeda local)",
+    "Vendas": "Vendas por publicidade\n(Diretas + Indiretas)",
+}
+
+
+def _daily_cube(camp_diario: pd.DataFrame):
+    """Matrizes dia x campanha (soma por Desde + Nome) de cada metrica de TREND_SRC.
+
+    Os dias sao as datas presentes no export, em ordem; "present" marca as
+    celulas em que a campanha apareceu no dia.
+    """
+    desde = pd.to_datetime(camp_diario["Desde"], errors="coerce")
+    ok = (desde.notna() & camp_diario["Nome"].notna()).to_numpy()
+    day_codes, days = pd.factorize(desde[ok], sort=True)
+    camp_codes, nomes = pd.factorize(camp_diario["Nome"][ok].astype(str), sort=True)
+    shape = (len(days), len(nomes))
+    flat = day_codes * shape[1] + camp_codes
+    size = shape[0] * shape[1]
+
+    present = (np.bincount(flat, minlength=size) > 0).reshape(shape)
+    cube = {}
+    for name, col in TREND_SRC.items():
+        v = _num_col(camp_diario, col).to_numpy()[ok]
+        cube[name] = np.bincount(flat, weights=np.nan_to_num(v), minlength=size).reshape(shape)
+    return pd.DatetimeIndex(days), pd.Index(nomes), cube, present
+
+
+def _ratio_zero(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    # Mesma semantica de _safe_div: divisor zero -> 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / den, 0.0)
+
+
+def _window_var(last: np.ndarray, prev: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(prev > 0, last / prev - 1.0, np.nan)
+
 
-    invest = float(pd.to_numeric(df["Investimento"], errors="coerce").fillna(0).sum())
-    receita = float(pd.to_numeric(df["Receita"], errors="coerce").fillna(0).sum())
-    vendas = float(pd.to_numeric(df["Vendas"], errors="coerce").fillna(0).sum())
+def _window_trends(last: dict, prev: dict) -> dict:
+    """CPC proxy, ticket e ROAS da ultima janela contra a anterior (escalares ou vetores)."""
+    cpc_l = _ratio_zero(last["Investimento"], last["Cliques"])
+    cpc_p = _ratio_zero(prev["Investimento"], prev["Cliques"])
+    return {
+        "cpc_l": cpc_l,
+        "cpc_p": cpc_p,
+        "cpc": _window_var(cpc_l, cpc_p),
+        "ticket": _window_var(_ratio_zero(last["Receita"], last["Vendas"]), _ratio_zero(prev["Receita"], prev["Vendas"])),
+        "roas": _window_var(_ratio_zero(last["Receita"], last["Investimento"]), _ratio_zero(prev["Receita"], prev["Investimento"])),
+    }
+
+
+@stage
+def build_campaign_trends(camp_diario: pd.DataFrame, windows=TREND_WINDOWS) -> pd.DataFrame:
+    """Variacao de CPC proxy, ticket e ROAS por campanha para cada janela.
+
+    Para janela w compara os ultimos w dias do export com os w anteriores
+    (sem dados suficientes as colunas ficam NaN). Custo_Extra_CPC e quanto a
+    campanha gastou a mais nos cliques da ultima janela por causa da alta do
+    CPC; e o que aponta quem puxa um aumento de CPC da conta.
+    """
+    days, nomes, cube, present = _daily_cube(camp_diario)
+    n_days = len(days)
+    out = {"Nome": nomes, "Dias": present.sum(axis=0)}
+    for w in windows:
+        if n_days < 2 * w:
+            for col in ("Invest", "CPC", "Var_CPC", "Var_Ticket", "Var_ROAS", "Custo_Extra_CPC"):
+                out[f"{col}_{w}d"] = np.full(len(nomes), np.nan)
+            continue
+        last = {k: m[n_days - w:].sum(axis=0) for k, m in cube.items()}
+        prev = {k: m[n_days - 2 * w:n_days - w].sum(axis=0) for k, m in cube.items()}
+        t = _window_trends(last, prev)
+        out[f"Invest_{w}d"] = last["Investimento"]
+        out[f"CPC_{w}d"] = t["cpc_l"]
+        out[f"Var_CPC_{w}d"] = t["cpc"]
+        out[f"Var_Ticket_{w}d"] = t["ticket"]
+        out[f"Var_ROAS_{w}d"] = t["roas"]
+        out[f"Custo_Extra_CPC_{w}d"] = np.where(t["cpc_p"] > 0, (t["cpc_l"] - t["cpc_p"]) * last["Cliques"], 0.0)
+    return pd.DataFrame(out)
+
+
+def _trailing_stats(x: np.ndarray, window: int):
+    """Media, desvio (amostral) e n das `window` linhas anteriores a cada linha, por coluna, ignorando NaN."""
+    valid = ~np.isnan(x)
+    # Centraliza por coluna antes das somas acumuladas para nao perder precisao na variancia
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        center = np.nan_to_num(np.nanmean(x, axis=0))
+    v = np.where(valid, x - center, 0.0)
+    zero = np.zeros((1, x.shape[1]))
+    c1 = np.vstack([zero, np.cumsum(v, axis=0)])
+    c2 = np.vstack([zero, np.cumsum(v * v, axis=0)])
+    cn = np.vstack([zero, np.cumsum(valid, axis=0)])
+    hi = np.arange(x.shape[0])
+    lo = np.maximum(0, hi - window)
+    s1, s2, n = c1[hi] - c1[lo], c2[hi] - c2[lo], cn[hi] - cn[lo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = s1 / n
+        var = (s2 - n * mean * mean) / (n - 1)
+    return mean + center, np.sqrt(np.clip(var, 0.0, None)), n
+
+
+@stage
+def flag_anomalies(camp_diario: pd.DataFrame, window: int = 28, z: float = 3.0, min_periods: int = 7) -> pd.DataFrame:
+    """Dias em que o investimento ou o ROAS da campanha fugiu da propria historia recente.
+
+    Cada dia e comparado com a media e o desvio dos `window` dias anteriores em
+    que a campanha apareceu; entra quando |z| >= z e ha pelo menos
+    min_periods dias de referencia.
+    """
+    days, nomes, cube, present = _daily_cube(camp_diario)
+    invest = np.where(present, cube["Investimento"], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roas = np.where(invest > 0, cube["Receita"] / invest, np.nan)
+
+    parts = []
+    for metrica, x in (("Investimento", invest), ("ROAS", roas)):
+        mean, std, n = _trailing_stats(x, window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = (x - mean) / std
+            flag = (n >= min_periods) & (std > 1e-9 * np.maximum(1.0, np.abs(mean))) & (np.abs(score) >= z)
+        d_idx, c_idx = np.nonzero(flag)
+        parts.append(pd.DataFrame({
+            "Desde": days[d_idx],
+            "Nome": nomes[c_idx],
+            "Metrica": metrica,
+            "Valor": x[flag],
+            "Media_Ref": mean[flag],
+            "Z": score[flag],
+            "Direcao": np.where(score[flag] > 0, "alta", "queda"),
+        }))
+    return pd.concat(parts, ignore_index=True).sort_values(["Desde", "Nome", "Metrica"], ignore_index=True)
+
+
+@stage
+def build_executive_diagnosis(camp_agg_strat: pd.DataFrame, daily: pd.DataFrame = None,
+                              trends: pd.DataFrame = None, trend_window: int = 7) -> dict:
+    df = camp_agg_strat
+
+    invest, receita, vendas = (float(_num_col(df, c).fillna(0).sum()) for c in ("Investimento", "Receita", "Vendas"))
     roas = _safe_div(receita, invest)
     acos = _safe_div(invest, receita)
 
     trend = {"cpc_proxy_up": None, "ticket_down": None, "roas_down": None}
-
-    if daily is not None and len(daily) >= 14 and "Desde" in daily.columns:
-        d = daily.copy().sort_values("Desde")
-        last7 = d.tail(7)
-        prev7 = d.tail(14).head(7)
-
-        inv_l = float(pd.to_numeric(last7["Investimento"], errors="coerce").fillna(0).sum())
-        clk_l = float(pd.to_numeric(last7["Cliques"], errors="coerce").fillna(0).sum())
-        rec_l = float(pd.to_numeric(last7["Receita"], errors="coerce").fillna(0).sum())
-        ven_l = float(pd.to_numeric(last7["Vendas"], errors="coerce").fillna(0).sum())
-
-        inv_p = float(pd.to_numeric(prev7["Investimento"], errors="coerce").fillna(0).sum())
-        clk_p = float(pd.to_numeric(prev7["Cliques"], errors="coerce").fillna(0).sum())
-        rec_p = float(pd.to_numeric(prev7["Receita"], errors="coerce").fillna(0).sum())
-        ven_p = float(pd.to_numeric(prev7["Vendas"], errors="coerce").fillna(0).sum())
-
-        cpc_l = _safe_div(inv_l, clk_l)
-        cpc_p = _safe_div(inv_p, clk_p)
-        ticket_l = _safe_div(rec_l, ven_l)
-        ticket_p = _safe_div(rec_p, ven_p)
-        roas_l = _safe_div(rec_l, inv_l)
-        roas_p = _safe_div(rec_p, inv_p)
-
-        if cpc_p > 0:
-            trend["cpc_proxy_up"] = (cpc_l / cpc_p) - 1.0
-        if ticket_p > 0:
-            trend["ticket_down"] = (ticket_l / ticket_p) - 1.0
-        if roas_p > 0:
-            trend["roas_down"] = (roas_l / roas_p) - 1.0
+    w = trend_window
+
+    if daily is not None and len(daily) >= 2 * w and "Desde" in daily.columns:
+        d = daily.sort_values("Desde")
+        vals = np.column_stack([_num_col(d, c).fillna(0).to_numpy() for c in TREND_SRC])
+        last = dict(zip(TREND_SRC, vals[-w:].sum(axis=0)))
+        prev = dict(zip(TREND_SRC, vals[-2 * w:-w].sum(axis=0)))
+        t = _window_trends(last, prev)
+        for key, src in (("cpc_proxy_up", "cpc"), ("ticket_down", "ticket"), ("roas_down", "roas")):
+            if not np.isnan(t[src]):
+                trend[key] = float(t[src])
+
+    # Campanhas que mais encareceram o clique na janela, quando o CPC da conta subiu
+    drivers = None
+    col = f"Custo_Extra_CPC_{w}d"
+    if trends is not None and col in trends.columns and (trend["cpc_proxy_up"] or 0) > 0:
+        top = trends[trends[col] > 0].nlargest(5, col)
+        drivers = top[["Nome", f"CPC_{w}d", f"Var_CPC_{w}d", col]].reset_index(drop=True)
 
     mines = df[df["Quadrante"] == "ESCALA_ORCAMENTO"]
     giants = df[df["Quadrante"] == "COMPETITIVIDADE"]
@@ -239,7 +1120,7 @@ def build_executive_diagnosis(camp_agg_strat: pd.DataFrame, daily: pd.DataFrame
 
     mines_cnt = int(len(mines))
     giants_cnt = int(len(giants))
-    hemorr_share_inv = _safe_div(float(pd.to_numeric(hemorr["Investimento"], errors="coerce").fillna(0).sum()), invest)
+    hemorr_share_inv = _safe_div(float(_num_col(hemorr, "Investimento").fillna(0).sum()), invest)
 
     if (mines_cnt + giants_cnt) >= 3:
         verdict = "Estamos deixando dinheiro na mesa."
@@ -255,33 +1136,90 @@ def build_executive_diagnosis(camp_agg_strat: pd.DataFrame, daily: pd.DataFrame
         "ROAS": roas,
         "ACOS_real": acos,
         "Tendencias": trend,
+        "Janela_Tendencia": w,
+        "Campanhas_CPC": drivers,
         "Veredito": verdict
     }
 
 
+@stage
 def build_opportunity_highlights(camp_agg_strat: pd.DataFrame) -> dict:
-    df = camp_agg_strat.copy()
+    df = camp_agg_strat
 
-    locomotivas = df[(df["CPI_80"] == True) & (df["Quadrante"] == "COMPETITIVIDADE")].copy()
+    locomotivas = df[(df["CPI_80"] == True) & (df["Quadrante"] == "COMPETITIVIDADE")]
     locomotivas = locomotivas.sort_values("Receita", ascending=False).head(5)
 
-    minas = df[df["Quadrante"] == "ESCALA_ORCAMENTO"].copy()
-    minas = minas.sort_values(["ROAS_Real", "Perdidas_Orc"], ascending=[False, False]).head(5)
-
-    def proj(row):
-        receita = float(row.get("Receita", 0) or 0)
-        lost = float(row.get("Perdidas_Orc", 0) or 0)
-        if lost <= 0 or lost >= 95:
-            return 0.0
-        factor = lost / max(1.0, (100.0 - lost))
-        return receita * factor
+    minas = df[df["Quadrante"] == "ESCALA_ORCAMENTO"]
+    minas = minas.sort_values(["ROAS_Real", "Perdidas_Orc"], ascending=[False, False]).head(5).copy()
 
-    minas["Potencial_Receita"] = minas.apply(proj, axis=1)
+    minas["Potencial_Receita"] = _potencial_receita(_num_col(minas, "Receita").to_numpy(), _num_col(minas, "Perdidas_Orc").to_numpy())
     return {"Locomotivas": locomotivas, "Minas": minas}
 
 
+def _potencial_receita(receita: np.ndarray, lost: np.ndarray) -> np.ndarray:
+    # Receita extra estimada se a campanha nao perdesse impressoes por orcamento
+    with np.errstate(invalid="ignore"):
+        factor = lost / np.maximum(1.0, 100.0 - lost)
+        return np.where((lost <= 0) | (lost >= 95), 0.0, receita * factor)
+
+
+@stage
+def sweep_strategy(camp_agg: pd.DataFrame, grid: dict, chunk_cells: int = 5_000_000) -> pd.DataFrame:
+    """Avalia todas as combinacoes de limiares de grid numa passada vetorizada.
+
+    grid mapeia parametros de add_strategy_fields para listas de valores; os
+    ausentes ficam no padrao. Devolve uma linha por combinacao com a contagem
+    de campanhas por quadrante, a fatia do investimento em HEMORRAGIA e o
+    Potencial_Receita das 5 Minas destacadas (e de todas as Minas).
+    """
+    unknown = set(grid) - set(STRATEGY_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Parametro(s) de estrategia desconhecido(s): {', '.join(sorted(unknown))}")
+
+    names = list(STRATEGY_DEFAULTS)
+    combos = np.array(
+        list(itertools.product(*[grid.get(n, [STRATEGY_DEFAULTS[n]]) for n in names])),
+        dtype="float64",
+    ).reshape(-1, len(names))
+
+    # Tudo que nao depende dos limiares e calculado uma unica vez
+    base = add_strategy_fields(camp_agg)
+    arr = _strategy_arrays(base)
+    receita_relevante = max(500.0, float(base["Receita"].sum()) * 0.05)
+    invest = _num_col(base, "Investimento").fillna(0).to_numpy()
+    invest_total = float(invest.sum())
+    pot = np.nan_to_num(_potencial_receita(arr["receita"], arr["lost_b"]))
+    order = base.sort_values(["ROAS_Real", "Perdidas_Orc"], ascending=[False, False]).index.to_numpy()
+    pot_sorted = pot[order]
+
+    n = len(base)
+    step = max(1, chunk_cells // max(n, 1))
+    results = []
+    for start in range(0, len(combos), step):
+        chunk = combos[start:start + step]
+        params = {name: chunk[:, [i]] for i, name in enumerate(names)}
+        escala, compet, hem = _quadrant_masks(**arr, receita_relevante=receita_relevante, **params)
+        compet = compet & ~escala
+        hem = hem & ~escala & ~compet
+        estavel = ~(escala | compet | hem)
+
+        esc_sorted = escala[:, order]
+        top5 = esc_sorted & (np.cumsum(esc_sorted, axis=1) <= 5)
+
+        out = pd.DataFrame(chunk, columns=names)
+        for q, mask in zip(QUADRANTES, (escala, compet, hem, estavel)):
+            out[q] = mask.sum(axis=1)
+        out["Share_Invest_Hemorragia"] = (hem @ invest) / invest_total if invest_total else 0.0
+        out["Potencial_Receita_Minas"] = top5 @ pot_sorted
+        out["Potencial_Receita_Todas_Minas"] = escala @ pot
+        results.append(out)
+
+    return pd.concat(results, ignore_index=True)
+
+
+@stage
 def build_7_day_plan(camp_agg_strat: pd.DataFrame) -> pd.DataFrame:
-    df = camp_agg_strat.copy()
+    df = camp_agg_strat
 
     d1 = df[df["Quadrante"] == "ESCALA_ORCAMENTO"][["Nome","Orçamento","Perdidas_Orc","ROAS_Real","Acao_Recomendada"]].copy()
     d1["Dia"] = "Dia 1"
@@ -299,62 +1237,284 @@ def build_7_day_plan(camp_agg_strat: pd.DataFrame) -> pd.DataFrame:
     return plan.sort_values(["Dia"], ascending=True)
 
 
+def _fill_budget(seg_len: np.ndarray, seg_roas: np.ndarray, budget: float, spend0: float, rev0: float,
+                 acos_max: float = None) -> np.ndarray:
+    """Distribui `budget` pelos segmentos lineares (receita = roas x gasto), maior ROAS primeiro.
+
+    Com receita linear ate a demanda e plana depois, o guloso por ROAS e o otimo
+    (mochila fracionaria). acos_max limita o ACOS total (gasto/receita) do plano,
+    contando spend0/rev0; se eles ja passam do limite so entram segmentos que o baixam.
+    """
+    order = np.argsort(-seg_roas, kind="stable")
+    length, roas = seg_len[order], seg_roas[order]
+    before = np.concatenate([[0.0], np.cumsum(length)[:-1]])
+    alloc = np.clip(budget - before, 0.0, length)
+    if acos_max is not None and acos_max > 0:
+        spend = spend0 + np.concatenate([[0.0], np.cumsum(alloc)[:-1]])
+        rev = rev0 + np.concatenate([[0.0], np.cumsum(alloc * roas)[:-1]])
+        # Quanto do segmento cabe mantendo (gasto + x) / (receita + roas x) <= acos_max
+        with np.errstate(divide="ignore", invalid="ignore"):
+            room = np.where(acos_max * roas >= 1.0, np.inf, (acos_max * rev - spend) / (1.0 - acos_max * roas))
+        limited = np.minimum(alloc, np.maximum(room, 0.0))
+        # Depois do primeiro segmento cortado os seguintes (ROAS menor) nao entram
+        cut = np.flatnonzero(limited < alloc)
+        if len(cut):
+            limited[cut[0] + 1:] = 0.0
+        alloc = limited
+    out = np.empty_like(alloc)
+    out[order] = alloc
+    return out
+
+
+@stage
+def build_budget_plan(
+    camp_agg_strat: pd.DataFrame,
+    orcamento_total: float = None,
+    dias: int = 30,
+    piso_pct: float = 0.5,
+    teto_pct: float = 2.0,
+    acos_max: float = None,
+    pisos: pd.Series = None,
+    tetos: pd.Series = None,
+) -> pd.DataFrame:
+    """Redistribui um orcamento diario total entre todas as campanhas maximizando a receita projetada.
+
+    Mesmo modelo de Potencial_Receita: a campanha gasta hoje Investimento/dias
+    por dia com o ROAS_Real observado, e sem perda por orcamento gastaria
+    gasto / (1 - Perdidas_Orc/100) com o mesmo ROAS; acima disso mais verba
+    nao rende. Cada campanha fica entre piso_pct e teto_pct do orcamento atual
+    (ou pisos/tetos por Nome) e, se o ACOS real passa do ACOS objetivo, nao
+    recebe aumento. orcamento_total padrao: a soma dos orcamentos atuais.
+    acos_max limita o ACOS projetado da conta; se nem com a verba nas campanhas
+    de ACOS abaixo dele os pisos ficam dentro do limite, Limite_ACOS_Viavel
+    sai False e o plano fica acima do limite.
+    """
+    df = camp_agg_strat
+    n = len(df)
+    gasto = _num_col(df, "Investimento").fillna(0).to_numpy() / max(int(dias or 1), 1)
+    roas = _num_col(df, "ROAS_Real").fillna(0).to_numpy()
+    lost = _num_col(df, "Perdidas_Orc").fillna(0).to_numpy()
+    atual = _num_col(df, "Orçamento").to_numpy()
+    atual = np.where(np.isfinite(atual) & (atual > 0), atual, gasto)
+
+    # Perda >= 95% fica fora do modelo, como em _potencial_receita
+    limitada = (lost > 0) & (lost < 95)
+    demanda = np.where(limitada, gasto / np.maximum(1e-9, 1.0 - lost / 100.0), gasto)
+
+    piso = atual * piso_pct
+    teto = atual * teto_pct
+    if pisos is not None:
+        piso = df["Nome"].map(pisos).astype("float64").fillna(pd.Series(piso, index=df.index)).to_numpy()
+    if tetos is not None:
+        teto = df["Nome"].map(tetos).astype("float64").fillna(pd.Series(teto, index=df.index)).to_numpy()
+    acos_real = _num_col(df, "ACOS_Real").to_numpy()
+    acos_obj = _num_col(df, "ACOS_Objetivo_N", default=np.nan).to_numpy()
+    with np.errstate(invalid="ignore"):
+        acima = (acos_obj > 0) & (acos_real > acos_obj)
+    # Sem gasto nao ha ROAS para projetar: orcamento fica como esta
+    sem_dados = gasto <= 0
+    teto = np.where(acima, np.minimum(teto, atual), teto)
+    teto = np.where(sem_dados, atual, teto)
+    piso = np.where(sem_dados, atual, np.minimum(piso, teto))
+
+    total = float(np.sum(atual)) if orcamento_total is None else float(orcamento_total)
+    piso_total = float(np.sum(piso))
+    if piso_total > total and piso_total > 0:
+        # Orcamento nao cobre os pisos: todos encolhem na mesma proporcao
+        piso = piso * (total / piso_total)
+        piso_total = total
+
+    # Segmento produtivo de cada campanha: do piso ate min(teto, demanda), rendendo ROAS_Real
+    seg = np.maximum(0.0, np.minimum(teto, demanda) - piso)
+    base_gasto = np.minimum(piso, demanda)
+    piso_gasto, piso_receita = float(np.sum(base_gasto)), float(np.sum(roas * base_gasto))
+    extra = _fill_budget(seg, roas, max(0.0, total - piso_total), piso_gasto, piso_receita, acos_max)
+    sugerido = piso + extra
+    # Sobra: devolve as campanhas cortadas ate o orcamento atual, maior ROAS primeiro. So as que ja
+    # estao na demanda: verba acima dela nao e gasta, entao nao muda receita nem ACOS projetados
+    sobra = total - float(np.sum(sugerido))
+    if sobra > 1e-9:
+        livre = np.where(sugerido >= demanda - 1e-9, np.maximum(0.0, np.minimum(teto, atual) - sugerido), 0.0)
+        sugerido = sugerido + _fill_budget(livre, roas, sobra, 0.0, 0.0)
+    gasto_proj = np.minimum(sugerido, demanda)
+    # O guloso por ROAS e tambem o de menor ACOS: se passou do limite, nao havia como respeita-lo
+    viavel = not acos_max or acos_max <= 0 or float(np.sum(gasto_proj)) <= acos_max * float(np.sum(roas * gasto_proj)) + 1e-9
+
+    plan = pd.DataFrame({
+        "Nome": df["Nome"].to_numpy(),
+        "Quadrante": df["Quadrante"].to_numpy() if "Quadrante" in df.columns else None,
+        "ROAS_Real": roas,
+        "Perdidas_Orc": lost,
+        "Orcamento_Atual": atual,
+        "Gasto_Diario": gasto,
+        "Demanda_Diaria": demanda,
+        "Piso": piso,
+        "Teto": teto,
+        "Orcamento_Sugerido": sugerido,
+        "Variacao_Pct": _safe_div_vec(pd.Series(sugerido - atual), pd.Series(atual)).to_numpy(),
+        "Gasto_Projetado": gasto_proj,
+        "Receita_Diaria_Atual": roas * gasto,
+        "Receita_Diaria_Projetada": roas * gasto_proj,
+    })
+    plan["Ganho_Receita_Diaria"] = plan["Receita_Diaria_Projetada"] - plan["Receita_Diaria_Atual"]
+    plan["Limite_ACOS_Viavel"] = viavel
+    return plan.sort_values(["Ganho_Receita_Diaria", "ROAS_Real"], ascending=False, ignore_index=True)
+
+
+@stage
 def build_control_panel(camp_agg_strat: pd.DataFrame) -> pd.DataFrame:
-    df = camp_agg_strat.copy()
+    df = camp_agg_strat
     panel = df[[
         "Nome","Orçamento","ACOS Objetivo","ROAS_Real","Perdidas_Orc","Perdidas_Class","Acao_Recomendada"
-    ]].copy()
+    ]]
     if "Receita" in df.columns:
         panel = panel.join(df[["Nome","Receita"]].set_index("Nome"), on="Nome")
         panel = panel.sort_values("Receita", ascending=False).drop(columns=["Receita"])
     return panel
 
 
-def build_tables(
-    org: pd.DataFrame,
-    camp_agg: pd.DataFrame,
-    pat: pd.DataFrame,
-    enter_visitas_min: int = 50,
-    enter_conv_min: float = 0.05,
-    pause_invest_min: float = 100.0,
-    pause_cvr_max: float = 0.01
-):
-    camp_strat = add_strategy_fields(camp_agg)
-
+@stage
+def build_pause_table(camp_strat: pd.DataFrame, pause_invest_min: float = 100.0, pause_cvr_max: float = 0.01) -> pd.DataFrame:
     pause = camp_strat[
         (camp_strat["Investimento"] > pause_invest_min) &
         ((camp_strat["Vendas"] <= 0) | (camp_strat["CVR"] < pause_cvr_max) | (camp_strat["Quadrante"] == "HEMORRAGIA"))
     ].copy()
     pause["Ação"] = "PAUSAR/REVISAR"
-    pause = pause.sort_values("Investimento", ascending=False)
+    return pause.sort_values("Investimento", ascending=False)
+
 
-    ads_ids = set(pat["ID"].dropna().astype(str).unique())
+@stage
+def build_enter_table(org: pd.DataFrame, pat: pd.DataFrame, enter_visitas_min: int = 50, enter_conv_min: float = 0.05) -> pd.DataFrame:
+    int_ids = pd.api.types.is_integer_dtype(org["ID"]) and pd.api.types.is_integer_dtype(pat["ID"])
+    if int_ids:
+        in_ads = org["ID"].isin(pat["ID"].unique())
+    else:
+        ads_ids = set(pat["ID"].dropna().astype(str).unique())
+        in_ads = org["ID"].astype(str).isin(ads_ids)
     enter = org[
         (org["Visitas"] >= enter_visitas_min) &
         (org["Conv_Visitas_Vendas"] > enter_conv_min) &
-        (~org["ID"].astype(str).isin(ads_ids))
+        (~in_ads)
     ].copy()
+    if int_ids:
+        enter["ID"] = enter["ID"].astype(str)
     enter["Codigo_MLB"] = "MLB" + enter["ID"].astype(str)
     enter["Ação"] = "INSERIR EM ADS"
     enter = enter.sort_values(["Conv_Visitas_Vendas","Visitas"], ascending=[False, False])
-    enter = enter[["ID","Codigo_MLB","Titulo","Conv_Visitas_Vendas","Visitas","Qtd_Vendas","Vendas_Brutas","Ação"]]
+    return enter[["ID","Codigo_MLB","Titulo","Conv_Visitas_Vendas","Visitas","Qtd_Vendas","Vendas_Brutas","Ação"]]
 
+
+@stage
+def build_scale_table(camp_strat: pd.DataFrame) -> pd.DataFrame:
     scale = camp_strat[camp_strat["Quadrante"] == "ESCALA_ORCAMENTO"].copy()
     scale["Ação"] = "AUMENTAR ORCAMENTO"
     if "Perdidas_Orc" in scale.columns:
         scale = scale.sort_values("Perdidas_Orc", ascending=False)
+    return scale
+
 
+@stage
+def build_acos_table(camp_strat: pd.DataFrame) -> pd.DataFrame:
     acos = camp_strat[camp_strat["Quadrante"] == "COMPETITIVIDADE"].copy()
     acos["Ação"] = "SUBIR ACOS OBJETIVO"
     if "Perdidas_Class" in acos.columns:
         acos = acos.sort_values("Perdidas_Class", ascending=False)
+    return acos
+
+
+def _listing_ids(ids: pd.Series) -> pd.Series:
+    if pd.api.types.is_integer_dtype(ids):
+        return ids.astype("int64")
+    ids = ids.astype(str).str.replace("MLB", "", regex=False)
+    return pd.to_numeric(ids, errors="coerce").astype("Int64")
+
+
+@stage
+def build_listing_facts(org: pd.DataFrame, pat: pd.DataFrame) -> pd.DataFrame:
+    """Tabela por anuncio, indexada pelo ID MLB numerico, com organico + patrocinado.
+
+    O indice e unico e ordenado, entao facts.loc[id] e uma busca em hash. IDs que
+    nao sao numericos ficam de fora.
+    """
+    org_cols = ["Titulo", "Visitas", "Qtd_Vendas", "Vendas_Brutas", "Conv_Visitas_Vendas"]
+    o = org[[c for c in org_cols if c in org.columns]].copy()
+    o.index = _listing_ids(org["ID"])
+    o = o[o.index.notna()]
+    o = o[~o.index.duplicated(keep="first")]
+
+    pat_cols = {
+        "Impressões": "Impressoes_Ads",
+        "Cliques": "Cliques_Ads",
+        "Receita\n(Moeda local)": "Receita_Ads",
+        "Investimento\n(Moeda local)": "Investimento_Ads",
+        "Vendas por publicidade\n(Diretas + Indiretas)": "Vendas_Ads",
+    }
+    p = pd.DataFrame({dst: _num_col(pat, src, default=np.nan) for src, dst in pat_cols.items()}, index=pat.index)
+    p["ID"] = _listing_ids(pat["ID"]).to_numpy()
+    p = p.dropna(subset=["ID"]).groupby("ID").sum(min_count=1)
+    p["Em_Ads"] = True
+
+    facts = o.join(p, how="outer")
+    facts.index = facts.index.astype("int64")
+    facts.index.name = "ID"
+    facts = facts.sort_index()
+    facts["Em_Ads"] = facts["Em_Ads"].fillna(False).astype(bool)
+    facts["Em_Organico"] = facts.index.isin(o.index)
+
+    receita_ads = _num_col(facts, "Receita_Ads").fillna(0)
+    vendas_ads = _num_col(facts, "Vendas_Ads").fillna(0)
+    facts["Share_Receita_Ads"] = _ratio_or_nan(receita_ads, _num_col(facts, "Vendas_Brutas"))
+    facts["Share_Vendas_Ads"] = _ratio_or_nan(vendas_ads, _num_col(facts, "Qtd_Vendas"))
+    facts["Conv_Ads"] = _ratio_or_nan(vendas_ads, _num_col(facts, "Cliques_Ads"))
+    facts["Lift_Conv_Ads"] = _ratio_or_nan(facts["Conv_Ads"], _num_col(facts, "Conv_Visitas_Vendas"))
+    return facts
+
+
+def _ratio_or_nan(a: pd.Series, b: pd.Series) -> pd.Series:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return a.where(b > 0) / b.where(b > 0)
+
+
+def listing_lookup(facts: pd.DataFrame, listing_id):
+    """Linha do anuncio em facts (aceita 123 ou "MLB123"); None se nao existir."""
+    key = int(str(listing_id).upper().replace("MLB", ""))
+    try:
+        return facts.loc[key]
+    except KeyError:
+        return None
+
 
-    invest_total = float(pd.to_numeric(camp_agg["Investimento"], errors="coerce").fillna(0).sum())
-    receita_total = float(pd.to_numeric(camp_agg["Receita"], errors="coerce").fillna(0).sum())
-    vendas_total = int(pd.to_numeric(camp_agg["Vendas"], errors="coerce").fillna(0).sum())
+@stage
+def build_cannibalization_table(
+    facts: pd.DataFrame,
+    share_min: float = 0.7,
+    conv_org_min: float = 0.05,
+    visitas_min: int = 50,
+) -> pd.DataFrame:
+    # Anuncio que ja converte bem no organico e tem quase todas as vendas atribuidas a Ads:
+    # o investimento provavelmente paga vendas que aconteceriam de qualquer forma
+    mask = (
+        facts["Em_Ads"]
+        & (_num_col(facts, "Visitas") >= visitas_min)
+        & (_num_col(facts, "Conv_Visitas_Vendas") >= conv_org_min)
+        & (_num_col(facts, "Share_Vendas_Ads") >= share_min)
+    )
+    out = facts[mask].reset_index()
+    out.insert(1, "Codigo_MLB", "MLB" + out["ID"].astype(str))
+    out["Ação"] = "REDUZIR LANCE/TESTAR SEM ADS"
+    cols = ["ID", "Codigo_MLB", "Titulo", "Visitas", "Conv_Visitas_Vendas", "Conv_Ads", "Qtd_Vendas", "Vendas_Ads",
+            "Share_Vendas_Ads", "Investimento_Ads", "Receita_Ads", "Ação"]
+    return out[[c for c in cols if c in out.columns]].sort_values("Investimento_Ads", ascending=False)
+
+
+@stage
+def build_kpis(camp_agg: pd.DataFrame, pat: pd.DataFrame) -> dict:
+    invest_total = float(_num_col(camp_agg, "Investimento").fillna(0).sum())
+    receita_total = float(_num_col(camp_agg, "Receita").fillna(0).sum())
+    vendas_total = int(_num_col(camp_agg, "Vendas").fillna(0).sum())
     roas_total = (receita_total / invest_total) if invest_total else 0.0
 
-    kpis = {
+    return {
         "Campanhas únicas": int(camp_agg["Nome"].nunique()),
         "IDs patrocinados únicos": int(pat["ID"].nunique()),
         "Investimento Ads (R$)": invest_total,
@@ -363,14 +1523,44 @@ def build_tables(
         "ROAS": roas_total,
     }
 
+
+@stage
+def build_tables(
+    org: pd.DataFrame,
+    camp_agg: pd.DataFrame,
+    pat: pd.DataFrame,
+    enter_visitas_min: int = 50,
+    enter_conv_min: float = 0.05,
+    pause_invest_min: float = 100.0,
+    pause_cvr_max: float = 0.01,
+    camp_strat: pd.DataFrame = None,
+):
+    if camp_strat is None:
+        camp_strat = add_strategy_fields(camp_agg)
+
+    pause = build_pause_table(camp_strat, pause_invest_min=pause_invest_min, pause_cvr_max=pause_cvr_max)
+    enter = build_enter_table(org, pat, enter_visitas_min=enter_visitas_min, enter_conv_min=enter_conv_min)
+    scale = build_scale_table(camp_strat)
+    acos = build_acos_table(camp_strat)
+    kpis = build_kpis(camp_agg, pat)
+
     return kpis, pause, enter, scale, acos, camp_strat
 
 
-def gerar_excel(kpis, camp_agg, pause, enter, scale, acos, camp_strat, daily=None) -> bytes:
-    diagnosis = build_executive_diagnosis(camp_strat, daily=daily)
-    highlights = build_opportunity_highlights(camp_strat)
-    plan7 = build_7_day_plan(camp_strat)
-    panel = build_control_panel(camp_strat)
+@stage
+def report_sheets(kpis, camp_agg, pause, enter, scale, acos, camp_strat, daily=None,
+                  diagnosis=None, highlights=None, plan7=None, panel=None, cannibal=None,
+                  trends=None, anomalies=None, budget_plan=None) -> dict:
+    if diagnosis is None:
+        diagnosis = build_executive_diagnosis(camp_strat, daily=daily, trends=trends)
+    if highlights is None:
+        highlights = build_opportunity_highlights(camp_strat)
+    if plan7 is None:
+        plan7 = build_7_day_plan(camp_strat)
+    if panel is None:
+        panel = build_control_panel(camp_strat)
+    if budget_plan is None:
+        budget_plan = build_budget_plan(camp_strat, dias=len(daily) if daily is not None and len(daily) else 30)
 
     resumo = pd.DataFrame([kpis])
     diag_df = pd.DataFrame([{
@@ -383,23 +1573,314 @@ def gerar_excel(kpis, camp_agg, pause, enter, scale, acos, camp_strat, daily=Non
         "Trend_cpc_proxy": diagnosis["Tendencias"]["cpc_proxy_up"],
         "Trend_ticket": diagnosis["Tendencias"]["ticket_down"],
         "Trend_roas": diagnosis["Tendencias"]["roas_down"],
+        "Trend_janela_dias": diagnosis.get("Janela_Tendencia", 7),
+        "Campanhas_puxando_CPC": (
+            ", ".join(diagnosis["Campanhas_CPC"]["Nome"].astype(str))
+            if diagnosis.get("Campanhas_CPC") is not None else None
+        ),
     }])
 
+    sheets = {
+        "DIAGNOSTICO_EXEC": diag_df,
+        "RESUMO": resumo,
+        "PAINEL_GERAL": panel,
+        "MATRIZ_CPI": camp_strat,
+        "LOCOMOTIVAS": highlights["Locomotivas"],
+        "MINAS_LIMITADAS": highlights["Minas"],
+        "PLANO_7_DIAS": plan7,
+        "PLANO_ORCAMENTO": budget_plan,
+        "PAUSAR_CAMPANHAS": pause,
+        "ENTRAR_EM_ADS": enter,
+        "ESCALAR_ORCAMENTO": scale,
+        "SUBIR_ACOS": acos,
+        "BASE_CAMPANHAS_AGG": camp_agg,
+    }
+    if daily is not None:
+        sheets["SERIE_DIARIA"] = daily
+    if cannibal is not None:
+        sheets["ADS_CANIBALIZANDO"] = cannibal
+    if trends is not None:
+        sheets["TENDENCIAS_CAMPANHAS"] = trends
+    if anomalies is not None:
+        sheets["ANOMALIAS_DIARIAS"] = anomalies
+    return sheets
+
+
+# "xlsx" (openpyxl, planilha formatada pelo pandas), "xlsx-stream" (memoria constante,
+# linha a linha), "parquet" e "csv" (zip com um arquivo por aba)
+REPORT_FORMATS = ["xlsx", "xlsx-stream", "parquet", "csv"]
+
+
+def _xlsx_value(v):
+    if v is None or v is pd.NA or v is pd.NaT:
+        return None
+    if isinstance(v, float) and v != v:
+        return None
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def _write_xlsx_stream(sheets: dict, out) -> None:
+    if _has_module("xlsxwriter"):
+        with pd.ExcelWriter(out, engine="xlsxwriter", engine_kwargs={"options": {"constant_memory": True}}) as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, index=False, sheet_name=name)
+        return
+
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(name)
+        ws.append([str(c) for c in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_xlsx_value(v) for v in row])
+    wb.save(out)
+
+
+def _write_zip_bundle(sheets: dict, out, formato: str) -> None:
+    import zipfile
+    from io import TextIOWrapper
+
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, df in sheets.items():
+            if formato == "parquet":
+                buf = BytesIO()
+                df.to_parquet(buf, index=False)
+                zf.writestr(f"{name}.parquet", buf.getbuffer())
+            else:
+                with zf.open(f"{name}.csv", "w") as raw, TextIOWrapper(raw, encoding="utf-8", newline="") as fh:
+                    df.to_csv(fh, index=False)
+
+
+@stage
+def write_report(sheets: dict, out, formato: str = "xlsx") -> None:
+    if formato == "xlsx":
+        with pd.ExcelWriter(out, engine="openpyxl") as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, index=False, sheet_name=name)
+    elif formato == "xlsx-stream":
+        _write_xlsx_stream(sheets, out)
+    elif formato in ("parquet", "csv"):
+        _write_zip_bundle(sheets, out, formato)
+    else:
+        raise ValueError(f"Formato de relatorio desconhecido: {formato}")
+
+
+@stage
+def gerar_excel(kpis, camp_agg, pause, enter, scale, acos, camp_strat, daily=None, formato: str = "xlsx") -> bytes:
     out = BytesIO()
-    with pd.ExcelWriter(out, engine="openpyxl") as writer:
-        diag_df.to_excel(writer, index=False, sheet_name="DIAGNOSTICO_EXEC")
-        resumo.to_excel(writer, index=False, sheet_name="RESUMO")
-        panel.to_excel(writer, index=False, sheet_name="PAINEL_GERAL")
-        camp_strat.to_excel(writer, index=False, sheet_name="MATRIZ_CPI")
-        highlights["Locomotivas"].to_excel(writer, index=False, sheet_name="LOCOMOTIVAS")
-        highlights["Minas"].to_excel(writer, index=False, sheet_name="MINAS_LIMITADAS")
-        plan7.to_excel(writer, index=False, sheet_name="PLANO_7_DIAS")
-        pause.to_excel(writer, index=False, sheet_name="PAUSAR_CAMPANHAS")
-        enter.to_excel(writer, index=False, sheet_name="ENTRAR_EM_ADS")
-        scale.to_excel(writer, index=False, sheet_name="ESCALAR_ORCAMENTO")
-        acos.to_excel(writer, index=False, sheet_name="SUBIR_ACOS")
-        camp_agg.to_excel(writer, index=False, sheet_name="BASE_CAMPANHAS_AGG")
+    write_report(report_sheets(kpis, camp_agg, pause, enter, scale, acos, camp_strat, daily=daily), out, formato=formato)
+    return out.getvalue()
+
+
+class ReportContext:
+    """Calcula cada artefato do relatorio uma unica vez, sob demanda.
+
+    Dashboard e exportacao leem os mesmos frames (nao devem altera-los). Ao
+    mudar uma regra com update(), so os artefatos que dependem dela sao
+    descartados e recalculados no proximo acesso.
+    """
+
+    PARAMS = {
+        **STRATEGY_DEFAULTS,
+        "enter_visitas_min": 50,
+        "enter_conv_min": 0.05,
+        "pause_invest_min": 100.0,
+        "pause_cvr_max": 0.01,
+        "trend_window": 7,
+        "anomaly_window": 28,
+        "anomaly_z": 3.0,
+        # Plano de orcamento: None = soma dos orcamentos atuais / sem limite de ACOS
+        "plan_budget": None,
+        "plan_floor_pct": 0.5,
+        "plan_cap_pct": 2.0,
+        "plan_acos_max": None,
+        "plan_days": 30,
+    }
+    STRATEGY_PARAMS = tuple(STRATEGY_DEFAULTS)
+
+    # artefato -> artefatos/regras de que depende
+    DEPS = {
+        "camp_agg": (),
+        "daily": (),
+        "camp_strat": ("camp_agg",) + STRATEGY_PARAMS,
+        "pause": ("camp_strat", "pause_invest_min", "pause_cvr_max"),
+        "enter": ("enter_visitas_min", "enter_conv_min"),
+        "scale": ("camp_strat",),
+        "acos": ("camp_strat",),
+        "kpis": ("camp_agg",),
+        "trends": (),
+        "anomalies": ("anomaly_window", "anomaly_z"),
+        "diagnosis": ("camp_strat", "daily", "trends", "trend_window"),
+        "highlights": ("camp_strat",),
+        "plan7": ("camp_strat",),
+        "panel": ("camp_strat",),
+        "budget_plan": ("camp_strat", "daily", "plan_budget", "plan_floor_pct", "plan_cap_pct", "plan_acos_max", "plan_days"),
+        "facts": (),
+        "cannibal": ("facts", "enter_visitas_min", "enter_conv_min"),
+        # So a ultima grade pedida a sweep(); a grade ja traz as regras de estrategia
+        "sweep": ("camp_agg",),
+    }
+
+    def __init__(self, org, camp, pat, modo: str = "consolidado", camp_agg=None, daily=None,
+                 camp_diario=None, compact: bool = False, backend: str = None, **params):
+        unknown = set(params) - set(self.PARAMS)
+        if unknown:
+            raise TypeError(f"Regra(s) desconhecida(s): {', '.join(sorted(unknown))}")
+        self.org, self.camp, self.pat, self.modo = org, camp, pat, modo
+        self.compact = compact
+        self.backend = backend
+        # Linhas diarias usadas nas tendencias por campanha (ex.: historico acumulado); padrao e o proprio camp
+        self.camp_diario = camp_diario if camp_diario is not None else (camp if modo == "diario" else None)
+        self.params = {**self.PARAMS, **params}
+        self.compute_counts = {}
+        self._cache = {}
+        self._excel = {}
+        if camp_agg is not None:
+            self._cache["camp_agg"] = camp_agg
         if daily is not None:
-            daily.to_excel(writer, index=False, sheet_name="SERIE_DIARIA")
-    out.seek(0)
-    return out.read()
+            self._cache["daily"] = daily
+
+    def preload(self, **artifacts) -> None:
+        """Usa artefatos ja calculados (ex.: de um snapshot com as mesmas regras) em vez de recalcula-los."""
+        unknown = set(artifacts) - set(self.DEPS)
+        if unknown:
+            raise TypeError(f"Artefato(s) desconhecido(s): {', '.join(sorted(unknown))}")
+        self._cache.update({k: v for k, v in artifacts.items() if v is not None})
+        self._excel.clear()
+
+    def same_inputs(self, org, camp, pat, modo: str) -> bool:
+        return self.org is org and self.camp is camp and self.pat is pat and self.modo == modo
+
+    def update(self, **params) -> set:
+        unknown = set(params) - set(self.PARAMS)
+        if unknown:
+            raise TypeError(f"Regra(s) desconhecida(s): {', '.join(sorted(unknown))}")
+        changed = {k for k, v in params.items() if self.params[k] != v}
+        self.params.update(params)
+        return self._invalidate(changed)
+
+    def _invalidate(self, changed: set) -> set:
+        stale = set(changed)
+        grew = True
+        while grew:
+            grew = False
+            for name, deps in self.DEPS.items():
+                if name not in stale and stale.intersection(deps):
+                    stale.add(name)
+                    grew = True
+        dropped = {name for name in stale if self._cache.pop(name, None) is not None}
+        if dropped:
+            self._excel.clear()
+        return dropped
+
+    def get(self, name: str):
+        if name not in self._cache:
+            self._cache[name] = getattr(self, f"_build_{name}")()
+            self.compute_counts[name] = self.compute_counts.get(name, 0) + 1
+        return self._cache[name]
+
+    def __getattr__(self, name):
+        if not name.startswith("_") and name in type(self).DEPS:
+            return self.get(name)
+        raise AttributeError(name)
+
+    def _build_camp_agg(self):
+        camp_agg = build_campaign_agg(self.camp, self.modo, backend=self.backend)
+        return compact_frame(camp_agg) if self.compact else camp_agg
+
+    def _build_daily(self):
+        return build_daily_from_diario(self.camp, backend=self.backend) if self.modo == "diario" else None
+
+    def _build_camp_strat(self):
+        camp_strat = add_strategy_fields(self.camp_agg, **{k: self.params[k] for k in self.STRATEGY_PARAMS})
+        return compact_frame(camp_strat) if self.compact else camp_strat
+
+    def memory_report(self) -> pd.DataFrame:
+        frames = {"org": self.org, "pat": self.pat, "camp": self.camp}
+        frames.update({name: self._cache[name] for name in ("camp_agg", "daily", "camp_strat", "pause", "enter", "scale", "acos", "panel", "plan7", "facts", "trends", "budget_plan") if name in self._cache})
+        return memory_report(frames)
+
+    def _build_pause(self):
+        p = self.params
+        return build_pause_table(self.camp_strat, pause_invest_min=p["pause_invest_min"], pause_cvr_max=p["pause_cvr_max"])
+
+    def _build_enter(self):
+        p = self.params
+        return build_enter_table(self.org, self.pat, enter_visitas_min=p["enter_visitas_min"], enter_conv_min=p["enter_conv_min"])
+
+    def _build_scale(self):
+        return build_scale_table(self.camp_strat)
+
+    def _build_acos(self):
+        return build_acos_table(self.camp_strat)
+
+    def _build_kpis(self):
+        return build_kpis(self.camp_agg, self.pat)
+
+    def _build_trends(self):
+        if self.camp_diario is None:
+            return None
+        return build_campaign_trends(self.camp_diario)
+
+    def _build_anomalies(self):
+        if self.camp_diario is None:
+            return None
+        p = self.params
+        return flag_anomalies(self.camp_diario, window=p["anomaly_window"], z=p["anomaly_z"])
+
+    def _build_diagnosis(self):
+        return build_executive_diagnosis(self.camp_strat, daily=self.daily, trends=self.trends,
+                                         trend_window=self.params["trend_window"])
+
+    def _build_highlights(self):
+        return build_opportunity_highlights(self.camp_strat)
+
+    def _build_plan7(self):
+        return build_7_day_plan(self.camp_strat)
+
+    def _build_panel(self):
+        return build_control_panel(self.camp_strat)
+
+    def _build_budget_plan(self):
+        p = self.params
+        # Export diario: dias da serie; consolidado: periodo informado em plan_days
+        dias = len(self.daily) if self.daily is not None and len(self.daily) else p["plan_days"]
+        return build_budget_plan(self.camp_strat, orcamento_total=p["plan_budget"], dias=dias,
+                                 piso_pct=p["plan_floor_pct"], teto_pct=p["plan_cap_pct"], acos_max=p["plan_acos_max"])
+
+    def _build_facts(self):
+        return build_listing_facts(self.org, self.pat)
+
+    def _build_cannibal(self):
+        p = self.params
+        return build_cannibalization_table(self.facts, conv_org_min=p["enter_conv_min"], visitas_min=p["enter_visitas_min"])
+
+    def sweep(self, grid: dict) -> pd.DataFrame:
+        """sweep_strategy sobre camp_agg, recalculado so quando a grade ou camp_agg mudam."""
+        key = tuple((k, tuple(grid[k])) for k in sorted(grid))
+        cached = self._cache.get("sweep")
+        if cached is None or cached[0] != key:
+            cached = self._cache["sweep"] = (key, sweep_strategy(self.camp_agg, grid))
+            self.compute_counts["sweep"] = self.compute_counts.get("sweep", 0) + 1
+        return cached[1]
+
+    def tables(self) -> tuple:
+        return self.kpis, self.pause, self.enter, self.scale, self.acos, self.camp_strat
+
+    def sheets(self) -> dict:
+        return report_sheets(
+            self.kpis, self.camp_agg, self.pause, self.enter, self.scale, self.acos, self.camp_strat,
+            daily=self.daily, diagnosis=self.diagnosis, highlights=self.highlights,
+            plan7=self.plan7, panel=self.panel, cannibal=self.cannibal,
+            trends=self.trends, anomalies=self.anomalies, budget_plan=self.budget_plan,
+        )
+
+    def excel(self, formato: str = "xlsx") -> bytes:
+        if formato not in self._excel:
+            out = BytesIO()
+            write_report(self.sheets(), out, formato=formato)
+            self._excel[formato] = out.getvalue()
+        return self._excel[formato]
@@ -0,0 +1,402 @@
+import argparse
+import json
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+import ml_report as ml
+
+logger = logging.getLogger("ml_server")
+
+EXPORT_KINDS = ("organico", "campanhas", "patrocinados")
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "xlsx-stream": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/zip",
+    "csv": "application/zip",
+    "json": "application/json",
+}
+
+
+class RequestError(Exception):
+    """Erro do cliente (400): arquivo faltando, regra invalida etc."""
+
+
+class Overloaded(Exception):
+    """Fila cheia (503)."""
+
+
+def _jsonable(obj):
+    if isinstance(obj, dict):
+        return {str(k): _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, pd.DataFrame):
+        return _jsonable(obj.to_dict(orient="records"))
+    if isinstance(obj, (np.integer, np.bool_)):
+        return obj.item()
+    if isinstance(obj, (float, np.floating)):
+        return None if math.isnan(obj) or math.isinf(obj) else float(obj)
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    return obj
+
+
+# Campos do pedido que nao sao regras do ReportContext
+REQUEST_FIELDS = ("formato", "modo")
+
+
+def parse_rules(values: dict) -> dict:
+    """Regras do ReportContext a partir de strings (query/form); None nos padroes vira float.
+
+    Campo desconhecido (ex.: regra com erro de digitacao) e RequestError, nao o padrao calado.
+    """
+    unknown = set(values) - set(ml.ReportContext.PARAMS) - set(REQUEST_FIELDS)
+    if unknown:
+        raise RequestError(f"Regra(s) desconhecida(s): {', '.join(sorted(unknown))}")
+    rules = {}
+    for k, v in values.items():
+        if k in REQUEST_FIELDS:
+            continue
+        default = ml.ReportContext.PARAMS[k]
+        try:
+            rules[k] = None if v in ("", "none") else (int(v) if isinstance(default, int) else float(v))
+        except ValueError:
+            raise RequestError(f"Regra {k}: valor invalido {v!r}") from None
+    return rules
+
+
+def encode_multipart(files: list, fields: dict = None) -> tuple:
+    """(corpo, content-type) de um multipart/form-data com [(nome, bytes)] e campos simples."""
+    boundary = f"ml-{os.urandom(12).hex()}"
+    out = BytesIO()
+    for name, value in (fields or {}).items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for i, (filename, data) in enumerate(files):
+        out.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="arquivo{i}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode()
+        )
+        out.write(data)
+        out.write(b"\r\n")
+    out.write(f"--{boundary}--\r\n".encode())
+    return out.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def parse_multipart(body: bytes, content_type: str) -> tuple:
+    """([(filename, bytes)], {campo: texto}) de um corpo multipart/form-data."""
+    msg = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    if not msg.is_multipart():
+        raise RequestError("Envie os exports como multipart/form-data")
+    files, fields = [], {}
+    for part in msg.iter_parts():
+        data = part.get_payload(decode=True) or b""
+        if part.get_filename():
+            files.append((part.get_filename(), data))
+        elif part.get_param("name", header="content-disposition"):
+            fields[part.get_param("name", header="content-disposition")] = data.decode("utf-8", "replace")
+    return files, fields
+
+
+def run_report(files: list, rules: dict, formato: str = "xlsx", modo: str = "auto") -> tuple:
+    """Executado no worker: (bytes da resposta, tempos por fase em segundos)."""
+    t0 = time.perf_counter()
+    groups = {}
+    for filename, data in files:
+        try:
+            info = ml.sniff_workbook(BytesIO(data))
+        except ValueError as exc:
+            raise RequestError(f"{filename}: {exc}") from None
+        if info["tipo"] == "campanhas" and modo != "auto":
+            info["modo"] = modo
+        groups.setdefault(info["tipo"], []).append((filename, data, info))
+    missing = [k for k in EXPORT_KINDS if k not in groups]
+    if missing:
+        raise RequestError(f"Arquivo(s) faltando: {', '.join(missing)}")
+    frames = {}
+    for kind, items in groups.items():
+        names, datas, infos = zip(*items)
+        try:
+            ml.check_same_export(list(infos), list(names))
+            info, frames[kind] = ml.load_exports(list(datas), infos=list(infos), workers=1)
+        except ValueError as exc:
+            raise RequestError(str(exc)) from None
+        if kind == "campanhas":
+            modo = info["modo"]
+    t1 = time.perf_counter()
+
+    ctx = ml.ReportContext(frames["organico"], frames["campanhas"], frames["patrocinados"], modo=modo, **rules)
+    if formato == "json":
+        falhas = {kind: ml.parse_failures(df) for kind, df in frames.items()}
+        payload = {"modo": modo, "kpis": ctx.kpis, "diagnostico": ctx.diagnosis,
+                   "falhas_parse": {kind: f for kind, f in falhas.items() if f}}
+        t2 = time.perf_counter()
+        body = json.dumps(_jsonable(payload), ensure_ascii=False).encode("utf-8")
+    else:
+        sheets = ctx.sheets()
+        t2 = time.perf_counter()
+        out = BytesIO()
+        ml.write_report(sheets, out, formato=formato)
+        body = out.getvalue()
+    t3 = time.perf_counter()
+    return body, {"leitura": t1 - t0, "calculo": t2 - t1, "escrita": t3 - t2}
+
+
+def _warm_worker() -> None:
+    # Importa tudo e roda um relatorio minusculo: o primeiro pedido real nao paga o aquecimento
+    import ml_synth
+
+    files = []
+    for name, write in (("o.xlsx", lambda f: ml_synth.write_organico_xlsx(f, 20)),
+                        ("p.xlsx", lambda f: ml_synth.write_patrocinados_xlsx(f, 20)),
+                        ("c.xlsx", lambda f: ml_synth.write_campanhas_xlsx(f, 5, days=3))):
+        buf = BytesIO()
+        write(buf)
+        files.append((name, buf.getvalue()))
+    run_report(files, {}, "xlsx")
+
+
+def _ping(barrier=None) -> int:
+    # Com barreira o worker so responde quando todos os outros tambem tem um ping: um por processo
+    if barrier is not None:
+        barrier.wait()
+    return os.getpid()
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    arr = np.fromiter(values, dtype=float)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"p50": p50, "p95": p95, "p99": p99, "max": float(arr.max())}
+
+
+class ReportService:
+    """Pool de processos ja aquecidos + fila limitada.
+
+    Cabem `workers` relatorios executando e `fila` esperando; alem disso o
+    pedido e recusado na hora (503 + Retry-After) em vez de acumular memoria.
+    Guarda os tempos dos ultimos pedidos para /metrics.
+    """
+
+    def __init__(self, workers: int = None, fila: int = 8, timeout: float = 300.0, warm: bool = True,
+                 history: int = 1000, boot_timeout: float = 300.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.fila = fila
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + fila)
+        self._lock = threading.Lock()
+        self._ativos = 0
+        self._tempos = deque(maxlen=history)
+        self.stats = {"ok": 0, "erro_cliente": 0, "erro": 0, "recusados": 0, "timeout": 0}
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker if warm else None,
+                                         mp_context=ml.process_context())
+        self.started = time.time()
+        # Sobe todos os workers agora (o initializer roda em cada um) em vez de no primeiro pedido.
+        # O pool cria processos sob demanda: cada ping fica preso na barreira ate todos os workers terem o seu
+        try:
+            with ml.process_context().Manager() as manager:
+                barrier = manager.Barrier(self.workers, timeout=boot_timeout)
+                self.pids = {f.result() for f in [self._pool.submit(_ping, barrier) for _ in range(self.workers)]}
+        except BaseException:
+            self.shutdown()
+            raise
+        if len(self.pids) != self.workers:
+            self.shutdown()
+            raise RuntimeError(f"{len(self.pids)} de {self.workers} workers subiram")
+        logger.info(json.dumps({"evento": "pronto", "workers": len(self.pids)}))
+
+    def submit(self, files: list, rules: dict, formato: str, modo: str) -> tuple:
+        """(bytes, tempos). Levanta Overloaded se a fila estiver cheia."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["recusados"] += 1
+            raise Overloaded()
+        t0 = time.perf_counter()
+        with self._lock:
+            self._ativos += 1
+        try:
+            fut = self._pool.submit(run_report, files, rules, formato, modo)
+        except BaseException:
+            self._release()
+            raise
+        # A vaga so volta quando o worker termina: um pedido que estourou o tempo ainda ocupa o processo
+        fut.add_done_callback(lambda _: self._release())
+        try:
+            try:
+                body, fases = fut.result(timeout=self.timeout)
+            except FutureTimeout:
+                fut.cancel()
+                with self._lock:
+                    self.stats["timeout"] += 1
+                raise
+            total = time.perf_counter() - t0
+            tempos = {"fila": max(0.0, total - sum(fases.values())), **fases, "total": total}
+            with self._lock:
+                self.stats["ok"] += 1
+                self._tempos.append(tempos)
+            return body, tempos
+        except RequestError:
+            with self._lock:
+                self.stats["erro_cliente"] += 1
+            raise
+        except FutureTimeout:
+            raise
+        except Exception:
+            with self._lock:
+                self.stats["erro"] += 1
+            raise
+
+    def _release(self) -> None:
+        with self._lock:
+            self._ativos -= 1
+        self._slots.release()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            tempos = list(self._tempos)
+            stats = dict(self.stats)
+            ativos = self._ativos
+        fases = ["fila", "leitura", "calculo", "escrita", "total"]
+        return {
+            "workers": self.workers,
+            "capacidade_fila": self.fila,
+            "pedidos_ativos": ativos,
+            "uptime_s": time.time() - self.started,
+            **stats,
+            "latencia_s": {f: _percentiles([t[f] for t in tempos]) for f in fases},
+            "amostras": len(tempos),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        # Esperar os workers evita processos orfaos (e o stdout herdado por eles) depois do fim do servidor
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: ReportService = None
+    max_bytes: int = 200 * 1024 ** 2
+    server_version = "ml-report"
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, obj, headers: dict = None) -> None:
+        self._send(status, json.dumps(_jsonable(obj), ensure_ascii=False).encode("utf-8"), CONTENT_TYPES["json"], headers)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._json(200, {"ok": True})
+        elif path == "/metrics":
+            self._json(200, self.service.metrics())
+        else:
+            self._json(404, {"erro": "rota desconhecida"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/report":
+            self._json(404, {"erro": "rota desconhecida"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.max_bytes:
+            self._json(413, {"erro": f"corpo maior que {self.max_bytes // 1024 ** 2} MB"})
+            return
+        body = self.rfile.read(length)
+        t0 = time.perf_counter()
+        try:
+            files, fields = parse_multipart(body, self.headers.get("Content-Type", ""))
+            values = {**fields, **dict(parse_qsl(url.query))}
+            formato = values.get("formato", "xlsx")
+            if formato not in CONTENT_TYPES:
+                raise RequestError(f"formato deve ser um de: {', '.join(CONTENT_TYPES)}")
+            modo = values.get("modo", "auto")
+            if modo not in ("auto", "consolidado", "diario"):
+                raise RequestError("modo deve ser auto, consolidado ou diario")
+            out, tempos = self.service.submit(files, parse_rules(values), formato, modo)
+        except RequestError as exc:
+            self._json(400, {"erro": str(exc)})
+            return
+        except Overloaded:
+            self._json(503, {"erro": "fila cheia, tente de novo"}, {"Retry-After": "1"})
+            return
+        except FutureTimeout:
+            self._json(504, {"erro": "tempo limite excedido"})
+            return
+        except Exception as exc:
+            logger.exception("falha no relatorio")
+            self._json(500, {"erro": f"{type(exc).__name__}: {exc}"})
+            return
+        tempos["multipart"] = time.perf_counter() - t0 - tempos["total"]
+        logger.info(json.dumps({"evento": "relatorio", "formato": formato, "bytes": len(out), **tempos}))
+        timing = ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in tempos.items())
+        headers = {"Server-Timing": timing}
+        if formato != "json":
+            ext = "xlsx" if formato.startswith("xlsx") else "zip"
+            headers["Content-Disposition"] = f'attachment; filename="Relatorio_ML_ADs_Estrategico.{ext}"'
+        self._send(200, out, CONTENT_TYPES[formato], headers)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, service: ReportService = None,
+                max_mb: int = 200) -> ThreadingHTTPServer:
+    handler = type("Handler", (_Handler,), {"service": service or ReportService(), "max_bytes": max_mb * 1024 ** 2})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Servico HTTP local: POST /report (multipart com os 3 exports) devolve o relatorio; "
+                    "GET /metrics traz contagens e latencias."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="processos de relatorio (padrao: nucleos)")
+    parser.add_argument("--fila", type=int, default=8, help="pedidos aguardando alem dos em execucao; acima disso 503")
+    parser.add_argument("--timeout", type=float, default=300.0, help="segundos por relatorio (504 ao passar)")
+    parser.add_argument("--max-mb", type=int, default=200, help="tamanho maximo do upload")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    service = ReportService(workers=args.workers, fila=args.fila, timeout=args.timeout)
+    server = make_server(args.host, args.port, service, args.max_mb)
+    logger.info(json.dumps({"evento": "ouvindo", "url": f"http://{args.host}:{args.port}"}))
+    # SIGTERM (ex.: ml_loadtest) encerra como o Ctrl+C. server.shutdown() espera o serve_forever, que roda
+    # nesta thread, entao e chamado de outra
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import ml_report as ml
+
+try:
+    import pyarrow as pa
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+SNAPSHOT_FRAMES = ("camp", "camp_agg", "camp_strat", "org", "pat", "daily")
+AUSENTE = "(ausente)"
+
+
+def _arrow_column(s: pd.Series) -> pd.Series:
+    # Colunas object com tipos misturados (ex.: SKU numerico e texto) nao viram Arrow; ficam como texto
+    if not pd.api.types.is_object_dtype(s):
+        return s
+    try:
+        pa.array(s, from_pandas=True)
+        return s
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return s.map(lambda v: v if v is None or v != v else str(v))
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    df = pd.DataFrame({col: _arrow_column(df[col]) for col in df.columns}, index=df.index)
+    table = pa.Table.from_pandas(df)
+    # NaN gravado como valor (sem bitmap de nulos): a coluna volta do mmap sem copia
+    for col in df.columns:
+        if df[col].dtype.kind == "f":
+            i = table.schema.get_field_index(col)
+            table = table.set_column(i, table.schema.field(i).name, pa.array(df[col].to_numpy()))
+    return table
+
+
+def write_frame(df: pd.DataFrame, path) -> None:
+    """Grava em Arrow IPC (Feather v2) sem compressao, para reabrir com memory map."""
+    table = _to_table(df)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_frame(path) -> pd.DataFrame:
+    """Le via memory map. Colunas numericas sem nulos apontam direto para o arquivo (somente leitura)."""
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+class Snapshot:
+    """Frames e KPIs de uma execucao salva; reabre o relatorio sem ler os xlsx de novo."""
+
+    def __init__(self, path: Path, meta: dict, frames: dict):
+        self.path = path
+        self.meta = meta
+        self.frames = frames
+
+    @property
+    def id(self) -> str:
+        return self.meta["id"]
+
+    @property
+    def kpis(self) -> dict:
+        return self.meta["kpis"]
+
+    def context(self, backend: str = None, **params) -> "ml.ReportContext":
+        """ReportContext ja com camp_agg/daily/camp_strat/kpis do snapshot; regras diferentes recalculam o que dependem."""
+        f = self.frames
+        ctx = ml.ReportContext(
+            f["org"], f["camp"], f["pat"], modo=self.meta["modo"], compact=self.meta.get("compact", False),
+            camp_agg=f["camp_agg"], daily=f.get("daily"), backend=backend, **self.meta["params"],
+        )
+        ctx.preload(camp_strat=f["camp_strat"], kpis=self.kpis)
+        if params:
+            ctx.update(**params)
+        return ctx
+
+    def excel(self, formato: str = "xlsx") -> bytes:
+        return self.context().excel(formato)
+
+
+class SnapshotStore:
+    """Snapshots em disco: uma pasta por execucao com um .arrow por frame e meta.json (KPIs, regras, modo)."""
+
+    def __init__(self, root="ml_snapshots"):
+        if not HAS_ARROW:
+            raise RuntimeError("Snapshots requerem pyarrow (pip install pyarrow)")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def save(self, ctx: "ml.ReportContext", rotulo: str = "", entradas=None) -> str:
+        snap_id = f"{datetime.now().strftime('%Y-%m-%d_%H%M%S')}_{os.urandom(3).hex()}"
+        # daily so existe no modo diario
+        frames = {name: getattr(ctx, name) for name in SNAPSHOT_FRAMES}
+        frames = {name: df for name, df in frames.items() if df is not None}
+        meta = {
+            "id": snap_id,
+            "criado_em": datetime.now().isoformat(timespec="seconds"),
+            "rotulo": rotulo,
+            "modo": ctx.modo,
+            "compact": ctx.compact,
+            "params": ctx.params,
+            "entradas": list(entradas or []),
+            "linhas": {name: int(len(df)) for name, df in frames.items()},
+            "kpis": ctx.kpis,
+        }
+        # Grava numa pasta temporaria e renomeia: um snapshot pela metade nunca aparece na lista
+        tmp = self.root / f".{snap_id}.tmp"
+        tmp.mkdir()
+        try:
+            for name, df in frames.items():
+                write_frame(df, tmp / f"{name}.arrow")
+            (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=1, default=float), encoding="utf-8")
+            tmp.rename(self.root / snap_id)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return snap_id
+
+    def _meta(self, path: Path) -> dict:
+        return json.loads((path / "meta.json").read_text(encoding="utf-8"))
+
+    def list(self) -> pd.DataFrame:
+        rows = []
+        for path in self.root.iterdir():
+            if path.name.startswith(".") or not (path / "meta.json").exists():
+                continue
+            meta = self._meta(path)
+            rows.append({
+                "id": meta["id"], "criado_em": meta["criado_em"], "rotulo": meta["rotulo"], "modo": meta["modo"],
+                "campanhas": meta["linhas"].get("camp_agg"),
+                "investimento": meta["kpis"].get("Investimento Ads (R$)"),
+                "receita": meta["kpis"].get("Receita Ads (R$)"),
+            })
+        cols = ["id", "criado_em", "rotulo", "modo", "campanhas", "investimento", "receita"]
+        return pd.DataFrame(rows, columns=cols).sort_values("criado_em", ascending=False, ignore_index=True)
+
+    def load(self, snap_id: str) -> Snapshot:
+        path = self.root / snap_id
+        if not (path / "meta.json").exists():
+            raise KeyError(f"Snapshot nao encontrado: {snap_id}")
+        meta = self._meta(path)
+        frames = {name: read_frame(path / f"{name}.arrow") for name in meta["linhas"]}
+        return Snapshot(path, meta, frames)
+
+    def delete(self, snap_id: str) -> None:
+        shutil.rmtree(self.root / snap_id, ignore_errors=True)
+
+
+def diff_kpis(a: Snapshot, b: Snapshot) -> pd.DataFrame:
+    rows = []
+    for kpi in dict.fromkeys(list(a.kpis) + list(b.kpis)):
+        va, vb = a.kpis.get(kpi), b.kpis.get(kpi)
+        delta = vb - va if va is not None and vb is not None else None
+        pct = delta / abs(va) if delta is not None and va else None
+        rows.append({"KPI": kpi, "A": va, "B": vb, "Variacao": delta, "Variacao_Pct": pct})
+    return pd.DataFrame(rows)
+
+
+def diff_quadrants(a: Snapshot, b: Snapshot) -> tuple:
+    """(campanhas que mudaram de quadrante, matriz de transicao A x B com contagens)."""
+    cols = ["Nome", "Quadrante", "ROAS_Real", "Investimento"]
+    sa = a.frames["camp_strat"][cols].astype({"Nome": str})
+    sb = b.frames["camp_strat"][cols].astype({"Nome": str})
+    m = sa.merge(sb, on="Nome", how="outer", suffixes=("_A", "_B"))
+    for side in ("A", "B"):
+        m[f"Quadrante_{side}"] = m[f"Quadrante_{side}"].astype(object).fillna(AUSENTE)
+    changed = m[m["Quadrante_A"] != m["Quadrante_B"]].copy()
+    changed["Variacao_ROAS"] = changed["ROAS_Real_B"] - changed["ROAS_Real_A"]
+    changed = changed[["Nome", "Quadrante_A", "Quadrante_B", "ROAS_Real_A", "ROAS_Real_B", "Variacao_ROAS",
+                       "Investimento_A", "Investimento_B"]]
+    order = ml.QUADRANTES + [AUSENTE]
+    matrix = pd.crosstab(
+        pd.Categorical(m["Quadrante_A"], categories=order), pd.Categorical(m["Quadrante_B"], categories=order),
+        rownames=["A"], colnames=["B"], dropna=False,
+    )
+    keep = [q for q in order if matrix.loc[q].sum() or matrix[q].sum()]
+    changed = changed.sort_values("Investimento_B", ascending=False, na_position="last", ignore_index=True)
+    return changed, matrix.loc[keep, keep]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Lista, compara e exporta snapshots salvos do relatorio")
+    parser.add_argument("--dir", default=os.environ.get("ML_SNAPSHOT_DIR", "ml_snapshots"))
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    p_excel = sub.add_parser("excel", help="gera o relatorio a partir do snapshot, sem reler os xlsx")
+    p_excel.add_argument("id")
+    p_excel.add_argument("--saida", required=True)
+    p_excel.add_argument("--formato", choices=ml.REPORT_FORMATS, default="xlsx")
+    p_diff = sub.add_parser("diff")
+    p_diff.add_argument("a")
+    p_diff.add_argument("b")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.dir)
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        if args.cmd == "list":
+            print(store.list().to_string(index=False))
+        elif args.cmd == "excel":
+            Path(args.saida).write_bytes(store.load(args.id).excel(args.formato))
+            print(args.saida)
+        else:
+            a, b = store.load(args.a), store.load(args.b)
+            changed, matrix = diff_quadrants(a, b)
+            print(diff_kpis(a, b).to_string(index=False))
+            print()
+            print(matrix.to_string())
+            print(f"\n{len(changed)} campanha(s) mudaram de quadrante")
+            print(changed.head(50).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+import ml_report as ml
+
+ORGANICO_HEADER = [
+    "ID do anúncio", "Título", "Status", "Variação", "SKU",
+    "Visitas", "Quantidade de vendas", "Compradores únicos",
+    "Unidades vendidas", "Vendas brutas (BRL)", "Participação nas vendas",
+    "Conversão de visitas em vendas", "Conversão de visitas em compradores",
+]
+PATROCINADOS_EXTRA = ["Título do anúncio", "Status", "CPC\n(Custo por clique)", "ACOS\n(Investimento / Receitas)"]
+CAMPANHAS_EXTRA = ["Estratégia", "CPC\n(Custo por clique)", "ACOS\n(Investimento / Receitas)", "Até"]
+
+
+def _write(ws, rows) -> None:
+    for row in rows:
+        ws.append(row)
+
+
+def write_organico_xlsx(path, n_listings: int, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Relatório")
+    # Preambulo de 4 linhas + cabecalho agrupado (header=4) + cabecalho real, que o loader descarta
+    ws.append(["Relatório de desempenho das publicações"])
+    ws.append(["Período: últimos 30 dias"])
+    ws.append([])
+    ws.append(["Gerado automaticamente pelo Mercado Livre"])
+    ws.append(["Anúncio", None, None, None, None, "Desempenho"] + [None] * 7)
+    ws.append(ORGANICO_HEADER)
+
+    visitas = rng.negative_binomial(2, 0.01, n_listings)
+    conv = np.clip(rng.beta(1.2, 25.0, n_listings), 0, 1)
+    vendas = np.round(visitas * conv).astype(int)
+    compradores = np.maximum(vendas - rng.integers(0, 2, n_listings), 0)
+    unidades = vendas + rng.integers(0, 3, n_listings) * (vendas > 0)
+    preco = rng.lognormal(4.2, 0.8, n_listings)
+    brutas = np.round(unidades * preco, 2)
+    total = brutas.sum() or 1.0
+    status = rng.choice(["Ativa", "Pausada", "Inativa"], n_listings, p=[0.8, 0.15, 0.05])
+    _write(ws, (
+        [f"MLB{3_000_000_000 + i}", f"Produto sintetico {i}", status[i], "", f"SKU-{i:07d}",
+         int(visitas[i]), int(vendas[i]), int(compradores[i]), int(unidades[i]), float(brutas[i]),
+         float(brutas[i] / total), float(conv[i]), float(compradores[i] / visitas[i]) if visitas[i] else 0.0]
+        for i in range(n_listings)
+    ))
+    wb.save(path)
+
+
+def write_patrocinados_xlsx(path, n_listings: int, ads_share: float = 0.3, seed: int = 43) -> None:
+    rng = np.random.default_rng(seed)
+    n_ads = max(1, int(n_listings * ads_share))
+    ids = rng.choice(n_listings, n_ads, replace=False)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(ml.SHEET_PATROCINADOS)
+    ws.append(["Relatório Anúncios patrocinados"])
+    ws.append(["Código do anúncio"] + PATROCINADOS_EXTRA[:2] + ml.PATROCINADOS_NUM_COLS + PATROCINADOS_EXTRA[2:])
+
+    impressoes = rng.negative_binomial(2, 0.0005, n_ads)
+    cliques = rng.binomial(impressoes, 0.01)
+    vendas = rng.binomial(cliques, 0.04)
+    receita = np.round(vendas * rng.lognormal(4.2, 0.8, n_ads), 2)
+    invest = np.round(cliques * rng.uniform(0.3, 2.5, n_ads), 2)
+    _write(ws, (
+        [f"MLB{3_000_000_000 + int(ids[i])}", f"Produto sintetico {ids[i]}", "Ativo",
+         int(impressoes[i]), int(cliques[i]), float(receita[i]), float(invest[i]), int(vendas[i]),
+         float(invest[i] / cliques[i]) if cliques[i] else 0.0,
+         float(invest[i] / receita[i]) if receita[i] else 0.0]
+        for i in range(n_ads)
+    ))
+    wb.save(path)
+
+
+def write_campanhas_xlsx(path, n_campaigns: int, days: int = 30, daily: bool = True, seed: int = 44) -> None:
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(ml.SHEET_CAMPANHAS)
+    ws.append(["Relatório de campanha"])
+    header = ["Nome", "Status"] + ml.CAMPANHAS_NUM_COLS + CAMPANHAS_EXTRA
+    ws.append((["Desde"] if daily else []) + header)
+
+    # Perfil fixo por campanha; o ruido diario fica em torno dele
+    orcamento = rng.choice([20.0, 50.0, 100.0, 200.0, 500.0], n_campaigns)
+    acos_obj = rng.choice([10.0, 15.0, 20.0, 25.0, 30.0], n_campaigns)
+    roas_base = rng.lognormal(1.4, 0.7, n_campaigns)
+    lost_b_base = rng.uniform(0, 80, n_campaigns)
+    lost_r_base = rng.uniform(0, 80, n_campaigns)
+    status = rng.choice(["Ativa", "Pausada"], n_campaigns, p=[0.85, 0.15])
+    start = pd.Timestamp("2024-01-01")
+    periods = [(start + pd.Timedelta(days=d)).to_pydatetime() for d in range(days)] if daily else [None]
+    scale = 1 if daily else days
+
+    def rows():
+        for day in periods:
+            invest = np.round(orcamento * rng.uniform(0.3, 1.0, n_campaigns) * scale, 2)
+            roas = roas_base * rng.lognormal(0, 0.25, n_campaigns)
+            receita = np.round(invest * roas, 2)
+            cliques = np.maximum(1, (invest / rng.uniform(0.4, 2.0, n_campaigns))).astype(int)
+            impressoes = cliques * rng.integers(40, 200, n_campaigns)
+            vendas = rng.binomial(cliques, 0.03)
+            lost_b = np.clip(lost_b_base + rng.normal(0, 5, n_campaigns), 0, 100)
+            lost_r = np.clip(lost_r_base + rng.normal(0, 5, n_campaigns), 0, 100)
+            for i in range(n_campaigns):
+                row = [f"Campanha {i:05d}", status[i], int(impressoes[i]), int(cliques[i]), float(receita[i]),
+                       float(invest[i]), int(vendas[i]), float(receita[i] / invest[i]) if invest[i] else 0.0,
+                       float(vendas[i] / cliques[i]), float(lost_b[i]), float(lost_r[i]),
+                       float(orcamento[i]), float(acos_obj[i]),
+                       "Rentabilidade", float(invest[i] / cliques[i]),
+                       float(invest[i] / receita[i]) if receita[i] else 0.0, None]
+                yield ([day] if daily else []) + row
+
+    _write(ws, rows())
+    wb.save(path)
+
+
+def generate_exports(out_dir, n_listings: int, n_campaigns: int, days: int = 30, seed: int = 42) -> dict:
+    """Grava organico, patrocinados e campanhas (diario e consolidado) em out_dir."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "organico": out_dir / "organico.xlsx",
+        "patrocinados": out_dir / "patrocinados.xlsx",
+        "campanhas_diario": out_dir / "campanhas_diario.xlsx",
+        "campanhas_consolidado": out_dir / "campanhas_consolidado.xlsx",
+    }
+    write_organico_xlsx(paths["organico"], n_listings, seed=seed)
+    write_patrocinados_xlsx(paths["patrocinados"], n_listings, seed=seed + 1)
+    write_campanhas_xlsx(paths["campanhas_diario"], n_campaigns, days=days, daily=True, seed=seed + 2)
+    write_campanhas_xlsx(paths["campanhas_consolidado"], n_campaigns, days=days, daily=False, seed=seed + 2)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera exportacoes sinteticas do Mercado Livre")
+    parser.add_argument("saida")
+    parser.add_argument("--anuncios", type=int, default=10_000)
+    parser.add_argument("--campanhas", type=int, default=200)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for kind, path in generate_exports(args.saida, args.anuncios, args.campanhas, args.dias, args.seed).items():
+        print(f"{kind}: {path}")
+
+
+if __name__ == "__main__":
+    main()
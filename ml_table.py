@@ -0,0 +1,106 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+import ml_report as ml
+
+
+class TableView:
+    """Paginacao, filtro e ordenacao de um frame sem copia-lo a cada consulta.
+
+    Os indices de ordenacao de cada coluna sao calculados na primeira vez que
+    sao pedidos e reaproveitados; uma consulta devolve so as linhas da pagina.
+    O frame e apenas lido (pode ser compartilhado com o ReportContext).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._orders = {}
+        self._masks = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def order(self, col: str, ascending: bool = True) -> np.ndarray:
+        """Posicoes das linhas ordenadas por col (estavel, NaN no fim)."""
+        key = (col, ascending)
+        if key not in self._orders:
+            s = self.df[col].reset_index(drop=True)
+            self._orders[key] = s.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        return self._orders[key]
+
+    def mask(self, filters: dict = None):
+        """Mascara booleana dos filtros {coluna: criterio}, ou None sem filtro.
+
+        Criterio: str -> contem (sem diferenciar maiusculas), list/set -> isin,
+        tupla (min, max) -> intervalo fechado (None = aberto), outro -> igualdade.
+        """
+        if not filters:
+            return None
+        out = np.ones(len(self.df), dtype=bool)
+        for col, crit in filters.items():
+            key = (col, repr(crit))
+            if key not in self._masks:
+                s = self.df[col]
+                if isinstance(crit, str):
+                    m = s.astype(str).str.contains(crit, case=False, regex=False, na=False)
+                elif isinstance(crit, (list, set, frozenset)):
+                    m = s.isin(list(crit))
+                elif isinstance(crit, tuple):
+                    lo, hi = crit
+                    v = pd.to_numeric(s, errors="coerce")
+                    m = pd.Series(True, index=s.index)
+                    if lo is not None:
+                        m &= v >= lo
+                    if hi is not None:
+                        m &= v <= hi
+                else:
+                    m = s == crit
+                self._masks[key] = m.to_numpy(dtype=bool, na_value=False)
+            out &= self._masks[key]
+        return out
+
+    def positions(self, filters: dict = None, sort: str = None, ascending: bool = True) -> np.ndarray:
+        m = self.mask(filters)
+        if sort is not None:
+            pos = self.order(sort, ascending)
+            return pos if m is None else pos[m[pos]]
+        return np.arange(len(self.df)) if m is None else np.flatnonzero(m)
+
+    def query(self, filters: dict = None, sort: str = None, ascending: bool = True,
+              page: int = 0, page_size: int = 50) -> tuple:
+        """(linhas da pagina, total de linhas apos o filtro). page comeca em 0."""
+        pos = self.positions(filters, sort, ascending)
+        start = max(0, page) * page_size
+        return self.df.iloc[pos[start:start + page_size]], len(pos)
+
+    def pages(self, total: int, page_size: int = 50) -> int:
+        return max(1, math.ceil(total / page_size))
+
+    def top_k(self, col: str, k: int = 10, largest: bool = True) -> pd.DataFrame:
+        """k maiores (ou menores) por col sem ordenar o frame inteiro, se a ordem ainda nao existe."""
+        key = (col, not largest)
+        if key in self._orders:
+            return self.df.iloc[self._orders[key][:k]]
+        s = pd.to_numeric(self.df[col], errors="coerce").reset_index(drop=True)
+        top = s.nlargest(k) if largest else s.nsmallest(k)
+        return self.df.iloc[top.index.to_numpy()]
+
+
+def parse_filter(df: pd.DataFrame, col: str, text: str):
+    """Criterio de TableView.mask a partir do texto digitado: "min:max" ou numero em colunas numericas, senao "contem"."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+        # Mesmo parser pt-BR dos loaders: "1.234,5" e 1234.5, "R$ 1.500" e 1500
+        parts = text.split(":", 1) if ":" in text else [text]
+        vals, failed = ml.parse_br_numeric(pd.Series(parts, dtype=object))
+        if failed.any():
+            return None
+        bounds = [None if np.isnan(v) else float(v) for v in vals.to_numpy(dtype="float64")]
+        if len(bounds) == 2:
+            return tuple(bounds)
+        return None if bounds[0] is None else (bounds[0], bounds[0])
+    return text
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import ml_report as ml  # noqa: E402
+import ml_synth  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def synth_paths(tmp_path_factory):
+    return ml_synth.generate_exports(tmp_path_factory.mktemp("exports"), n_listings=300, n_campaigns=40, days=21)
+
+
+@pytest.fixture(scope="session")
+def synth_frames(synth_paths):
+    """(org, camp, pat) do export diario sintetico, lidos pelos loaders."""
+    org = ml.load_organico(synth_paths["organico"])
+    pat = ml.load_patrocinados(synth_paths["patrocinados"])
+    camp = ml.load_campanhas_diario(synth_paths["campanhas_diario"])
+    return org, camp, pat
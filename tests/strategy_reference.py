@@ -0,0 +1,77 @@
+"""add_strategy_fields linha a linha, como estava antes da versao vetorizada.
+
+Referencia de paridade em tests/test_strategy.py e de tempo em bench.py.
+O corpo e o original; a unica mudanca esta comentada abaixo.
+"""
+import pandas as pd
+
+from ml_report import EMOJI_BLUE, EMOJI_GREEN, EMOJI_RED, EMOJI_YELLOW, _safe_div
+
+
+def add_strategy_fields_rowwise(
+    camp_agg: pd.DataFrame,
+    acos_over_pct: float = 0.30,
+    roas_mina: float = 7.0,
+    lost_budget_mina: float = 40.0,
+    lost_rank_gigante: float = 50.0,
+    roas_hemorragia: float = 3.0,
+) -> pd.DataFrame:
+    df = camp_agg.copy()
+
+    for c in ["Receita","Investimento","Vendas","Cliques","Impressões","ROAS","CVR","Perdidas_Orc","Perdidas_Class","ACOS Objetivo","Orçamento"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    df["ROAS_Real"] = df.apply(lambda r: _safe_div(r.get("Receita", 0), r.get("Investimento", 0)), axis=1)
+    df["ACOS_Real"] = df.apply(lambda r: _safe_div(r.get("Investimento", 0), r.get("Receita", 0)), axis=1)
+
+    if "ACOS Objetivo" in df.columns:
+        # Unica mudanca (pandas 3): era .copy(), e com ACOS Objetivo int64 o /100.0 no .loc abaixo da TypeError
+        df["ACOS_Objetivo_N"] = df["ACOS Objetivo"].astype("float64")
+        df.loc[df["ACOS_Objetivo_N"] > 1.5, "ACOS_Objetivo_N"] = df.loc[df["ACOS_Objetivo_N"] > 1.5, "ACOS_Objetivo_N"] / 100.0
+    else:
+        df["ACOS_Objetivo_N"] = pd.NA
+
+    total_receita = float(pd.to_numeric(df["Receita"], errors="coerce").fillna(0).sum())
+    receita_relevante = max(500.0, total_receita * 0.05)
+
+    df = df.sort_values("Receita", ascending=False).reset_index(drop=True)
+    df["Receita"] = df["Receita"].fillna(0)
+    df["CPI_Share"] = df["Receita"] / total_receita if total_receita else 0.0
+    df["CPI_Cum"] = df["CPI_Share"].cumsum()
+    df["CPI_80"] = df["CPI_Cum"] <= 0.80
+
+    def classify(row):
+        roas = float(row.get("ROAS_Real", 0) or 0)
+        lost_b = float(row.get("Perdidas_Orc", 0) or 0)
+        lost_r = float(row.get("Perdidas_Class", 0) or 0)
+        receita = float(row.get("Receita", 0) or 0)
+        acos_real = float(row.get("ACOS_Real", 0) or 0)
+        acos_obj = row.get("ACOS_Objetivo_N", None)
+
+        if (roas >= roas_mina) and (lost_b >= lost_budget_mina):
+            return "ESCALA_ORCAMENTO"
+        if (receita >= receita_relevante) and (lost_r >= lost_rank_gigante):
+            return "COMPETITIVIDADE"
+
+        hem = (roas > 0 and roas < roas_hemorragia)
+        if pd.notna(acos_obj) and acos_obj and float(acos_obj) > 0:
+            if acos_real > (float(acos_obj) * (1.0 + acos_over_pct)):
+                hem = True
+        if hem:
+            return "HEMORRAGIA"
+        return "ESTAVEL"
+
+    df["Quadrante"] = df.apply(classify, axis=1)
+
+    def action(q):
+        if q == "ESCALA_ORCAMENTO":
+            return f"{EMOJI_GREEN} Aumentar orcamento"
+        if q == "COMPETITIVIDADE":
+            return f"{EMOJI_YELLOW} Subir ACOS alvo"
+        if q == "HEMORRAGIA":
+            return f"{EMOJI_RED} Revisar/pausar"
+        return f"{EMOJI_BLUE} Manter"
+
+    df["Acao_Recomendada"] = df["Quadrante"].apply(action)
+    return df
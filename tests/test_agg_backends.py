@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ml_report as ml
+
+OUTROS = [b for b in ml.AGG_BACKENDS if b != "pandas"]
+
+
+@pytest.fixture(scope="module")
+def camp_com_vazios(synth_frames):
+    _, camp, _ = synth_frames
+    camp = camp.copy()
+    rng = np.random.default_rng(0)
+    for col in ("Receita\n(Moeda local)", "ACOS Objetivo", "% de impressões perdidas por orçamento"):
+        camp.loc[rng.random(len(camp)) < 0.1, col] = np.nan
+    return camp
+
+
+@pytest.mark.skipif(not OUTROS, reason="pyarrow/polars nao instalados")
+@pytest.mark.parametrize("backend", OUTROS)
+@pytest.mark.parametrize("vazios", [False, True])
+def test_backends_match_pandas(synth_frames, camp_com_vazios, backend, vazios):
+    camp = camp_com_vazios if vazios else synth_frames[1]
+    pd.testing.assert_frame_equal(ml.build_daily_from_diario(camp, backend=backend).reset_index(drop=True),
+                                  ml.build_daily_from_diario(camp, backend="pandas").reset_index(drop=True))
+    pd.testing.assert_frame_equal(ml.build_campaign_agg(camp, "diario", backend=backend),
+                                  ml.build_campaign_agg(camp, "diario", backend="pandas"))
+
+
+def test_unknown_backend_rejected(synth_frames):
+    with pytest.raises(ValueError):
+        ml.build_campaign_agg(synth_frames[1], "diario", backend="duckdb")
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import ml_report as ml
+
+
+@pytest.fixture(scope="module")
+def camp_strat(synth_frames):
+    org, camp, pat = synth_frames
+    return ml.ReportContext(org, camp, pat, modo="diario").camp_strat
+
+
+def _acos(plan) -> float:
+    return plan["Gasto_Projetado"].sum() / plan["Receita_Diaria_Projetada"].sum()
+
+
+@pytest.mark.parametrize("total", [None, 2_000.0, 50_000.0])
+@pytest.mark.parametrize("acos_max", [None, 0.05, 0.5])
+def test_plan_respects_floors_caps_and_total(camp_strat, total, acos_max):
+    plan = ml.build_budget_plan(camp_strat, orcamento_total=total, dias=21, acos_max=acos_max)
+    budget = plan["Orcamento_Atual"].sum() if total is None else total
+    assert (plan["Orcamento_Sugerido"] >= plan["Piso"] - 1e-6).all()
+    assert (plan["Orcamento_Sugerido"] <= plan["Teto"] + 1e-6).all()
+    assert plan["Orcamento_Sugerido"].sum() <= budget + 1e-6
+    assert (plan["Gasto_Projetado"] <= plan["Orcamento_Sugerido"] + 1e-9).all()
+
+
+def test_acos_cap_holds_whenever_feasible(camp_strat):
+    livre = _acos(ml.build_budget_plan(camp_strat, dias=21))
+    viaveis = 0
+    for acos_max in np.linspace(0.01, 1.0, 60):
+        plan = ml.build_budget_plan(camp_strat, dias=21, acos_max=acos_max)
+        if plan["Limite_ACOS_Viavel"].all():
+            assert _acos(plan) <= acos_max + 1e-9
+            viaveis += acos_max < livre
+        else:
+            # Sinalizado so quando o plano de fato ficou acima do limite
+            assert _acos(plan) > acos_max
+    assert viaveis, "nenhum limite ativo e viavel testado"
+
+
+def test_infeasible_acos_cap_is_flagged(camp_strat):
+    assert not ml.build_budget_plan(camp_strat, dias=21, acos_max=0.01)["Limite_ACOS_Viavel"].any()
+    assert ml.build_budget_plan(camp_strat, dias=21)["Limite_ACOS_Viavel"].all()
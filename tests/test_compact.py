@@ -0,0 +1,57 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import ml_report as ml
+
+
+@pytest.fixture(scope="module")
+def compact_frames(synth_paths):
+    org = ml.load_organico(synth_paths["organico"], compact=True)
+    pat = ml.load_patrocinados(synth_paths["patrocinados"], compact=True)
+    camp = ml.load_campanhas_diario(synth_paths["campanhas_diario"], compact=True)
+    return org, camp, pat
+
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    # category volta ao tipo das categorias; int32 x int64 e ignorado no assert
+    return df.apply(lambda s: s.astype(s.cat.categories.dtype) if isinstance(s.dtype, pd.CategoricalDtype) else s)
+
+
+def test_compact_inputs_take_the_fast_paths(compact_frames):
+    org, camp, pat = compact_frames
+    # ID inteiro nos dois lados: build_enter_table cruza por inteiro, sem astype(str)
+    assert pd.api.types.is_integer_dtype(org["ID"]) and pd.api.types.is_integer_dtype(pat["ID"])
+    assert isinstance(camp["Nome"].dtype, pd.CategoricalDtype)
+    ctx = ml.ReportContext(org, camp, pat, modo="diario", compact=True)
+    # Nome sai do groupby como category com um valor por linha e volta a texto
+    assert not isinstance(ctx.camp_agg["Nome"].dtype, pd.CategoricalDtype)
+
+
+def test_compact_sheets_match_default(synth_frames, compact_frames):
+    want = ml.ReportContext(*synth_frames, modo="diario").sheets()
+    got = ml.ReportContext(*compact_frames, modo="diario", compact=True).sheets()
+    assert list(got) == list(want)
+    for name in want:
+        pd.testing.assert_frame_equal(_plain(got[name]), _plain(want[name]), check_dtype=False, obj=name)
+
+
+def test_compact_excel_matches_default(synth_frames, compact_frames):
+    def read(ctx):
+        return pd.read_excel(BytesIO(ctx.excel()), sheet_name=None)
+
+    want = read(ml.ReportContext(*synth_frames, modo="diario"))
+    got = read(ml.ReportContext(*compact_frames, modo="diario", compact=True))
+    assert list(got) == list(want)
+    for name in want:
+        pd.testing.assert_frame_equal(got[name], want[name], obj=name)
+
+
+def test_enter_table_integer_ids_match_text_ids(synth_frames, compact_frames):
+    org, _, pat = synth_frames
+    org_c, _, pat_c = compact_frames
+    want = ml.build_enter_table(org, pat)
+    got = ml.build_enter_table(org_c, pat_c)
+    assert len(want)
+    pd.testing.assert_frame_equal(_plain(got), _plain(want), check_dtype=False)
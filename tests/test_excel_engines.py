@@ -0,0 +1,79 @@
+import pytest
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+import ml_report as ml
+import ml_synth
+
+# pd.read_excel(engine="openpyxl") e a referencia; os outros engines tem que devolver o mesmo frame
+ENGINES = [e for e in ml.EXCEL_ENGINES if e != "openpyxl" and (e != "calamine" or ml._has_module("python_calamine"))]
+
+LOADERS = {
+    "organico": ml.load_organico,
+    "patrocinados": ml.load_patrocinados,
+    "campanhas_diario": ml.load_campanhas_diario,
+    "campanhas_consolidado": ml.load_campanhas_consolidado,
+}
+
+
+def _rewrite(path, edit) -> None:
+    """Regrava a aba de path com as linhas alteradas por edit(rows) e duas linhas vazias no fim."""
+    src = load_workbook(path, read_only=True)
+    title = src.worksheets[0].title
+    rows = [list(r) for r in src.worksheets[0].iter_rows(values_only=True)]
+    src.close()
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+    for row in edit(rows):
+        ws.append(row)
+    # Linhas vazias no fim, com celulas formatadas para existirem no xml
+    for r in range(ws.max_row + 1, ws.max_row + 3):
+        ws.cell(row=r, column=1).font = Font(bold=True)
+    wb.save(path)
+
+
+def _organico(rows):
+    # Cabecalho agrupado curto (header=4): as linhas de dados ficam mais largas que ele
+    rows[4] = ["Anúncio", None, None, None, None, "Desempenho"]
+    # Linha vazia no meio dos dados
+    return rows[:10] + [[]] + rows[10:]
+
+
+def _wide_rows(rows):
+    # Celulas alem do cabecalho em algumas linhas e linhas sem as celulas vazias do fim
+    for i in range(2, len(rows), 3):
+        rows[i] = rows[i] + [None, "observacao"]
+    for i in range(3, len(rows), 5):
+        while rows[i] and rows[i][-1] is None:
+            rows[i].pop()
+    return rows
+
+
+@pytest.fixture(scope="module")
+def quirky_paths(tmp_path_factory):
+    paths = ml_synth.generate_exports(tmp_path_factory.mktemp("quirky"), n_listings=60, n_campaigns=8, days=4)
+    _rewrite(paths["organico"], _organico)
+    for kind in ("patrocinados", "campanhas_diario", "campanhas_consolidado"):
+        _rewrite(paths[kind], _wide_rows)
+    return paths
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("kind", list(LOADERS))
+def test_loader_matches_read_excel(quirky_paths, kind, engine):
+    ref = LOADERS[kind](quirky_paths[kind], engine="openpyxl")
+    got = LOADERS[kind](quirky_paths[kind], engine=engine)
+    pd.testing.assert_frame_equal(got, ref)
+    assert ml.parse_failures(got) == ml.parse_failures(ref)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("kind,header", [("organico", 4), ("patrocinados", 1), ("campanhas_diario", 1)])
+def test_read_sheet_matches_read_excel(quirky_paths, kind, header, engine):
+    # Sem usecols: colunas extras "Unnamed: i" e linhas vazias do fim iguais as do pd.read_excel
+    ref = ml.read_sheet(quirky_paths[kind], header=header, engine="openpyxl")
+    got = ml.read_sheet(quirky_paths[kind], header=header, engine=engine)
+    assert ref.columns[-1].startswith("Unnamed:")
+    pd.testing.assert_frame_equal(got, ref)
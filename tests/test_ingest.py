@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import ml_report as ml
+import ml_synth
+
+
+@pytest.fixture(scope="module")
+def split_export(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("split")
+    paths = []
+    for i in range(3):
+        path = tmp / f"campanhas_{i}.xlsx"
+        ml_synth.write_campanhas_xlsx(path, 20, days=5, seed=44 + i)
+        paths.append(path)
+    return paths
+
+
+def test_parallel_load_matches_sequential(split_export):
+    seq = ml.load_exports(split_export, workers=1)[1]
+    pd.testing.assert_frame_equal(ml.load_exports(split_export, workers=2)[1], seq)
+
+
+def test_concurrent_loads_share_and_resize_pool(split_export):
+    seq = ml.load_exports(split_export, workers=1)[1]
+    # Pedidos com tamanhos diferentes trocam o pool enquanto outras threads ainda o usam
+    with ThreadPoolExecutor(max_workers=6) as threads:
+        results = list(threads.map(lambda w: ml.load_exports(split_export, workers=w)[1], [2, 3] * 3))
+    for df in results:
+        pd.testing.assert_frame_equal(df, seq)
+
+
+def _key_index(df, keys):
+    return df.set_index(keys).sort_index()
+
+
+@pytest.mark.parametrize("ordem", [(0, 1), (1, 0)])
+def test_daily_overlap_keeps_last_file(tmp_path, ordem):
+    # Mesmas campanhas; os 3 primeiros dias aparecem nos dois arquivos com valores diferentes
+    paths = [tmp_path / "cinco_dias.xlsx", tmp_path / "tres_dias.xlsx"]
+    ml_synth.write_campanhas_xlsx(paths[0], 10, days=5, seed=44)
+    ml_synth.write_campanhas_xlsx(paths[1], 10, days=3, seed=45)
+    files = [paths[i] for i in ordem]
+    info, df = ml.load_exports(files, workers=1)
+    assert info["modo"] == "diario"
+    assert len(df) == 10 * 5
+    assert not df.duplicated(["Nome", "Desde"]).any()
+
+    got = _key_index(df, ["Nome", "Desde"])
+    first, last = (_key_index(ml.load_export(f)[1], ["Nome", "Desde"]) for f in files)
+    col = "Receita\n(Moeda local)"
+    assert not first[col].reindex(last.index).equals(last[col])
+    pd.testing.assert_series_equal(got.loc[last.index, col], last[col])
+    so_primeiro = first.index.difference(last.index)
+    pd.testing.assert_series_equal(got.loc[so_primeiro, col], first.loc[so_primeiro, col])
+
+
+def test_listing_overlap_keeps_last_file(tmp_path):
+    paths = [tmp_path / "a.xlsx", tmp_path / "b.xlsx"]
+    ml_synth.write_organico_xlsx(paths[0], 30, seed=1)
+    ml_synth.write_organico_xlsx(paths[1], 20, seed=2)
+    _, df = ml.load_exports(paths, workers=1)
+    got, last = _key_index(df, ["ID"]), _key_index(ml.load_export(paths[1])[1], ["ID"])
+    assert len(df) == 30
+    pd.testing.assert_series_equal(got.loc[last.index, "Visitas"], last["Visitas"])
+
+
+def test_mixed_daily_and_consolidated_rejected(synth_paths):
+    files = [synth_paths["campanhas_diario"], synth_paths["campanhas_consolidado"]]
+    with pytest.raises(ValueError, match="campanhas_consolidado.xlsx.*campanhas consolidado"):
+        ml.load_exports(files, workers=1)
+
+
+def test_mixed_kinds_rejected_naming_wrong_file(synth_paths):
+    files = [synth_paths["organico"], synth_paths["organico"], synth_paths["patrocinados"]]
+    with pytest.raises(ValueError, match=r"patrocinados\.xlsx: esperado export organico"):
+        ml.load_exports(files, workers=1)
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+import ml_report as ml
+from ml_jobs import JobCancelled, ReportJobs
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Segura os jobs dentro de build_campaign_agg ate o teste liberar."""
+    started, release = threading.Event(), threading.Event()
+    original = ml.build_campaign_agg.__wrapped__
+
+    @ml.stage
+    def build_campaign_agg(*args, **kwargs):
+        started.set()
+        assert release.wait(30)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(ml, "build_campaign_agg", build_campaign_agg)
+    return started, release
+
+
+@pytest.fixture
+def jobs():
+    jobs = ReportJobs(workers=2)
+    yield jobs
+    jobs.shutdown()
+
+
+def _submit(jobs, slot, key, frames):
+    org, camp, pat = frames
+    return jobs.submit(slot, key, "xlsx", org, camp, pat, modo="diario")
+
+
+def test_new_key_in_slot_cancels_old_job_at_next_stage(jobs, gate, synth_frames):
+    started, release = gate
+    old = _submit(jobs, "a", "k1", synth_frames)
+    assert started.wait(30)
+    assert old.status == "executando"
+    new = _submit(jobs, "a", "k2", synth_frames)
+    assert old.status == "cancelado"
+    release.set()
+    with pytest.raises(JobCancelled):
+        old.future.result(30)
+    # A etapa em curso termina, mas nenhuma outra comeca
+    assert old.etapa == "build_campaign_agg"
+    new.future.result(60)
+    assert jobs.result("k2") is not None
+    assert jobs.result("k1") is None
+    assert jobs.stats["cancelados"] == 1
+
+
+def test_job_shared_by_other_slot_survives(jobs, gate, synth_frames):
+    started, release = gate
+    job = _submit(jobs, "a", "k", synth_frames)
+    assert _submit(jobs, "b", "k", synth_frames) is job
+    assert started.wait(30)
+    _submit(jobs, "a", "k2", synth_frames)
+    assert job.status == "executando"
+    release.set()
+    job.future.result(60)
+    assert jobs.result("k") is not None
+    assert jobs.stats["cancelados"] == 0
+
+
+def test_shared_job_cancelled_when_last_slot_leaves(jobs, gate, synth_frames):
+    started, release = gate
+    job = _submit(jobs, "a", "k", synth_frames)
+    _submit(jobs, "b", "k", synth_frames)
+    assert started.wait(30)
+    _submit(jobs, "a", "k2", synth_frames)
+    _submit(jobs, "b", "k3", synth_frames)
+    assert job.status == "cancelado"
+    release.set()
+    with pytest.raises(JobCancelled):
+        job.future.result(30)
@@ -0,0 +1,119 @@
+import threading
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+import ml_profile
+from ml_profile import StageProfiler, set_profiler, stage
+
+
+@stage
+def inner(df):
+    return df.head(2)
+
+
+@stage
+def outer(df):
+    return pd.concat([inner(df), df])
+
+
+@stage
+def broken(df):
+    raise ValueError("falhou")
+
+
+@pytest.fixture(autouse=True)
+def no_profiler():
+    set_profiler(None)
+    yield
+    set_profiler(None)
+
+
+def test_stage_records_nesting_rows_and_failures():
+    df = pd.DataFrame({"x": range(5)})
+    with StageProfiler(context={"sessao": "s1"}) as prof:
+        outer(df)
+        with pytest.raises(ValueError):
+            broken(df)
+    recs = [{k: r[k] for k in ("sessao", "etapa", "nivel", "linhas_in", "linhas_out", "ok")} for r in prof.records]
+    assert recs == [
+        {"sessao": "s1", "etapa": "inner", "nivel": 1, "linhas_in": 5, "linhas_out": 2, "ok": True},
+        {"sessao": "s1", "etapa": "outer", "nivel": 0, "linhas_in": 5, "linhas_out": 7, "ok": True},
+        {"sessao": "s1", "etapa": "broken", "nivel": 0, "linhas_in": 5, "linhas_out": None, "ok": False},
+    ]
+    assert all(r["pico_mb"] is None for r in prof.records)
+    assert list(prof.summary().columns) == ["sessao", "etapa", "nivel", "segundos", "linhas_in", "linhas_out", "pico_mb", "ok"]
+
+
+def test_memory_peak_includes_nested_stage():
+    @stage
+    def alloc():
+        return bytearray(8 * 1024 ** 2)
+
+    @stage
+    def parent():
+        alloc()
+        return None
+
+    with StageProfiler(memory=True) as prof:
+        parent()
+    peaks = {r["etapa"]: r["pico_mb"] for r in prof.records}
+    assert peaks["alloc"] >= 7.5
+    assert peaks["parent"] >= peaks["alloc"]
+
+
+def test_no_profiler_calls_function_directly(monkeypatch):
+    # Sem profiler ativo o wrapper nao passa por StageProfiler.run nem liga o tracemalloc
+    monkeypatch.setattr(StageProfiler, "run", lambda *a: pytest.fail("run chamado sem profiler ativo"))
+    df = pd.DataFrame({"x": range(5)})
+    assert len(outer(df)) == 7
+    assert not tracemalloc.is_tracing()
+    # Profiler que ja saiu tambem nao fica ativo
+    with StageProfiler() as prof:
+        pass
+    assert len(outer(df)) == 7 and prof.records == []
+
+
+def test_profiler_is_per_thread():
+    df = pd.DataFrame({"x": range(5)})
+    with StageProfiler() as prof:
+        t = threading.Thread(target=outer, args=(df,))
+        t.start()
+        t.join()
+    assert prof.records == []
+
+
+@pytest.mark.skipif(tracemalloc.is_tracing(), reason="tracemalloc ligado por fora")
+def test_tracemalloc_stops_only_after_last_memory_profiler():
+    first_in, first_out = threading.Event(), threading.Event()
+
+    def other():
+        with StageProfiler(memory=True):
+            first_in.set()
+            first_out.wait(10)
+
+    a = StageProfiler(memory=True).start()
+    t = threading.Thread(target=other)
+    t.start()
+    assert first_in.wait(10)
+    a.stop()
+    # O profiler da outra thread ainda mede memoria
+    assert tracemalloc.is_tracing()
+    first_out.set()
+    t.join()
+    assert not tracemalloc.is_tracing()
+    assert ml_profile._tracemalloc_users == 0
+
+
+def test_tracemalloc_started_outside_is_left_running():
+    outside = not tracemalloc.is_tracing()
+    if outside:
+        tracemalloc.start()
+    try:
+        with StageProfiler(memory=True):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        if outside:
+            tracemalloc.stop()
@@ -0,0 +1,64 @@
+from io import BytesIO
+
+import pandas as pd
+
+import ml_report as ml
+
+REPORT = set(ml.ReportContext.DEPS) - {"sweep"}
+# Artefatos que dependem (direta ou indiretamente) de acos_over_pct
+STRATEGY = {"camp_strat", "pause", "scale", "acos", "diagnosis", "highlights", "plan7", "panel", "budget_plan"}
+
+
+def _ctx(frames, **params):
+    org, camp, pat = frames
+    return ml.ReportContext(org, camp, pat, modo="diario", **params)
+
+
+def _sheets(data: bytes) -> dict:
+    return pd.read_excel(BytesIO(data), sheet_name=None)
+
+
+def test_excel_builds_each_artifact_once(synth_frames):
+    ctx = _ctx(synth_frames)
+    ctx.excel()
+    ctx.excel()
+    assert ctx.compute_counts == {name: 1 for name in REPORT}
+
+
+def test_rule_change_reruns_only_dependent_builders(synth_frames):
+    ctx = _ctx(synth_frames)
+    ctx.excel()
+    dropped = ctx.update(acos_over_pct=0.5)
+    assert dropped == STRATEGY
+    ctx.excel()
+    assert ctx.compute_counts == {name: 2 if name in STRATEGY else 1 for name in REPORT}
+
+
+def test_update_without_change_reruns_nothing(synth_frames):
+    ctx = _ctx(synth_frames)
+    first = ctx.excel()
+    counts = dict(ctx.compute_counts)
+    assert ctx.update(**{k: ctx.params[k] for k in ml.STRATEGY_DEFAULTS}, trend_window=ctx.params["trend_window"]) == set()
+    assert ctx.excel() is first
+    assert ctx.compute_counts == counts
+
+
+def test_excel_after_update_matches_fresh_context(synth_frames):
+    ctx = _ctx(synth_frames)
+    ctx.excel()
+    ctx.update(acos_over_pct=0.5, pause_invest_min=50.0)
+    got, want = _sheets(ctx.excel()), _sheets(_ctx(synth_frames, acos_over_pct=0.5, pause_invest_min=50.0).excel())
+    assert list(got) == list(want)
+    for name in want:
+        pd.testing.assert_frame_equal(got[name], want[name])
+
+
+
+def test_sweep_cached_until_grid_changes(synth_frames):
+    ctx = _ctx(synth_frames)
+    grid = {"roas_mina": [3.0, 7.0], "roas_hemorragia": [2.0, 3.0]}
+    first = ctx.sweep(grid)
+    ctx.update(trend_window=14)
+    assert ctx.sweep(dict(grid)) is first
+    assert ctx.sweep({**grid, "roas_mina": [5.0]}) is not first
+    assert ctx.compute_counts["sweep"] == 2
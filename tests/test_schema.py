@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+import ml_report as ml
+
+
+def test_parse_br_numeric_formats():
+    s = pd.Series(["R$ 1.234,56", "12,5%", "1.234", "12.5", "(1.000,00)", "1,234.56", "-", "abc", 3, None], dtype=object)
+    num, failed = ml.parse_br_numeric(s, "frac")
+    np.testing.assert_allclose(num.to_numpy(), [1234.56, 0.125, 1234.0, 12.5, -1000.0, 1234.56, np.nan, np.nan, 3.0, np.nan])
+    assert failed.tolist() == [False] * 7 + [True] + [False] * 2
+
+
+def test_apply_schema_counts_failures():
+    df = pd.DataFrame({"Cliques": ["10", "x", "1.200"], "Desde": ["01/02/2024", "2024-02-02", "ontem"]})
+    df = ml.apply_schema(df, {"Cliques": "num", "Desde": "date"})
+    assert df["Cliques"].tolist()[::2] == [10.0, 1200.0]
+    assert df["Desde"].iloc[0] == pd.Timestamp("2024-02-01")
+    assert ml.parse_failures(df) == {"Cliques": 1, "Desde": 1}
+
+
+def test_add_strategy_fields_accepts_text_columns(synth_frames):
+    org, camp, pat = synth_frames
+    camp_agg = ml.build_campaign_agg(camp, "diario")
+    texto = camp_agg.astype({"ACOS Objetivo": object, "Receita": object})
+    texto.loc[0, "ACOS Objetivo"] = "15,5"
+    texto.loc[1, "ACOS Objetivo"] = ""
+    got = ml.add_strategy_fields(texto).set_index("Nome")
+    assert got.loc[camp_agg.loc[0, "Nome"], "ACOS_Objetivo_N"] == 0.155
+    assert np.isnan(got.loc[camp_agg.loc[1, "Nome"], "ACOS_Objetivo_N"])
+    pd.testing.assert_series_equal(got["Quadrante"].drop(camp_agg.loc[:1, "Nome"]),
+                                   ml.add_strategy_fields(camp_agg).set_index("Nome")["Quadrante"].drop(camp_agg.loc[:1, "Nome"]),
+                                   check_like=True)
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import ml_server
+from ml_loadtest import _free_port, _get_json
+from ml_server import ReportService, RequestError, parse_rules
+
+
+def test_parse_rules_types_values():
+    rules = parse_rules({"acos_over_pct": "0.2", "enter_visitas_min": "80", "plan_budget": "", "formato": "json"})
+    assert rules == {"acos_over_pct": 0.2, "enter_visitas_min": 80, "plan_budget": None}
+
+
+def test_parse_rules_rejects_unknown_key():
+    with pytest.raises(RequestError, match="acos_objetvo"):
+        parse_rules({"acos_objetvo": "0.2"})
+
+
+def test_parse_rules_rejects_invalid_value():
+    with pytest.raises(RequestError, match="roas_mina"):
+        parse_rules({"roas_mina": "sete"})
+
+
+def test_service_starts_every_worker():
+    service = ReportService(workers=3, warm=False)
+    try:
+        assert len(service.pids) == 3
+    finally:
+        service.shutdown()
+
+
+def test_sigterm_stops_server_and_workers():
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, str(Path(ml_server.__file__)), "--port", str(port), "--workers", "2"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            assert proc.poll() is None, proc.stderr.read().decode()
+            try:
+                _get_json(f"http://127.0.0.1:{port}/health")
+                break
+            except OSError:
+                assert time.monotonic() < deadline
+                time.sleep(0.2)
+        proc.terminate()
+        # communicate so termina quando ninguem mais segura os pipes: workers orfaos travariam aqui
+        _, err = proc.communicate(timeout=60)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    assert proc.returncode == 0
+    assert b'"workers": 2' in err
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ml_report as ml
+from strategy_reference import add_strategy_fields_rowwise
+
+
+@pytest.fixture(scope="module")
+def camp_agg(synth_frames):
+    org, camp, pat = synth_frames
+    return ml.build_campaign_agg(camp, "diario")
+
+
+def _acos_variants(camp_agg):
+    n = len(camp_agg)
+    acos = camp_agg["ACOS Objetivo"].to_numpy(dtype="float64").copy()
+    acos[::4] = np.nan
+    acos[1::5] = 0.0
+    acos[2::7] = 0.25  # ja em fracao
+    yield "nan_zero_fracao", camp_agg.assign(**{"ACOS Objetivo": acos})
+    yield "inteiro", camp_agg.assign(**{"ACOS Objetivo": np.resize([10, 15, 20, 30], n).astype("int64")})
+    yield "sem_receita", camp_agg.assign(Receita=np.where(np.arange(n) % 3 == 0, np.nan, camp_agg["Receita"]),
+                                         Investimento=np.where(np.arange(n) % 5 == 0, 0.0, camp_agg["Investimento"]))
+
+
+@pytest.mark.parametrize("params", [{}, {"roas_mina": 2.0, "lost_budget_mina": 10.0, "roas_hemorragia": 6.0, "acos_over_pct": 0.0}])
+def test_vectorized_matches_rowwise(camp_agg, params):
+    for name, df in _acos_variants(camp_agg):
+        got = ml.add_strategy_fields(df, **params)
+        want = add_strategy_fields_rowwise(df, **params)
+        pd.testing.assert_frame_equal(got, want, obj=name)
+
+
+def test_every_quadrant_reachable(camp_agg):
+    quadrantes = set()
+    for params in ({}, {"roas_mina": 1.0, "lost_budget_mina": 0.0}, {"lost_rank_gigante": 0.0, "roas_mina": 1e9}):
+        quadrantes |= set(ml.add_strategy_fields(camp_agg, **params)["Quadrante"])
+    assert quadrantes == set(ml.QUADRANTES)
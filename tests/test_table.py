@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_table import TableView, parse_filter
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "Nome": ["a", "b", "c", "d", "e", "f", "g"],
+        "Tipo": ["x", "y", "x", "y", "x", "x", "y"],
+        "Receita": [30.0, np.nan, 10.0, 30.0, 1234.5, np.nan, 10.0],
+    }, index=[10, 11, 12, 13, 14, 15, 16])
+
+
+def test_query_pages_and_bounds(df):
+    view = TableView(df)
+    pages = [view.query(page=p, page_size=3) for p in range(3)]
+    assert [list(page["Nome"]) for page, _ in pages] == [["a", "b", "c"], ["d", "e", "f"], ["g"]]
+    assert {total for _, total in pages} == {7}
+    assert view.pages(7, page_size=3) == 3 and view.pages(0) == 1
+    # Pagina alem do fim fica vazia; negativa vira a primeira
+    assert view.query(page=5, page_size=3)[0].empty
+    assert list(view.query(page=-1, page_size=3)[0]["Nome"]) == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("ascending,want", [
+    (True, ["c", "g", "a", "d", "e", "b", "f"]),
+    (False, ["e", "a", "d", "c", "g", "b", "f"]),
+])
+def test_sort_is_stable_with_nan_last(df, ascending, want):
+    page, total = TableView(df).query(sort="Receita", ascending=ascending, page_size=10)
+    assert list(page["Nome"]) == want and total == 7
+
+
+def test_filter_keeps_sorted_order_and_original_rows(df):
+    view = TableView(df)
+    page, total = view.query({"Tipo": "X"}, sort="Receita", ascending=False, page_size=2)
+    assert list(page["Nome"]) == ["e", "a"] and total == 4
+    page, _ = view.query({"Tipo": "X"}, sort="Receita", ascending=False, page=1, page_size=2)
+    assert list(page["Nome"]) == ["c", "f"]
+    # Linhas devolvidas sao as do frame original (mesmo indice), sem copia reordenada
+    pd.testing.assert_frame_equal(page, df.loc[[12, 15]])
+
+
+def test_filters_combine(df):
+    view = TableView(df)
+    page, total = view.query({"Tipo": ["x"], "Receita": parse_filter(df, "Receita", "10:1.000")}, page_size=10)
+    assert list(page["Nome"]) == ["a", "c"] and total == 2
+
+
+@pytest.mark.parametrize("text,want", [
+    ("1.234,5", (1234.5, 1234.5)),
+    ("1.234", (1234.0, 1234.0)),
+    ("12,5", (12.5, 12.5)),
+    ("12.5", (12.5, 12.5)),
+    ("R$ 1.500", (1500.0, 1500.0)),
+    ("10 : 1.000", (10.0, 1000.0)),
+    (":5", (None, 5.0)),
+    ("5:", (5.0, None)),
+    ("abc", None),
+    ("", None),
+])
+def test_parse_filter_numeric_pt_br(df, text, want):
+    assert parse_filter(df, "Receita", text) == want
+
+
+def test_parse_filter_text_column_is_contains(df):
+    assert parse_filter(df, "Nome", "1.234") == "1.234"
+
+
+def test_top_k_without_order_matches_sort(df):
+    view = TableView(df)
+    assert list(view.top_k("Receita", 3)["Nome"]) == ["e", "a", "d"]
+    assert list(view.top_k("Receita", 2, largest=False)["Nome"]) == ["c", "g"]
+    assert view._orders == {}
+
+
+def test_top_k_reuses_cached_order(df, monkeypatch):
+    view = TableView(df)
+    view.query(sort="Receita", ascending=False)
+    monkeypatch.setattr(pd.Series, "nlargest", lambda *a, **k: pytest.fail("top_k reordenou a coluna"))
+    assert list(view.top_k("Receita", 3)["Nome"]) == ["e", "a", "d"]